@@ -53,6 +53,23 @@ CONFLUENCE_ANONYMOUS_ACCESS_IS_PUBLIC = (
 )
 
 
+#####
+# Post Query Censoring
+#####
+# In seconds, how long the set of sources with censoring enabled is cached for
+CENSORING_ENABLED_SOURCES_CACHE_TTL_SECONDS = int(
+    os.environ.get("CENSORING_ENABLED_SOURCES_CACHE_TTL_SECONDS") or 60
+)
+# In seconds, how long a user's access to a Salesforce object is cached for
+SALESFORCE_OBJECT_ACCESS_CACHE_TTL_SECONDS = int(
+    os.environ.get("SALESFORCE_OBJECT_ACCESS_CACHE_TTL_SECONDS") or 60
+)
+# Max number of (user, object) access decisions to cache, 0 disables the cache
+SALESFORCE_OBJECT_ACCESS_CACHE_SIZE = int(
+    os.environ.get("SALESFORCE_OBJECT_ACCESS_CACHE_SIZE") or 100_000
+)
+
+
 #####
 # Google Drive
 #####
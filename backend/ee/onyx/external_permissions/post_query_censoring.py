@@ -1,5 +1,6 @@
 from collections.abc import Callable
 
+from ee.onyx.configs.app_configs import CENSORING_ENABLED_SOURCES_CACHE_TTL_SECONDS
 from ee.onyx.db.connector_credential_pair import get_all_auto_sync_cc_pairs
 from ee.onyx.external_permissions.salesforce.postprocessing import (
     censor_salesforce_chunks,
@@ -9,6 +10,9 @@ from onyx.context.search.pipeline import InferenceChunk
 from onyx.db.engine import get_session_context_manager
 from onyx.db.models import User
 from onyx.utils.logger import setup_logger
+from onyx.utils.threadpool_concurrency import run_functions_tuples_in_parallel
+from onyx.utils.ttl_cache import TTLCache
+from shared_configs.contextvars import get_current_tenant_id
 
 logger = setup_logger()
 
@@ -20,8 +24,14 @@ DOC_SOURCE_TO_CHUNK_CENSORING_FUNCTION: dict[
     DocumentSource.SALESFORCE: censor_salesforce_chunks,
 }
 
+# tenant id -> sources with censoring enabled
+_CENSORING_ENABLED_SOURCES_CACHE: TTLCache[str, frozenset[DocumentSource]] = TTLCache(
+    maxsize=10_000,
+    ttl_seconds=CENSORING_ENABLED_SOURCES_CACHE_TTL_SECONDS,
+)
+
 
-def _get_all_censoring_enabled_sources() -> set[DocumentSource]:
+def _get_all_censoring_enabled_sources() -> frozenset[DocumentSource]:
     """
     Returns the set of sources that have censoring enabled.
     This is based on if the access_type is set to sync and the connector
@@ -31,14 +41,39 @@ def _get_all_censoring_enabled_sources() -> set[DocumentSource]:
     all chunks for that source will be censored, even if the connector that
     indexed that chunk is not sync. This was done to avoid getting the cc_pair
     for every single chunk.
+
+    The result is cached for a short time since it only changes when cc_pairs
+    are added or their access type is changed.
     """
+    tenant_id = get_current_tenant_id()
+    cached_sources = _CENSORING_ENABLED_SOURCES_CACHE.get(tenant_id)
+    if cached_sources is not None:
+        return cached_sources
+
     with get_session_context_manager() as db_session:
         enabled_sync_connectors = get_all_auto_sync_cc_pairs(db_session)
-        return {
+        sources = frozenset(
             cc_pair.connector.source
             for cc_pair in enabled_sync_connectors
             if cc_pair.connector.source in DOC_SOURCE_TO_CHUNK_CENSORING_FUNCTION
-        }
+        )
+
+    _CENSORING_ENABLED_SOURCES_CACHE.set(tenant_id, sources)
+    return sources
+
+
+def _censor_chunks_for_source(
+    source: DocumentSource, chunks: list[InferenceChunk], user_email: str
+) -> list[InferenceChunk] | None:
+    censor_chunks_for_source = DOC_SOURCE_TO_CHUNK_CENSORING_FUNCTION[source]
+    try:
+        return censor_chunks_for_source(chunks, user_email)
+    except Exception as e:
+        logger.exception(
+            f"Failed to censor chunks for source {source} so throwing out all"
+            f" chunks for this source and continuing: {e}"
+        )
+        return None
 
 
 # NOTE: This is only called if ee is enabled.
@@ -67,17 +102,21 @@ def _post_query_chunk_censoring(
             final_chunk_dict[chunk.unique_id] = chunk
 
     # For each source, filter out the chunks using the permission
-    # check function for that source
-    # TODO: Use a threadpool/multiprocessing to process the sources in parallel
-    for source, chunks_for_source in chunks_to_process.items():
-        censor_chunks_for_source = DOC_SOURCE_TO_CHUNK_CENSORING_FUNCTION[source]
-        try:
-            censored_chunks = censor_chunks_for_source(chunks_for_source, user.email)
-        except Exception as e:
-            logger.exception(
-                f"Failed to censor chunks for source {source} so throwing out all"
-                f" chunks for this source and continuing: {e}"
-            )
+    # check function for that source. The checks mostly wait on the source's API
+    # so the sources are processed in parallel
+    censoring_calls = [
+        (_censor_chunks_for_source, (source, chunks_for_source, user.email))
+        for source, chunks_for_source in chunks_to_process.items()
+    ]
+    if len(censoring_calls) == 1:
+        func, args = censoring_calls[0]
+        censored_chunks_per_source = [func(*args)]
+    else:
+        censored_chunks_per_source = run_functions_tuples_in_parallel(censoring_calls)
+
+    for censored_chunks in censored_chunks_per_source:
+        # None means censoring failed, so all chunks for the source are thrown out
+        if censored_chunks is None:
             continue
 
         for censored_chunk in censored_chunks:
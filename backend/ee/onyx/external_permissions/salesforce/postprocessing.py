@@ -61,8 +61,8 @@ def _get_objects_access_for_user_email_from_salesforce(
         logger.warning(f"User '{user_email}' not found in Salesforce")
         return None
 
-    # This is the only query that is not cached in the function
-    # so it takes 0.1-0.2 seconds total
+    # This is only cached for a short time per user and object since permissions
+    # can change, so it takes 0.1-0.2 seconds total when the objects aren't cached
     object_id_to_access = get_objects_access_for_user_id(
         salesforce_client, user_id, list(object_ids)
     )
@@ -1,9 +1,13 @@
 from simple_salesforce import Salesforce
 from sqlalchemy.orm import Session
 
+from ee.onyx.configs.app_configs import SALESFORCE_OBJECT_ACCESS_CACHE_SIZE
+from ee.onyx.configs.app_configs import SALESFORCE_OBJECT_ACCESS_CACHE_TTL_SECONDS
 from onyx.db.connector_credential_pair import get_connector_credential_pair_from_id
 from onyx.db.document import get_cc_pairs_for_document
 from onyx.utils.logger import setup_logger
+from onyx.utils.ttl_cache import TTLCache
+from shared_configs.contextvars import get_current_tenant_id
 
 logger = setup_logger()
 
@@ -104,6 +108,13 @@ def get_salesforce_user_id_from_email(
 
 _MAX_RECORD_IDS_PER_QUERY = 200
 
+# (tenant id, salesforce user id, record id) -> has read access
+# Kept short lived so that permission changes in Salesforce are picked up quickly
+_OBJECT_ACCESS_CACHE: TTLCache[tuple[str, str, str], bool] = TTLCache(
+    maxsize=SALESFORCE_OBJECT_ACCESS_CACHE_SIZE,
+    ttl_seconds=SALESFORCE_OBJECT_ACCESS_CACHE_TTL_SECONDS,
+)
+
 
 def get_objects_access_for_user_id(
     salesforce_client: Salesforce,
@@ -117,8 +128,24 @@ def get_objects_access_for_user_id(
     4 unique objects).
     If we decide this isn't acceptable we can use multiple queries but they
     should be in parallel so query time doesn't get too long.
+
+    Access decisions are cached per user and record for a short time, so only
+    the records that weren't checked recently are queried.
     """
-    truncated_record_ids = record_ids[:_MAX_RECORD_IDS_PER_QUERY]
+    tenant_id = get_current_tenant_id()
+    object_id_to_access: dict[str, bool] = {}
+    uncached_record_ids: list[str] = []
+    for record_id in record_ids:
+        has_access = _OBJECT_ACCESS_CACHE.get((tenant_id, user_id, record_id))
+        if has_access is None:
+            uncached_record_ids.append(record_id)
+        else:
+            object_id_to_access[record_id] = has_access
+
+    if not uncached_record_ids:
+        return object_id_to_access
+
+    truncated_record_ids = uncached_record_ids[:_MAX_RECORD_IDS_PER_QUERY]
     record_ids_str = "'" + "','".join(truncated_record_ids) + "'"
     access_query = f"""
     SELECT RecordId, HasReadAccess
@@ -127,7 +154,12 @@ def get_objects_access_for_user_id(
     AND UserId = '{user_id}'
     """
     result = salesforce_client.query_all(access_query)
-    return {record["RecordId"]: record["HasReadAccess"] for record in result["records"]}
+    for record in result["records"]:
+        object_id_to_access[record["RecordId"]] = record["HasReadAccess"]
+        _OBJECT_ACCESS_CACHE.set(
+            (tenant_id, user_id, record["RecordId"]), record["HasReadAccess"]
+        )
+    return object_id_to_access
 
 
 _CC_PAIR_ID_SALESFORCE_CLIENT_MAP: dict[int, Salesforce] = {}
@@ -22,6 +22,14 @@ from onyx.db.models import User
 from onyx.db.models import User__UserGroup
 from onyx.db.models import UserGroup
 from onyx.db.token_limit import fetch_all_user_token_rate_limits
+from onyx.redis.redis_token_usage import get_global_token_usage_key
+from onyx.redis.redis_token_usage import get_token_usage
+from onyx.redis.redis_token_usage import get_user_group_token_usage_key
+from onyx.redis.redis_token_usage import get_user_token_usage_key
+from onyx.redis.redis_token_usage import TokenUsage
+from onyx.redis.redis_token_usage import USER_GROUP_TOKEN_USAGE_KEY_PREFIX
+from onyx.redis.redis_token_usage import USER_TOKEN_USAGE_KEY_PREFIX
+from onyx.server.query_and_chat.token_limit import _fetch_global_usage
 from onyx.server.query_and_chat.token_limit import _get_cutoff_time
 from onyx.server.query_and_chat.token_limit import _is_rate_limited
 from onyx.server.query_and_chat.token_limit import _user_is_rate_limited_by_global
@@ -60,7 +68,13 @@ def _user_is_rate_limited(user_id: UUID) -> None:
 
         if user_rate_limits:
             user_cutoff_time = _get_cutoff_time(user_rate_limits)
-            user_usage = _fetch_user_usage(user_id, user_cutoff_time, db_session)
+            user_usage = get_token_usage(
+                key=get_user_token_usage_key(user_id),
+                cutoff_time=user_cutoff_time,
+                fetch_usage=lambda cutoff_time: _fetch_user_usage(
+                    user_id, cutoff_time, db_session
+                ),
+            )
 
             if _is_rate_limited(user_rate_limits, user_usage):
                 raise HTTPException(
@@ -105,14 +119,11 @@ def _user_is_rate_limited_by_group(user_id: UUID) -> None:
                 [e for sublist in group_rate_limits.values() for e in sublist]
             )
 
-            user_group_ids = list(group_rate_limits.keys())
-            group_usage = _fetch_user_group_usage(
-                user_group_ids, group_cutoff_time, db_session
-            )
-
             has_at_least_one_untriggered_limit = False
             for user_group_id, rate_limits in group_rate_limits.items():
-                usage = group_usage.get(user_group_id, [])
+                usage = _get_user_group_usage(
+                    user_group_id, group_cutoff_time, db_session
+                )
 
                 if not _is_rate_limited(rate_limits, usage):
                     has_at_least_one_untriggered_limit = True
@@ -125,6 +136,18 @@ def _user_is_rate_limited_by_group(user_id: UUID) -> None:
                 )
 
 
+def _get_user_group_usage(
+    user_group_id: int, cutoff_time: datetime, db_session: Session
+) -> TokenUsage:
+    return get_token_usage(
+        key=get_user_group_token_usage_key(user_group_id),
+        cutoff_time=cutoff_time,
+        fetch_usage=lambda cutoff_time: _fetch_user_group_usage(
+            [user_group_id], cutoff_time, db_session
+        ).get(user_group_id, []),
+    )
+
+
 def _fetch_all_user_group_rate_limits(
     user_id: UUID, db_session: Session
 ) -> Dict[int, List[TokenRateLimit]]:
@@ -174,6 +197,8 @@ def _fetch_user_group_usage(
         .join(UserGroup, UserGroup.id == User__UserGroup.user_group_id)
         .filter(UserGroup.id.in_(user_group_ids), ChatMessage.time_sent >= cutoff_time)
         .group_by(func.date_trunc("minute", ChatMessage.time_sent), UserGroup.id)
+        # groupby below only merges consecutive rows
+        .order_by(UserGroup.id)
     ).all()
 
     return {
@@ -182,3 +207,45 @@ def _fetch_user_group_usage(
             user_group_usage, key=lambda row: row[2]
         )
     }
+
+
+"""
+Token usage counters
+"""
+
+
+def _get_token_usage_keys(chat_session_id: UUID, db_session: Session) -> list[str]:
+    rows = db_session.execute(
+        select(ChatSession.user_id, User__UserGroup.user_group_id)
+        .outerjoin(User__UserGroup, User__UserGroup.user_id == ChatSession.user_id)
+        .where(ChatSession.id == chat_session_id)
+    ).all()
+
+    keys = [get_global_token_usage_key()]
+    if rows and rows[0][0] is not None:
+        keys.append(get_user_token_usage_key(rows[0][0]))
+    keys.extend(
+        get_user_group_token_usage_key(user_group_id)
+        for _, user_group_id in rows
+        if user_group_id is not None
+    )
+    return keys
+
+
+def _fetch_token_usage(
+    key: str, cutoff_time: datetime, db_session: Session
+) -> TokenUsage | None:
+    if key == get_global_token_usage_key():
+        return _fetch_global_usage(cutoff_time, db_session)
+
+    if key.startswith(USER_TOKEN_USAGE_KEY_PREFIX):
+        user_id = UUID(key.removeprefix(USER_TOKEN_USAGE_KEY_PREFIX))
+        return _fetch_user_usage(user_id, cutoff_time, db_session)
+
+    if key.startswith(USER_GROUP_TOKEN_USAGE_KEY_PREFIX):
+        user_group_id = int(key.removeprefix(USER_GROUP_TOKEN_USAGE_KEY_PREFIX))
+        return _fetch_user_group_usage([user_group_id], cutoff_time, db_session).get(
+            user_group_id, []
+        )
+
+    return None
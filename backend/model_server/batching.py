@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections.abc import Callable
+from collections.abc import Hashable
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Generic
+from typing import TypeVar
+
+from prometheus_client import Histogram
+
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+T = TypeVar("T")
+# The output of a batch, must be sliceable per input (a list or a numpy array)
+R = TypeVar("R")
+
+_BATCH_SIZE_HISTOGRAM = Histogram(
+    "onyx_model_server_batch_size",
+    "Number of inputs in each batch run by the model server",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+_QUEUE_WAIT_HISTOGRAM = Histogram(
+    "onyx_model_server_batch_queue_wait_seconds",
+    "Time requests spend queued before their batch starts running",
+    ["batcher"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+@dataclass
+class _PendingRequest(Generic[T, R]):
+    inputs: list[T]
+    future: "asyncio.Future[R]"
+    enqueued_at: float
+
+
+@dataclass
+class _PendingBatch(Generic[T, R]):
+    process_batch: Callable[[list[T]], R]
+    requests: list[_PendingRequest[T, R]] = field(default_factory=list)
+    size: int = 0
+    flush_handle: asyncio.TimerHandle | None = None
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesces concurrent requests with the same key into a single call of the
+    (blocking) batch function, which is run in the default executor.
+
+    A batch is run once it holds max_batch_size inputs or its oldest request has
+    waited max_wait_seconds, the outputs are then split back up per request.
+    Requests are never split, so a request larger than max_batch_size is run right
+    away together with whatever was already queued for its key."""
+
+    def __init__(self, name: str, max_batch_size: int, max_wait_seconds: float) -> None:
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._pending_batches: dict[Hashable, _PendingBatch[T, R]] = {}
+        # keeps a reference to running batches so they aren't garbage collected
+        self._running_tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(
+        self,
+        key: Hashable,
+        inputs: list[T],
+        process_batch: Callable[[list[T]], R],
+    ) -> R:
+        """Queues the inputs and returns their slice of the batch output. All
+        requests sharing a key must have an equivalent process_batch, only the one
+        of the first request of a batch is used."""
+        loop = asyncio.get_running_loop()
+        request: _PendingRequest[T, R] = _PendingRequest(
+            inputs=inputs,
+            future=loop.create_future(),
+            enqueued_at=time.monotonic(),
+        )
+
+        batch = self._pending_batches.get(key)
+        if batch is None:
+            batch = _PendingBatch(process_batch=process_batch)
+            self._pending_batches[key] = batch
+        batch.requests.append(request)
+        batch.size += len(inputs)
+
+        if batch.size >= self.max_batch_size or self.max_wait_seconds <= 0:
+            self._flush(key)
+        elif batch.flush_handle is None:
+            batch.flush_handle = loop.call_later(
+                self.max_wait_seconds, self._flush, key
+            )
+
+        return await request.future
+
+    def _flush(self, key: Hashable) -> None:
+        batch = self._pending_batches.pop(key, None)
+        if batch is None:
+            return
+
+        if batch.flush_handle is not None:
+            batch.flush_handle.cancel()
+
+        task = asyncio.create_task(self._run_batch(batch))
+        self._running_tasks.add(task)
+        task.add_done_callback(self._running_tasks.discard)
+
+    async def _run_batch(self, batch: _PendingBatch[T, R]) -> None:
+        start = time.monotonic()
+        for request in batch.requests:
+            _QUEUE_WAIT_HISTOGRAM.labels(self.name).observe(start - request.enqueued_at)
+        _BATCH_SIZE_HISTOGRAM.labels(self.name).observe(batch.size)
+
+        inputs = [item for request in batch.requests for item in request.inputs]
+        try:
+            outputs: Any = await asyncio.get_running_loop().run_in_executor(
+                None, batch.process_batch, inputs
+            )
+        except Exception as e:
+            for request in batch.requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        if len(batch.requests) > 1:
+            logger.debug(
+                f"{self.name} batch of {len(batch.requests)} requests with "
+                f"{batch.size} inputs took {time.monotonic() - start:.3f} seconds"
+            )
+
+        offset = 0
+        for request in batch.requests:
+            # requests whose client went away are cancelled, skip those
+            if not request.future.done():
+                request.future.set_result(
+                    outputs[offset : offset + len(request.inputs)]
+                )
+            offset += len(request.inputs)
@@ -12,6 +12,7 @@ from transformers import PreTrainedTokenizer  # type: ignore
 
 from model_server.constants import INFORMATION_CONTENT_MODEL_WARM_UP_STRING
 from model_server.constants import MODEL_WARM_UP_STRING
+from model_server.inference_pool import run_model_inference
 from model_server.onyx_torch_model import ConnectorClassifier
 from model_server.onyx_torch_model import HybridClassifier
 from model_server.utils import simple_log_function_time
@@ -51,6 +52,11 @@ _INFORMATION_CONTENT_MODEL: SetFitModel | None = None
 
 _INFORMATION_CONTENT_MODEL_PROMPT_PREFIX: str = ""  # spec to model version!
 
+# Keys for the per-model concurrency limits of the inference pool
+_CONNECTOR_CLASSIFIER_POOL_KEY = "connector_classifier"
+_INTENT_MODEL_POOL_KEY = "intent"
+_INFORMATION_CONTENT_MODEL_POOL_KEY = "information_content"
+
 
 def get_connector_classifier_tokenizer() -> PreTrainedTokenizer:
     global _CONNECTOR_CLASSIFIER_TOKENIZER
@@ -531,7 +537,11 @@ async def process_connector_classification_request(
     if len(classification_request.available_connectors) == 0:
         return ConnectorClassificationResponse(connectors=[])
 
-    connectors = run_connector_classification(classification_request)
+    connectors = await run_model_inference(
+        _CONNECTOR_CLASSIFIER_POOL_KEY,
+        run_connector_classification,
+        classification_request,
+    )
     return ConnectorClassificationResponse(connectors=connectors)
 
 
@@ -542,7 +552,9 @@ async def process_analysis_request(
     if INDEXING_ONLY:
         raise RuntimeError("Indexing model server should not call intent endpoint")
 
-    is_keyword, keywords = run_analysis(intent_request)
+    is_keyword, keywords = await run_model_inference(
+        _INTENT_MODEL_POOL_KEY, run_analysis, intent_request
+    )
     return IntentResponse(is_keyword=is_keyword, keywords=keywords)
 
 
@@ -550,4 +562,8 @@ async def process_analysis_request(
 async def process_content_classification_request(
     content_classification_requests: list[str],
 ) -> list[ContentClassificationPrediction]:
-    return run_content_classification_inference(content_classification_requests)
+    return await run_model_inference(
+        _INFORMATION_CONTENT_MODEL_POOL_KEY,
+        run_content_classification_inference,
+        content_classification_requests,
+    )
@@ -7,6 +7,7 @@ from typing import Optional
 
 import aioboto3  # type: ignore
 import httpx
+import numpy as np
 import openai
 import vertexai  # type: ignore
 import voyageai  # type: ignore
@@ -14,6 +15,8 @@ from cohere import AsyncClient as CohereAsyncClient
 from fastapi import APIRouter
 from fastapi import HTTPException
 from fastapi import Request
+from fastapi import Response
+from fastapi.responses import JSONResponse
 from google.oauth2 import service_account  # type: ignore
 from litellm import aembedding
 from litellm.exceptions import RateLimitError
@@ -23,24 +26,38 @@ from sentence_transformers import SentenceTransformer  # type: ignore
 from vertexai.language_models import TextEmbeddingInput  # type: ignore
 from vertexai.language_models import TextEmbeddingModel  # type: ignore
 
+from model_server.batching import MicroBatcher
 from model_server.constants import DEFAULT_COHERE_MODEL
 from model_server.constants import DEFAULT_OPENAI_MODEL
 from model_server.constants import DEFAULT_VERTEX_MODEL
 from model_server.constants import DEFAULT_VOYAGE_MODEL
 from model_server.constants import EmbeddingModelTextType
 from model_server.constants import EmbeddingProvider
+from model_server.constants import MODEL_WARM_UP_STRING
+from model_server.model_backends import get_model_backend
+from model_server.model_backends import load_cross_encoder
+from model_server.model_backends import load_sentence_transformer
+from model_server.provider_clients import get_provider_http_client
+from model_server.provider_clients import get_provider_rate_limiter
 from model_server.utils import pass_aws_key
 from model_server.utils import simple_log_function_time
 from onyx.utils.logger import setup_logger
 from shared_configs.configs import API_BASED_EMBEDDING_TIMEOUT
+from shared_configs.configs import EMBEDDING_MODEL_BACKENDS
 from shared_configs.configs import INDEXING_ONLY
+from shared_configs.configs import MODEL_SERVER_MAX_BATCH_SIZE
+from shared_configs.configs import MODEL_SERVER_MAX_BATCH_WAIT_MS
 from shared_configs.configs import OPENAI_EMBEDDING_TIMEOUT
+from shared_configs.configs import RERANK_MODEL_BACKENDS
 from shared_configs.configs import VERTEXAI_EMBEDDING_LOCAL_BATCH_SIZE
 from shared_configs.enums import EmbedTextType
 from shared_configs.enums import RerankerProvider
 from shared_configs.model_server_models import Embedding
+from shared_configs.model_server_models import EMBEDDING_DIM_HEADER
 from shared_configs.model_server_models import EmbedRequest
 from shared_configs.model_server_models import EmbedResponse
+from shared_configs.model_server_models import encode_binary_embeddings
+from shared_configs.model_server_models import get_binary_embedding_media_type
 from shared_configs.model_server_models import RerankRequest
 from shared_configs.model_server_models import RerankResponse
 from shared_configs.utils import batch_list
@@ -52,6 +69,20 @@ router = APIRouter(prefix="/encoder")
 
 _GLOBAL_MODELS_DICT: dict[str, "SentenceTransformer"] = {}
 _RERANK_MODEL: Optional["CrossEncoder"] = None
+# Requests set the real max context length of the model
+_WARM_UP_MAX_CONTEXT_LENGTH = 512
+
+# Coalesce concurrent requests for the same local model into one forward pass
+_EMBED_BATCHER: MicroBatcher[str, np.ndarray | list[Embedding]] = MicroBatcher(
+    name="embed",
+    max_batch_size=MODEL_SERVER_MAX_BATCH_SIZE,
+    max_wait_seconds=MODEL_SERVER_MAX_BATCH_WAIT_MS / 1000,
+)
+_RERANK_BATCHER: MicroBatcher[tuple[str, str], list[float]] = MicroBatcher(
+    name="rerank",
+    max_batch_size=MODEL_SERVER_MAX_BATCH_SIZE,
+    max_wait_seconds=MODEL_SERVER_MAX_BATCH_WAIT_MS / 1000,
+)
 
 # If we are not only indexing, dont want retry very long
 _RETRY_DELAY = 10 if INDEXING_ONLY else 0.1
@@ -131,7 +162,6 @@ class CloudEmbedding:
         self.api_url = api_url
         self.api_version = api_version
         self.timeout = timeout
-        self.http_client = httpx.AsyncClient(timeout=timeout)
         self._closed = False
 
     async def _embed_openai(
@@ -142,7 +172,9 @@ class CloudEmbedding:
 
         # Use the OpenAI specific timeout for this one
         client = openai.AsyncOpenAI(
-            api_key=self.api_key, timeout=OPENAI_EMBEDDING_TIMEOUT
+            api_key=self.api_key,
+            timeout=OPENAI_EMBEDDING_TIMEOUT,
+            http_client=get_provider_http_client(self.provider),
         )
 
         final_embeddings: list[Embedding] = []
@@ -164,7 +196,10 @@ class CloudEmbedding:
         if not model:
             model = DEFAULT_COHERE_MODEL
 
-        client = CohereAsyncClient(api_key=self.api_key)
+        client = CohereAsyncClient(
+            api_key=self.api_key,
+            httpx_client=get_provider_http_client(self.provider),
+        )
 
         final_embeddings: list[Embedding] = []
         for text_batch in batch_list(texts, _COHERE_MAX_INPUT_LEN):
@@ -256,18 +291,44 @@ class CloudEmbedding:
             {} if not self.api_key else {"Authorization": f"Bearer {self.api_key}"}
         )
 
-        response = await self.http_client.post(
+        response = await get_provider_http_client(self.provider).post(
             self.api_url,
             json={
                 "model": model_name,
                 "input": texts,
             },
             headers=headers,
+            timeout=self.timeout,
         )
         response.raise_for_status()
         result = response.json()
         return [embedding["embedding"] for embedding in result["data"]]
 
+    async def _embed_with_provider(
+        self,
+        texts: list[str],
+        text_type: EmbedTextType,
+        model_name: str | None,
+        deployment_name: str | None,
+        reduced_dimension: int | None,
+    ) -> list[Embedding]:
+        if self.provider == EmbeddingProvider.OPENAI:
+            return await self._embed_openai(texts, model_name, reduced_dimension)
+        elif self.provider == EmbeddingProvider.AZURE:
+            return await self._embed_azure(texts, f"azure/{deployment_name}")
+        elif self.provider == EmbeddingProvider.LITELLM:
+            return await self._embed_litellm_proxy(texts, model_name)
+
+        embedding_type = EmbeddingModelTextType.get_type(self.provider, text_type)
+        if self.provider == EmbeddingProvider.COHERE:
+            return await self._embed_cohere(texts, model_name, embedding_type)
+        elif self.provider == EmbeddingProvider.VOYAGE:
+            return await self._embed_voyage(texts, model_name, embedding_type)
+        elif self.provider == EmbeddingProvider.GOOGLE:
+            return await self._embed_vertex(texts, model_name, embedding_type)
+        else:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+
     @retry(tries=_RETRY_TRIES, delay=_RETRY_DELAY)
     async def embed(
         self,
@@ -279,22 +340,16 @@ class CloudEmbedding:
         reduced_dimension: int | None = None,
     ) -> list[Embedding]:
         try:
-            if self.provider == EmbeddingProvider.OPENAI:
-                return await self._embed_openai(texts, model_name, reduced_dimension)
-            elif self.provider == EmbeddingProvider.AZURE:
-                return await self._embed_azure(texts, f"azure/{deployment_name}")
-            elif self.provider == EmbeddingProvider.LITELLM:
-                return await self._embed_litellm_proxy(texts, model_name)
-
-            embedding_type = EmbeddingModelTextType.get_type(self.provider, text_type)
-            if self.provider == EmbeddingProvider.COHERE:
-                return await self._embed_cohere(texts, model_name, embedding_type)
-            elif self.provider == EmbeddingProvider.VOYAGE:
-                return await self._embed_voyage(texts, model_name, embedding_type)
-            elif self.provider == EmbeddingProvider.GOOGLE:
-                return await self._embed_vertex(texts, model_name, embedding_type)
-            else:
-                raise ValueError(f"Unsupported provider: {self.provider}")
+            # bounds the concurrency per provider and backs off on rate limits
+            return await get_provider_rate_limiter(self.provider).run(
+                lambda: self._embed_with_provider(
+                    texts=texts,
+                    text_type=text_type,
+                    model_name=model_name,
+                    deployment_name=deployment_name,
+                    reduced_dimension=reduced_dimension,
+                )
+            )
         except openai.AuthenticationError:
             raise AuthenticationError(provider="OpenAI")
         except httpx.HTTPStatusError as e:
@@ -335,10 +390,9 @@ class CloudEmbedding:
         return CloudEmbedding(api_key, provider, api_url, api_version)
 
     async def aclose(self) -> None:
-        """Explicitly close the client."""
-        if not self._closed:
-            await self.http_client.aclose()
-            self._closed = True
+        """Explicitly close the client. The HTTP connection pools are shared between
+        instances and stay open for reuse."""
+        self._closed = True
 
     async def __aenter__(self) -> "CloudEmbedding":
         return self
@@ -363,19 +417,12 @@ def get_embedding_model(
     model_name: str,
     max_context_length: int,
 ) -> "SentenceTransformer":
-    from sentence_transformers import SentenceTransformer  # type: ignore
-
     global _GLOBAL_MODELS_DICT  # A dictionary to store models
 
     if model_name not in _GLOBAL_MODELS_DICT:
-        logger.notice(f"Loading {model_name}")
-        # Some model architectures that aren't built into the Transformers or Sentence
-        # Transformer need to be downloaded to be loaded locally. This does not mean
-        # data is sent to remote servers for inference, however the remote code can
-        # be fairly arbitrary so only use trusted models
-        model = SentenceTransformer(
-            model_name_or_path=model_name,
-            trust_remote_code=True,
+        model = load_sentence_transformer(
+            model_name=model_name,
+            backend=get_model_backend(model_name, EMBEDDING_MODEL_BACKENDS),
         )
         model.max_seq_length = max_context_length
         _GLOBAL_MODELS_DICT[model_name] = model
@@ -390,13 +437,36 @@ def get_local_reranking_model(
 ) -> CrossEncoder:
     global _RERANK_MODEL
     if _RERANK_MODEL is None:
-        logger.notice(f"Loading {model_name}")
-        model = CrossEncoder(model_name)
-        _RERANK_MODEL = model
+        _RERANK_MODEL = load_cross_encoder(
+            model_name=model_name,
+            backend=get_model_backend(model_name, RERANK_MODEL_BACKENDS),
+        )
     return _RERANK_MODEL
 
 
-@simple_log_function_time()
+def warm_up_local_models() -> None:
+    """Loads the models with a configured backend so the first requests don't pay
+    for loading (and possibly exporting / quantizing) them."""
+    for model_name in EMBEDDING_MODEL_BACKENDS:
+        logger.notice(f"Warming up embedding model {model_name}")
+        get_embedding_model(
+            model_name=model_name, max_context_length=_WARM_UP_MAX_CONTEXT_LENGTH
+        ).encode([MODEL_WARM_UP_STRING])
+
+    if INDEXING_ONLY:
+        return
+
+    for model_name in RERANK_MODEL_BACKENDS:
+        logger.notice(f"Warming up reranking model {model_name}")
+        get_local_reranking_model(model_name).predict(
+            [(MODEL_WARM_UP_STRING, MODEL_WARM_UP_STRING)]
+        )
+
+
+def _embeddings_to_list(embeddings: np.ndarray | list[Embedding]) -> list[Embedding]:
+    return embeddings.tolist() if isinstance(embeddings, np.ndarray) else embeddings
+
+
 async def embed_text(
     texts: list[str],
     text_type: EmbedTextType,
@@ -412,6 +482,44 @@ async def embed_text(
     reduced_dimension: int | None,
     gpu_type: str = "UNKNOWN",
 ) -> list[Embedding]:
+    embeddings = await embed_text_vectors(
+        texts=texts,
+        text_type=text_type,
+        model_name=model_name,
+        deployment_name=deployment_name,
+        max_context_length=max_context_length,
+        normalize_embeddings=normalize_embeddings,
+        api_key=api_key,
+        provider_type=provider_type,
+        prefix=prefix,
+        api_url=api_url,
+        api_version=api_version,
+        reduced_dimension=reduced_dimension,
+        gpu_type=gpu_type,
+    )
+    return _embeddings_to_list(embeddings)
+
+
+@simple_log_function_time()
+async def embed_text_vectors(
+    texts: list[str],
+    text_type: EmbedTextType,
+    model_name: str | None,
+    deployment_name: str | None,
+    max_context_length: int,
+    normalize_embeddings: bool,
+    api_key: str | None,
+    provider_type: EmbeddingProvider | None,
+    prefix: str | None,
+    api_url: str | None,
+    api_version: str | None,
+    reduced_dimension: int | None,
+    gpu_type: str = "UNKNOWN",
+) -> np.ndarray | list[Embedding]:
+    """Same as embed_text, but local models return their output matrix as is so
+    that it can be sent in a binary format without converting it to Python floats."""
+    embeddings: np.ndarray | list[Embedding]
+
     if not all(texts):
         logger.error("Empty strings provided for embedding")
         raise ValueError("Empty strings are not allowed for embedding.")
@@ -481,17 +589,23 @@ async def embed_text(
         local_model = get_embedding_model(
             model_name=model_name, max_context_length=max_context_length
         )
-        # Run CPU-bound embedding in a thread pool
-        embeddings_vectors = await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: local_model.encode(
-                prefixed_texts, normalize_embeddings=normalize_embeddings
+        # Run CPU-bound embedding in a thread pool, batched together with other
+        # requests for the same model
+        embeddings_vectors = await _EMBED_BATCHER.submit(
+            key=(model_name, max_context_length, normalize_embeddings),
+            inputs=prefixed_texts,
+            process_batch=lambda batch_texts: local_model.encode(
+                batch_texts, normalize_embeddings=normalize_embeddings
             ),
         )
-        embeddings = [
-            embedding if isinstance(embedding, list) else embedding.tolist()
-            for embedding in embeddings_vectors
-        ]
+        embeddings = (
+            embeddings_vectors
+            if isinstance(embeddings_vectors, np.ndarray)
+            else [
+                embedding if isinstance(embedding, list) else embedding.tolist()
+                for embedding in embeddings_vectors
+            ]
+        )
 
         elapsed = time.monotonic() - start
         logger.info(
@@ -518,10 +632,12 @@ async def embed_text(
 @simple_log_function_time()
 async def local_rerank(query: str, docs: list[str], model_name: str) -> list[float]:
     cross_encoder = get_local_reranking_model(model_name)
-    # Run CPU-bound reranking in a thread pool
-    return await asyncio.get_event_loop().run_in_executor(
-        None,
-        lambda: cross_encoder.predict([(query, doc) for doc in docs]).tolist(),  # type: ignore
+    # Run CPU-bound reranking in a thread pool, batched together with other
+    # requests for the same model
+    return await _RERANK_BATCHER.submit(
+        key=model_name,
+        inputs=[(query, doc) for doc in docs],
+        process_batch=lambda pairs: cross_encoder.predict(pairs).tolist(),  # type: ignore
     )
 
 
@@ -596,17 +712,37 @@ async def litellm_rerank(
         ]
 
 
-@router.post("/bi-encoder-embed")
+@router.post("/bi-encoder-embed", response_model=EmbedResponse)
 async def route_bi_encoder_embed(
     request: Request,
     embed_request: EmbedRequest,
-) -> EmbedResponse:
-    return await process_embed_request(embed_request, request.app.state.gpu_type)
+) -> Response:
+    # clients that can decode raw vectors ask for them via the Accept header,
+    # everyone else gets the JSON EmbedResponse
+    binary_media_type = get_binary_embedding_media_type(request.headers.get("accept"))
+    embeddings = await _run_embed_request(embed_request, request.app.state.gpu_type)
+
+    if binary_media_type is None:
+        return JSONResponse(content={"embeddings": _embeddings_to_list(embeddings)})
+
+    content, dim = encode_binary_embeddings(embeddings, binary_media_type)
+    return Response(
+        content=content,
+        media_type=binary_media_type,
+        headers={EMBEDDING_DIM_HEADER: str(dim)},
+    )
 
 
 async def process_embed_request(
     embed_request: EmbedRequest, gpu_type: str = "UNKNOWN"
 ) -> EmbedResponse:
+    embeddings = await _run_embed_request(embed_request, gpu_type)
+    return EmbedResponse(embeddings=_embeddings_to_list(embeddings))
+
+
+async def _run_embed_request(
+    embed_request: EmbedRequest, gpu_type: str = "UNKNOWN"
+) -> np.ndarray | list[Embedding]:
     if not embed_request.texts:
         raise HTTPException(status_code=400, detail="No texts to be embedded")
 
@@ -621,7 +757,7 @@ async def process_embed_request(
         else:
             prefix = None
 
-        embeddings = await embed_text(
+        return await embed_text_vectors(
             texts=embed_request.texts,
             model_name=embed_request.model_name,
             deployment_name=embed_request.deployment_name,
@@ -636,7 +772,6 @@ async def process_embed_request(
             prefix=prefix,
             gpu_type=gpu_type,
         )
-        return EmbedResponse(embeddings=embeddings)
     except AuthenticationError as e:
         # Handle authentication errors consistently
         logger.error(f"Authentication error: {e.provider}")
@@ -0,0 +1,130 @@
+import asyncio
+import multiprocessing
+import os
+from collections.abc import Callable
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from functools import partial
+from multiprocessing.synchronize import Semaphore as SemaphoreType
+from typing import Any
+from typing import TypeVar
+
+from onyx.utils.logger import setup_logger
+from shared_configs.configs import MODEL_SERVER_INFERENCE_PROCESS_POOL
+from shared_configs.configs import MODEL_SERVER_INFERENCE_WORKERS
+from shared_configs.configs import MODEL_SERVER_PER_MODEL_CONCURRENCY
+
+logger = setup_logger()
+
+R = TypeVar("R")
+
+_INFERENCE_EXECUTOR: Executor | None = None
+_MODEL_SEMAPHORES: dict[str, asyncio.Semaphore] = {}
+
+
+def _init_inference_process(
+    warm_up: Callable[[], None] | None, ready: SemaphoreType
+) -> None:
+    import torch
+
+    # split the cores between the worker processes instead of every process
+    # starting one torch thread per core
+    torch.set_num_threads(
+        max(1, (os.cpu_count() or 1) // MODEL_SERVER_INFERENCE_WORKERS)
+    )
+    if warm_up is not None:
+        warm_up()
+    ready.release()
+
+
+def _noop() -> None:
+    pass
+
+
+def _wait_for_workers(executor: ProcessPoolExecutor, ready: SemaphoreType) -> None:
+    """Worker processes are only started as tasks come in, so without this the
+    models would be loaded while serving the first requests."""
+    # every submit starts another worker until all of them are running
+    futures = [executor.submit(_noop) for _ in range(MODEL_SERVER_INFERENCE_WORKERS)]
+
+    num_ready = 0
+    while num_ready < MODEL_SERVER_INFERENCE_WORKERS:
+        if ready.acquire(timeout=1):
+            num_ready += 1
+            continue
+        # raises if a worker died while starting up, e.g. failing to load a model
+        for future in futures:
+            if future.done():
+                future.result()
+
+    wait(futures)
+
+
+def start_inference_pool(warm_up: Callable[[], None] | None = None) -> None:
+    """Creates the inference pool and loads the models with warm_up before
+    returning, in every worker process when running in process pool mode."""
+    global _INFERENCE_EXECUTOR
+
+    if _INFERENCE_EXECUTOR is not None:
+        return
+
+    if MODEL_SERVER_INFERENCE_PROCESS_POOL:
+        logger.notice(
+            f"Starting inference process pool with "
+            f"{MODEL_SERVER_INFERENCE_WORKERS} workers"
+        )
+        # torch and forking don't mix, start clean interpreters instead
+        mp_context = multiprocessing.get_context("spawn")
+        ready = mp_context.Semaphore(0)
+        executor = ProcessPoolExecutor(
+            max_workers=MODEL_SERVER_INFERENCE_WORKERS,
+            mp_context=mp_context,
+            initializer=_init_inference_process,
+            initargs=(warm_up, ready),
+        )
+        try:
+            _wait_for_workers(executor, ready)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        _INFERENCE_EXECUTOR = executor
+        return
+
+    logger.notice(
+        f"Starting inference thread pool with {MODEL_SERVER_INFERENCE_WORKERS} workers"
+    )
+    _INFERENCE_EXECUTOR = ThreadPoolExecutor(
+        max_workers=MODEL_SERVER_INFERENCE_WORKERS,
+        thread_name_prefix="inference",
+    )
+    if warm_up is not None:
+        warm_up()
+
+
+def shutdown_inference_pool() -> None:
+    global _INFERENCE_EXECUTOR
+
+    if _INFERENCE_EXECUTOR is not None:
+        _INFERENCE_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _INFERENCE_EXECUTOR = None
+
+
+async def run_model_inference(model_name: str, func: Callable[..., R], *args: Any) -> R:
+    """Runs the blocking inference function in the inference pool, allowing at most
+    MODEL_SERVER_PER_MODEL_CONCURRENCY concurrent calls per model. In process pool
+    mode func and its arguments must be picklable and func must load its models
+    lazily, since it runs in a separate process."""
+    if _INFERENCE_EXECUTOR is None:
+        start_inference_pool()
+
+    semaphore = _MODEL_SEMAPHORES.get(model_name)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MODEL_SERVER_PER_MODEL_CONCURRENCY)
+        _MODEL_SEMAPHORES[model_name] = semaphore
+
+    async with semaphore:
+        return await asyncio.get_running_loop().run_in_executor(
+            _INFERENCE_EXECUTOR, partial(func, *args)
+        )
@@ -18,7 +18,11 @@ from model_server.custom_models import router as custom_models_router
 from model_server.custom_models import warm_up_information_content_model
 from model_server.custom_models import warm_up_intent_model
 from model_server.encoders import router as encoders_router
+from model_server.encoders import warm_up_local_models
+from model_server.inference_pool import shutdown_inference_pool
+from model_server.inference_pool import start_inference_pool
 from model_server.management_endpoints import router as management_router
+from model_server.provider_clients import close_provider_clients
 from model_server.utils import get_gpu_type
 from onyx import __version__
 from onyx.utils.logger import setup_logger
@@ -91,19 +95,26 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     torch.set_num_threads(max(MIN_THREADS_ML_MODELS, torch.get_num_threads()))
     logger.notice(f"Torch Threads: {torch.get_num_threads()}")
 
+    warm_up_local_models()
+
+    # The models are warmed up by the inference pool, in every worker process when
+    # running with a process pool
     if not INDEXING_ONLY:
         logger.notice(
             "The intent model should run on the model server. The information content model should not run here."
         )
-        warm_up_intent_model()
+        start_inference_pool(warm_up=warm_up_intent_model)
     else:
         logger.notice(
             "The content information model should run on the indexing model server. The intent model should not run here."
         )
-        warm_up_information_content_model()
+        start_inference_pool(warm_up=warm_up_information_content_model)
 
     yield
 
+    shutdown_inference_pool()
+    await close_provider_clients()
+
 
 def get_model_app() -> FastAPI:
     application = FastAPI(
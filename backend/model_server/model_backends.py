@@ -0,0 +1,102 @@
+from enum import Enum
+from typing import TYPE_CHECKING
+
+import torch
+
+from onyx.utils.logger import setup_logger
+
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder  # type: ignore
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
+logger = setup_logger()
+
+
+class LocalModelBackend(str, Enum):
+    # full precision torch model, the default
+    TORCH = "torch"
+    # torch model with its Linear layers dynamically quantized to int8, CPU only
+    TORCH_INT8 = "torch_int8"
+    # ONNX Runtime via sentence transformers, requires optimum[onnxruntime]
+    ONNX = "onnx"
+
+
+def get_model_backend(
+    model_name: str, model_backends: dict[str, str]
+) -> LocalModelBackend:
+    backend = model_backends.get(model_name)
+    if backend is None:
+        return LocalModelBackend.TORCH
+
+    try:
+        return LocalModelBackend(backend.lower())
+    except ValueError:
+        logger.warning(
+            f"Unknown backend '{backend}' for model {model_name}, "
+            f"supported backends are {[b.value for b in LocalModelBackend]}. "
+            "Falling back to torch."
+        )
+        return LocalModelBackend.TORCH
+
+
+def _quantize_to_int8(module: torch.nn.Module, model_name: str) -> None:
+    if torch.cuda.is_available():
+        # dynamic quantization only has CPU kernels
+        logger.warning(
+            f"Not quantizing {model_name} since a GPU is available, using torch"
+        )
+        return
+
+    torch.quantization.quantize_dynamic(
+        module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def load_sentence_transformer(
+    model_name: str, backend: LocalModelBackend
+) -> "SentenceTransformer":
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
+    logger.notice(f"Loading {model_name} with the {backend.value} backend")
+    # Some model architectures that aren't built into the Transformers or Sentence
+    # Transformer need to be downloaded to be loaded locally. This does not mean
+    # data is sent to remote servers for inference, however the remote code can
+    # be fairly arbitrary so only use trusted models
+    if backend == LocalModelBackend.ONNX:
+        try:
+            # exports the model to ONNX if the repo doesn't include an export
+            return SentenceTransformer(
+                model_name_or_path=model_name,
+                trust_remote_code=True,
+                backend="onnx",
+            )
+        except Exception:
+            logger.exception(
+                f"Failed to load {model_name} with ONNX Runtime, using torch"
+            )
+
+    model = SentenceTransformer(
+        model_name_or_path=model_name,
+        trust_remote_code=True,
+    )
+    if backend == LocalModelBackend.TORCH_INT8:
+        _quantize_to_int8(model, model_name)
+    return model
+
+
+def load_cross_encoder(model_name: str, backend: LocalModelBackend) -> "CrossEncoder":
+    from sentence_transformers import CrossEncoder  # type: ignore
+
+    logger.notice(f"Loading {model_name} with the {backend.value} backend")
+    if backend == LocalModelBackend.ONNX:
+        try:
+            return CrossEncoder(model_name, backend="onnx")
+        except Exception:
+            logger.exception(
+                f"Failed to load {model_name} with ONNX Runtime, using torch"
+            )
+
+    model = CrossEncoder(model_name)
+    if backend == LocalModelBackend.TORCH_INT8:
+        _quantize_to_int8(model.model, model_name)
+    return model
@@ -0,0 +1,208 @@
+import asyncio
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Any
+from typing import TypeVar
+
+import httpx
+
+from model_server.constants import EmbeddingProvider
+from onyx.utils.logger import setup_logger
+from shared_configs.configs import API_BASED_EMBEDDING_TIMEOUT
+from shared_configs.configs import CLOUD_EMBEDDING_MAX_CONCURRENCY
+from shared_configs.configs import CLOUD_EMBEDDING_RATE_LIMIT_RETRIES
+
+logger = setup_logger()
+
+R = TypeVar("R")
+
+_RATE_LIMIT_STATUS_CODE = 429
+# Used when a rate limited response doesn't say how long to wait
+_DEFAULT_RETRY_AFTER_SECONDS = 1.0
+_MAX_RETRY_AFTER_SECONDS = 60.0
+
+
+def _parse_retry_after(headers: Any) -> float | None:
+    try:
+        lowered_headers = {
+            str(key).lower(): str(value) for key, value in headers.items()
+        }
+    except Exception:
+        return None
+
+    # OpenAI also sends a millisecond precision variant
+    retry_after_ms = lowered_headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = lowered_headers.get("retry-after")
+    if retry_after is None:
+        return None
+
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+
+    # Retry-After may also be an HTTP date
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return (retry_at - datetime.now(timezone.utc)).total_seconds()
+
+
+def get_retry_after_seconds(error: Exception) -> float | None:
+    """Returns how long to wait before retrying if the error is a 429 from the
+    provider, None if the error is not a rate limit. Works for httpx errors as well
+    as the errors raised by the provider SDKs, which all carry a status code and
+    usually the response."""
+    response = getattr(error, "response", None)
+    status_code = getattr(error, "status_code", None) or getattr(
+        response, "status_code", None
+    )
+    if status_code != _RATE_LIMIT_STATUS_CODE:
+        return None
+
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None)
+    retry_after = _parse_retry_after(headers) if headers is not None else None
+    if retry_after is None:
+        retry_after = _DEFAULT_RETRY_AFTER_SECONDS
+
+    return min(max(retry_after, 0.0), _MAX_RETRY_AFTER_SECONDS)
+
+
+class AdaptiveRateLimiter:
+    """Bounds the number of concurrent calls to a provider.
+
+    When a call is rate limited, all calls to the provider are paused for the
+    Retry-After of the response, the concurrency is halved and the call is retried.
+    The concurrency then grows back by about one for every window of successful
+    calls, up to max_concurrency."""
+
+    def __init__(self, max_concurrency: int, max_retries: int) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._concurrency_limit = float(max_concurrency)
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._condition = asyncio.Condition()
+
+    @property
+    def concurrency_limit(self) -> int:
+        return max(1, int(self._concurrency_limit))
+
+    async def _acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self._in_flight < self.concurrency_limit
+            )
+            self._in_flight += 1
+
+    async def _release(self) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def _on_success(self) -> None:
+        self._concurrency_limit = min(
+            float(self.max_concurrency),
+            self._concurrency_limit + 1 / self._concurrency_limit,
+        )
+
+    def _on_rate_limited(self, retry_after: float) -> None:
+        now = time.monotonic()
+        # calls that were already in flight when the pause started don't shrink
+        # the concurrency again
+        if now >= self._paused_until:
+            self._concurrency_limit = max(1.0, self._concurrency_limit / 2)
+        self._paused_until = max(self._paused_until, now + retry_after)
+
+    async def run(self, call: Callable[[], Awaitable[R]]) -> R:
+        num_retries = 0
+        while True:
+            await self._acquire()
+            try:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+
+                result = await call()
+            except Exception as e:
+                retry_after = get_retry_after_seconds(e)
+                if retry_after is None or num_retries >= self.max_retries:
+                    raise
+
+                num_retries += 1
+                self._on_rate_limited(retry_after)
+                logger.warning(
+                    f"Rate limited by the embedding provider, retrying in "
+                    f"{retry_after:.1f}s (attempt {num_retries}/{self.max_retries}). "
+                    f"Concurrency limit is now {self.concurrency_limit}"
+                )
+                continue
+            finally:
+                await self._release()
+
+            self._on_success()
+            return result
+
+
+@dataclass
+class _ProviderResources:
+    loop: asyncio.AbstractEventLoop
+    http_client: httpx.AsyncClient
+    rate_limiter: AdaptiveRateLimiter
+
+
+_PROVIDER_RESOURCES: dict[EmbeddingProvider, _ProviderResources] = {}
+
+
+def _get_provider_resources(provider: EmbeddingProvider) -> _ProviderResources:
+    # httpx clients and asyncio primitives are bound to the event loop they are
+    # used on, the model server runs a single loop so this only matters for tests
+    loop = asyncio.get_running_loop()
+    resources = _PROVIDER_RESOURCES.get(provider)
+    if resources is None or resources.loop is not loop:
+        resources = _ProviderResources(
+            loop=loop,
+            http_client=httpx.AsyncClient(
+                timeout=API_BASED_EMBEDDING_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=CLOUD_EMBEDDING_MAX_CONCURRENCY,
+                    max_keepalive_connections=CLOUD_EMBEDDING_MAX_CONCURRENCY,
+                ),
+            ),
+            rate_limiter=AdaptiveRateLimiter(
+                max_concurrency=CLOUD_EMBEDDING_MAX_CONCURRENCY,
+                max_retries=CLOUD_EMBEDDING_RATE_LIMIT_RETRIES,
+            ),
+        )
+        _PROVIDER_RESOURCES[provider] = resources
+    return resources
+
+
+def get_provider_http_client(provider: EmbeddingProvider) -> httpx.AsyncClient:
+    """Long lived client with a keep-alive connection pool, shared by all requests
+    to the provider. Must not be closed by the caller."""
+    return _get_provider_resources(provider).http_client
+
+
+def get_provider_rate_limiter(provider: EmbeddingProvider) -> AdaptiveRateLimiter:
+    return _get_provider_resources(provider).rate_limiter
+
+
+async def close_provider_clients() -> None:
+    for resources in _PROVIDER_RESOURCES.values():
+        await resources.http_client.aclose()
+    _PROVIDER_RESOURCES.clear()
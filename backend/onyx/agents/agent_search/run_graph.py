@@ -1,9 +1,14 @@
+import threading
+import time
+from collections.abc import Callable
 from collections.abc import Iterable
 from datetime import datetime
+from enum import Enum
 from typing import cast
 
 from langchain_core.runnables.schema import CustomStreamEvent
 from langchain_core.runnables.schema import StreamEvent
+from langgraph.graph import StateGraph
 from langgraph.graph.state import CompiledStateGraph
 
 from onyx.agents.agent_search.basic.graph_builder import basic_graph_builder
@@ -41,7 +46,23 @@ from onyx.utils.logger import setup_logger
 
 logger = setup_logger()
 
-_COMPILED_GRAPH: CompiledStateGraph | None = None
+
+class AgentGraph(str, Enum):
+    BASIC = "basic"
+    DEEP_SEARCH = "deep_search"
+    DC_SEARCH_ANALYSIS = "dc_search_analysis"
+
+
+# The orchestration nodes (tool choice / tool call) have no graph of their own,
+# they are part of the basic graph
+_GRAPH_BUILDERS: dict[AgentGraph, Callable[[], StateGraph]] = {
+    AgentGraph.BASIC: basic_graph_builder,
+    AgentGraph.DEEP_SEARCH: main_graph_builder_a,
+    AgentGraph.DC_SEARCH_ANALYSIS: divide_and_conquer_graph_builder,
+}
+
+_COMPILED_GRAPHS: dict[AgentGraph, CompiledStateGraph] = {}
+_COMPILED_GRAPHS_LOCK = threading.Lock()
 
 
 def _parse_agent_event(
@@ -115,20 +136,38 @@ def run_graph(
         yield parsed_object
 
 
-# It doesn't actually take very long to load the graph, but we'd rather
-# not compile it again on every request.
-def load_compiled_graph() -> CompiledStateGraph:
-    global _COMPILED_GRAPH
-    if _COMPILED_GRAPH is None:
-        graph = main_graph_builder_a()
-        _COMPILED_GRAPH = graph.compile()
-    return _COMPILED_GRAPH
+# Compiled graphs are stateless and shared by all requests, so every graph is only
+# compiled once per process
+def load_compiled_graph(
+    agent_graph: AgentGraph = AgentGraph.DEEP_SEARCH,
+) -> CompiledStateGraph:
+    compiled_graph = _COMPILED_GRAPHS.get(agent_graph)
+    if compiled_graph is not None:
+        return compiled_graph
+
+    with _COMPILED_GRAPHS_LOCK:
+        compiled_graph = _COMPILED_GRAPHS.get(agent_graph)
+        if compiled_graph is None:
+            start_time = time.monotonic()
+            compiled_graph = _GRAPH_BUILDERS[agent_graph]().compile()
+            logger.info(
+                f"Compiled the {agent_graph.value} graph in "
+                f"{time.monotonic() - start_time:.3f} seconds"
+            )
+            _COMPILED_GRAPHS[agent_graph] = compiled_graph
+    return compiled_graph
+
+
+def compile_agent_graphs() -> None:
+    """Compiles all agent graphs, called on startup so that no request has to"""
+    for agent_graph in AgentGraph:
+        load_compiled_graph(agent_graph)
 
 
 def run_main_graph(
     config: GraphConfig,
 ) -> AnswerStream:
-    compiled_graph = load_compiled_graph()
+    compiled_graph = load_compiled_graph(AgentGraph.DEEP_SEARCH)
 
     input = MainInput(log_messages=[])
 
@@ -143,8 +182,7 @@ def run_main_graph(
 def run_basic_graph(
     config: GraphConfig,
 ) -> AnswerStream:
-    graph = basic_graph_builder()
-    compiled_graph = graph.compile()
+    compiled_graph = load_compiled_graph(AgentGraph.BASIC)
     input = BasicInput(unused=True)
     return run_graph(compiled_graph, config, input)
 
@@ -152,8 +190,7 @@ def run_basic_graph(
 def run_dc_graph(
     config: GraphConfig,
 ) -> AnswerStream:
-    graph = divide_and_conquer_graph_builder()
-    compiled_graph = graph.compile()
+    compiled_graph = load_compiled_graph(AgentGraph.DC_SEARCH_ANALYSIS)
     input = DCMainInput(log_messages=[])
     config.inputs.search_request.query = config.inputs.search_request.query.strip()
     return run_graph(compiled_graph, config, input)
@@ -163,8 +200,7 @@ if __name__ == "__main__":
     for _ in range(1):
         query_start_time = datetime.now()
         logger.debug(f"Start at {query_start_time}")
-        graph = main_graph_builder_a()
-        compiled_graph = graph.compile()
+        compiled_graph = load_compiled_graph(AgentGraph.DEEP_SEARCH)
         query_end_time = datetime.now()
         logger.debug(f"Graph compiled in {query_end_time - query_start_time} seconds")
         primary_llm, fast_llm = get_default_llms()
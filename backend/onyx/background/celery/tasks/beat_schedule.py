@@ -46,6 +46,15 @@ beat_task_templates.extend(
                 "expires": BEAT_EXPIRES_DEFAULT,
             },
         },
+        {
+            "name": "reconcile-token-usage-counters",
+            "task": OnyxCeleryTask.RECONCILE_TOKEN_USAGE_COUNTERS_TASK,
+            "schedule": timedelta(minutes=15),
+            "options": {
+                "priority": OnyxCeleryPriority.LOW,
+                "expires": BEAT_EXPIRES_DEFAULT,
+            },
+        },
         {
             "name": "check-for-connector-deletion",
             "task": OnyxCeleryTask.CHECK_FOR_CONNECTOR_DELETION,
@@ -5,17 +5,23 @@ import json
 from typing import Any
 
 from celery import shared_task
+from celery import Task
 from celery.contrib.abortable import AbortableTask  # type: ignore
 from celery.exceptions import TaskRevokedError
+from redis.lock import Lock as RedisLock
 from sqlalchemy import inspect
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from onyx.background.celery.apps.app_base import task_logger
 from onyx.configs.app_configs import JOB_TIMEOUT
+from onyx.configs.constants import CELERY_GENERIC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryTask
+from onyx.configs.constants import OnyxRedisLocks
 from onyx.configs.constants import PostgresAdvisoryLocks
 from onyx.db.engine import get_session_with_current_tenant
+from onyx.redis.redis_pool import get_redis_client
+from onyx.server.query_and_chat.token_limit import reconcile_token_usage_counters
 
 
 @shared_task(
@@ -136,3 +142,41 @@ def kombu_message_cleanup_task_helper(ctx: dict, db_session: Session) -> bool:
         ctx["last_processed_id"] = msg[0]
 
     return True
+
+
+@shared_task(
+    name=OnyxCeleryTask.RECONCILE_TOKEN_USAGE_COUNTERS_TASK,
+    soft_time_limit=300,
+    bind=True,
+)
+def reconcile_token_usage_counters_task(self: Task, *, tenant_id: str) -> None:
+    """Recomputes the token usage counters used by the token rate limits from
+    Postgres, fixing drift from failed writes, rolled back messages and user group
+    membership changes."""
+    locked = False
+    redis_client = get_redis_client(tenant_id=tenant_id)
+    lock: RedisLock = redis_client.lock(
+        OnyxRedisLocks.RECONCILE_TOKEN_USAGE_COUNTERS_BEAT_LOCK,
+        timeout=CELERY_GENERIC_BEAT_LOCK_TIMEOUT,
+    )
+
+    # these tasks should never overlap
+    if not lock.acquire(blocking=False):
+        return None
+
+    try:
+        locked = True
+        with get_session_with_current_tenant() as db_session:
+            reconcile_token_usage_counters(db_session)
+    except Exception:
+        task_logger.exception("Unexpected exception during token usage reconciliation")
+        return None
+    finally:
+        if locked:
+            if lock.owned():
+                lock.release()
+            else:
+                task_logger.error(
+                    "reconcile_token_usage_counters_task - Lock not owned on "
+                    f"completion: tenant={tenant_id}"
+                )
@@ -1,3 +1,4 @@
+import concurrent.futures
 import time
 from collections.abc import Callable
 from http import HTTPStatus
@@ -15,12 +16,15 @@ from sqlalchemy.orm import Session
 from tenacity import RetryError
 
 from onyx.access.access import get_access_for_document
+from onyx.access.access import get_access_for_documents
+from onyx.access.access import get_null_document_access
 from onyx.background.celery.apps.app_base import task_logger
 from onyx.background.celery.tasks.shared.RetryDocumentIndex import RetryDocumentIndex
 from onyx.background.celery.tasks.shared.tasks import LIGHT_SOFT_TIME_LIMIT
 from onyx.background.celery.tasks.shared.tasks import LIGHT_TIME_LIMIT
 from onyx.background.celery.tasks.shared.tasks import OnyxCeleryTaskCompletionStatus
 from onyx.configs.app_configs import JOB_TIMEOUT
+from onyx.configs.app_configs import VESPA_SYNC_BATCH_CONCURRENCY
 from onyx.configs.app_configs import VESPA_SYNC_MAX_TASKS
 from onyx.configs.constants import CELERY_VESPA_SYNC_BEAT_LOCK_TIMEOUT
 from onyx.configs.constants import OnyxCeleryTask
@@ -29,10 +33,13 @@ from onyx.configs.constants import OnyxRedisLocks
 from onyx.db.connector_credential_pair import get_connector_credential_pairs
 from onyx.db.document import count_documents_by_needs_sync
 from onyx.db.document import get_document
+from onyx.db.document import get_documents_by_ids
 from onyx.db.document import mark_document_as_synced
+from onyx.db.document import mark_documents_as_synced
 from onyx.db.document_set import delete_document_set
 from onyx.db.document_set import fetch_document_sets
 from onyx.db.document_set import fetch_document_sets_for_document
+from onyx.db.document_set import fetch_document_sets_for_documents
 from onyx.db.document_set import get_document_set_by_id
 from onyx.db.document_set import mark_document_set_as_synced
 from onyx.db.engine import get_session_with_current_tenant
@@ -66,6 +73,10 @@ from onyx.utils.variable_functionality import noop_fallback
 
 logger = setup_logger()
 
+# A batch task syncs many documents, so allow it more time than a single document sync
+VESPA_SYNC_BATCH_SOFT_TIME_LIMIT = LIGHT_SOFT_TIME_LIMIT * 4
+VESPA_SYNC_BATCH_TIME_LIMIT = VESPA_SYNC_BATCH_SOFT_TIME_LIMIT + 15
+
 
 # celery auto associates tasks created inside another task,
 # which bloats the result metadata considerably. trail=False prevents this.
@@ -517,6 +528,41 @@ def monitor_document_set_taskset(
     rds.reset()
 
 
+def _handle_vespa_metadata_sync_exception(
+    task: Task, ex: Exception, log_context: str
+) -> tuple[OnyxCeleryTaskCompletionStatus, Exception | None]:
+    """Logs the exception raised by a vespa metadata sync task. Returns the resulting
+    completion status and the exception to retry the task with, if any."""
+    e: Exception | None = None
+    if isinstance(ex, RetryError):
+        task_logger.warning(
+            f"Tenacity retry failed: num_attempts={ex.last_attempt.attempt_number}"
+        )
+
+        # only set the inner exception if it is of type Exception
+        e_temp = ex.last_attempt.exception()
+        if isinstance(e_temp, Exception):
+            e = e_temp
+    else:
+        e = ex
+
+    if isinstance(e, httpx.HTTPStatusError):
+        if e.response.status_code == HTTPStatus.BAD_REQUEST:
+            task_logger.exception(
+                f"Non-retryable HTTPStatusError: "
+                f"{log_context} "
+                f"status={e.response.status_code}"
+            )
+        return OnyxCeleryTaskCompletionStatus.NON_RETRYABLE_EXCEPTION, None
+
+    task_logger.exception(f"{task.name} exceptioned: {log_context}")
+
+    if task.max_retries is not None and task.request.retries >= task.max_retries:
+        return OnyxCeleryTaskCompletionStatus.NON_RETRYABLE_EXCEPTION, e
+
+    return OnyxCeleryTaskCompletionStatus.RETRYABLE_EXCEPTION, e
+
+
 @shared_task(
     name=OnyxCeleryTask.VESPA_METADATA_SYNC_TASK,
     bind=True,
@@ -592,52 +638,153 @@ def vespa_metadata_sync_task(self: Task, document_id: str, *, tenant_id: str) ->
         task_logger.info(f"SoftTimeLimitExceeded exception. doc={document_id}")
         completion_status = OnyxCeleryTaskCompletionStatus.SOFT_TIME_LIMIT
     except Exception as ex:
-        e: Exception | None = None
-        while True:
-            if isinstance(ex, RetryError):
-                task_logger.warning(
-                    f"Tenacity retry failed: num_attempts={ex.last_attempt.attempt_number}"
-                )
+        completion_status, retry_exception = _handle_vespa_metadata_sync_exception(
+            self, ex, f"doc={document_id}"
+        )
+        if retry_exception:
+            # Exponential backoff from 2^4 to 2^6 ... i.e. 16, 32, 64
+            countdown = 2 ** (self.request.retries + 4)
+            # this will raise a celery exception
+            self.retry(exc=retry_exception, countdown=countdown)
+    finally:
+        task_logger.info(
+            f"vespa_metadata_sync_task completed: status={completion_status.value} doc={document_id}"
+        )
 
-                # only set the inner exception if it is of type Exception
-                e_temp = ex.last_attempt.exception()
-                if isinstance(e_temp, Exception):
-                    e = e_temp
-            else:
-                e = ex
-
-            if isinstance(e, httpx.HTTPStatusError):
-                if e.response.status_code == HTTPStatus.BAD_REQUEST:
-                    task_logger.exception(
-                        f"Non-retryable HTTPStatusError: "
-                        f"doc={document_id} "
-                        f"status={e.response.status_code}"
-                    )
-                completion_status = (
-                    OnyxCeleryTaskCompletionStatus.NON_RETRYABLE_EXCEPTION
+    if completion_status != OnyxCeleryTaskCompletionStatus.SUCCEEDED:
+        return False
+
+    return True
+
+
+@shared_task(
+    name=OnyxCeleryTask.VESPA_METADATA_SYNC_BATCH_TASK,
+    bind=True,
+    soft_time_limit=VESPA_SYNC_BATCH_SOFT_TIME_LIMIT,
+    time_limit=VESPA_SYNC_BATCH_TIME_LIMIT,
+    max_retries=3,
+)
+def vespa_metadata_sync_batch_task(
+    self: Task, document_ids: list[str], *, tenant_id: str
+) -> bool:
+    """Batched version of vespa_metadata_sync_task. Document sets and access are loaded
+    for the whole batch at once and the Vespa updates run concurrently.
+
+    Documents that were synced are marked as such even if others in the batch failed.
+    A retry only covers the documents that failed."""
+    start = time.monotonic()
+
+    completion_status = OnyxCeleryTaskCompletionStatus.UNDEFINED
+    failed_document_ids: list[str] = []
+
+    try:
+        with get_session_with_current_tenant() as db_session:
+            documents = get_documents_by_ids(db_session, document_ids)
+            if not documents:
+                elapsed = time.monotonic() - start
+                task_logger.info(
+                    f"docs={len(document_ids)} "
+                    f"action=no_operation "
+                    f"elapsed={elapsed:.2f}"
                 )
-                break
+                completion_status = OnyxCeleryTaskCompletionStatus.SKIPPED
+                return False
 
-            task_logger.exception(
-                f"vespa_metadata_sync_task exceptioned: doc={document_id}"
+            active_search_settings = get_active_search_settings(db_session)
+            doc_index = get_default_document_index(
+                search_settings=active_search_settings.primary,
+                secondary_search_settings=active_search_settings.secondary,
+                httpx_client=HttpxPool.get("vespa"),
             )
+            retry_index = RetryDocumentIndex(doc_index)
 
-            completion_status = OnyxCeleryTaskCompletionStatus.RETRYABLE_EXCEPTION
-            if (
-                self.max_retries is not None
-                and self.request.retries >= self.max_retries
-            ):
-                completion_status = (
-                    OnyxCeleryTaskCompletionStatus.NON_RETRYABLE_EXCEPTION
+            existing_document_ids = [doc.id for doc in documents]
+            doc_id_to_doc_sets = {
+                document_id: doc_sets
+                for document_id, doc_sets in fetch_document_sets_for_documents(
+                    existing_document_ids, db_session
                 )
+            }
+            doc_id_to_access = get_access_for_documents(
+                existing_document_ids, db_session
+            )
+
+            synced_document_ids: list[str] = []
+            exceptions: list[Exception] = []
+            chunks_affected = 0
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(VESPA_SYNC_BATCH_CONCURRENCY, len(documents))
+            ) as executor:
+                future_to_document_id = {
+                    executor.submit(
+                        retry_index.update_single,
+                        doc.id,
+                        tenant_id=tenant_id,
+                        chunk_count=doc.chunk_count,
+                        fields=VespaDocumentFields(
+                            document_sets=set(doc_id_to_doc_sets.get(doc.id, [])),
+                            access=doc_id_to_access.get(
+                                doc.id, get_null_document_access()
+                            ),
+                            boost=doc.boost,
+                            hidden=doc.hidden,
+                        ),
+                        user_fields=None,
+                    ): doc.id
+                    for doc in documents
+                }
+                for future in concurrent.futures.as_completed(future_to_document_id):
+                    document_id = future_to_document_id[future]
+                    try:
+                        chunks_affected += future.result()
+                        synced_document_ids.append(document_id)
+                    except Exception as e:
+                        failed_document_ids.append(document_id)
+                        exceptions.append(e)
+
+            # update db last. Worst case = we crash right before this and
+            # the sync might repeat again later
+            if synced_document_ids:
+                mark_documents_as_synced(synced_document_ids, db_session)
+
+            elapsed = time.monotonic() - start
+            task_logger.info(
+                f"docs={len(document_ids)} "
+                f"action=sync "
+                f"synced={len(synced_document_ids)} "
+                f"failed={len(failed_document_ids)} "
+                f"chunks={chunks_affected} "
+                f"elapsed={elapsed:.2f}"
+            )
+
+            if exceptions:
+                raise exceptions[0]
 
+            completion_status = OnyxCeleryTaskCompletionStatus.SUCCEEDED
+    except SoftTimeLimitExceeded:
+        task_logger.info(f"SoftTimeLimitExceeded exception. docs={len(document_ids)}")
+        completion_status = OnyxCeleryTaskCompletionStatus.SOFT_TIME_LIMIT
+    except Exception as ex:
+        completion_status, retry_exception = _handle_vespa_metadata_sync_exception(
+            self, ex, f"docs={len(document_ids)} failed={len(failed_document_ids)}"
+        )
+        if retry_exception:
             # Exponential backoff from 2^4 to 2^6 ... i.e. 16, 32, 64
             countdown = 2 ** (self.request.retries + 4)
-            self.retry(exc=e, countdown=countdown)  # this will raise a celery exception
-            break  # we won't hit this, but it looks weird not to have it
+            # only retry the documents that failed. The task id is kept, so the
+            # taskset accounting of the generating document set / user group holds
+            self.retry(
+                exc=retry_exception,
+                countdown=countdown,
+                kwargs=dict(
+                    document_ids=failed_document_ids or document_ids,
+                    tenant_id=tenant_id,
+                ),
+            )
     finally:
         task_logger.info(
-            f"vespa_metadata_sync_task completed: status={completion_status.value} doc={document_id}"
+            f"vespa_metadata_sync_batch_task completed: "
+            f"status={completion_status.value} docs={len(document_ids)}"
         )
 
     if completion_status != OnyxCeleryTaskCompletionStatus.SUCCEEDED:
@@ -1,11 +1,20 @@
+import threading
 import time
 import traceback
 from collections import defaultdict
+from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterator
+from contextlib import AbstractContextManager
+from contextlib import contextmanager
+from contextlib import nullcontext
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
+from functools import partial
 
 from pydantic import BaseModel
+from pydantic import ConfigDict
 from sqlalchemy.orm import Session
 
 from onyx.background.indexing.checkpointing_utils import check_checkpoint_size
@@ -13,6 +22,7 @@ from onyx.background.indexing.checkpointing_utils import get_latest_valid_checkp
 from onyx.background.indexing.checkpointing_utils import save_checkpoint
 from onyx.background.indexing.memory_tracer import MemoryTracer
 from onyx.configs.app_configs import INDEX_BATCH_SIZE
+from onyx.configs.app_configs import INDEXING_PIPELINE_QUEUE_DEPTH
 from onyx.configs.app_configs import INDEXING_SIZE_WARNING_THRESHOLD
 from onyx.configs.app_configs import INDEXING_TRACER_INTERVAL
 from onyx.configs.app_configs import INTEGRATION_TESTS_MODE
@@ -24,6 +34,7 @@ from onyx.connectors.connector_runner import ConnectorRunner
 from onyx.connectors.exceptions import ConnectorValidationError
 from onyx.connectors.exceptions import UnexpectedValidationError
 from onyx.connectors.factory import instantiate_connector
+from onyx.connectors.models import ConnectorCheckpoint
 from onyx.connectors.models import ConnectorFailure
 from onyx.connectors.models import Document
 from onyx.connectors.models import IndexAttemptMetadata
@@ -52,7 +63,11 @@ from onyx.document_index.factory import get_default_document_index
 from onyx.httpx.httpx_pool import HttpxPool
 from onyx.indexing.embedder import DefaultIndexingEmbedder
 from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
-from onyx.indexing.indexing_pipeline import build_indexing_pipeline
+from onyx.indexing.indexing_pipeline import build_indexing_pipeline_stages
+from onyx.indexing.indexing_pipeline import ChunkedDocumentBatch
+from onyx.indexing.indexing_pipeline import EmbeddedDocumentBatch
+from onyx.indexing.indexing_pipeline import IndexingPipelineResult
+from onyx.indexing.indexing_pipeline import IndexingPipelineStages
 from onyx.natural_language_processing.search_nlp_models import (
     InformationContentClassificationModel,
 )
@@ -62,6 +77,7 @@ from onyx.utils.middleware import make_randomized_onyx_request_id
 from onyx.utils.telemetry import create_milestone_and_report
 from onyx.utils.telemetry import optional_telemetry
 from onyx.utils.telemetry import RecordType
+from onyx.utils.threadpool_concurrency import PipelineStage
 from onyx.utils.variable_functionality import global_version
 from shared_configs.configs import MULTI_TENANT
 
@@ -69,6 +85,9 @@ logger = setup_logger()
 
 INDEXING_TRACER_NUM_PRINT_ENTRIES = 5
 
+# how long to wait for a pipeline stage thread to exit when shutting down
+PIPELINE_STAGE_JOIN_TIMEOUT = 5.0
+
 
 def _get_connector_runner(
     db_session: Session,
@@ -249,6 +268,185 @@ def _check_failure_threshold(
         )
 
 
+class _ConnectorBatch(BaseModel):
+    """One item yielded by the connector, along with the indexing pipeline's
+    progress on it (when the pipeline stages are being overlapped)."""
+
+    # the batch as returned by the connector and after cleaning
+    document_batch: list[Document] | None
+    doc_batch_cleaned: list[Document] | None
+    failure: ConnectorFailure | None
+    next_checkpoint: ConnectorCheckpoint | None
+    index_attempt_md: IndexAttemptMetadata | None
+
+    # filled in by the chunk / embed stages in pipelined mode
+    stage_output: (
+        ChunkedDocumentBatch | EmbeddedDocumentBatch | IndexingPipelineResult | None
+    ) = None
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+class _ConnectorRunFinished(BaseModel):
+    """Marks the end of one `connector_runner.run` call. Only once this is reached
+    have all the batches produced with `checkpoint` been indexed."""
+
+    checkpoint: ConnectorCheckpoint
+
+
+def _fetch_connector_batches(
+    connector_runner: ConnectorRunner,
+    checkpoint: ConnectorCheckpoint,
+    ctx: RunIndexingContext,
+    index_attempt_id: int,
+    tenant_id: str,
+    index_attempt_md: IndexAttemptMetadata,
+) -> Iterator[_ConnectorBatch | _ConnectorRunFinished]:
+    batch_num = 0
+    while checkpoint.has_more:
+        logger.info(
+            f"Running '{ctx.source.value}' connector with checkpoint: {checkpoint}"
+        )
+        for document_batch, failure, next_checkpoint in connector_runner.run(
+            checkpoint
+        ):
+            if next_checkpoint:
+                checkpoint = next_checkpoint
+
+            if document_batch is None:
+                yield _ConnectorBatch(
+                    document_batch=None,
+                    doc_batch_cleaned=None,
+                    failure=failure,
+                    next_checkpoint=next_checkpoint,
+                    index_attempt_md=None,
+                )
+                continue
+
+            batch_description = []
+
+            doc_batch_cleaned = strip_null_characters(document_batch)
+            for doc in doc_batch_cleaned:
+                batch_description.append(doc.to_short_descriptor())
+
+                doc_size = 0
+                for section in doc.sections:
+                    if isinstance(section, TextSection) and section.text is not None:
+                        doc_size += len(section.text)
+
+                if doc_size > INDEXING_SIZE_WARNING_THRESHOLD:
+                    logger.warning(
+                        f"Document size: doc='{doc.to_short_descriptor()}' "
+                        f"size={doc_size} "
+                        f"threshold={INDEXING_SIZE_WARNING_THRESHOLD}"
+                    )
+
+            logger.debug(f"Indexing batch of documents: {batch_description}")
+
+            # Generate an ID that can be used to correlate activity between here
+            # and the embedding model server. Each batch gets its own copy of the
+            # metadata since several batches may be in flight at once.
+            batch_md = index_attempt_md.model_copy(
+                update={
+                    "request_id": make_randomized_onyx_request_id("CIX"),
+                    "structured_id": f"{tenant_id}:{ctx.cc_pair_id}:{index_attempt_id}:{batch_num}",
+                    "batch_num": batch_num + 1,  # use 1-index for this
+                }
+            )
+            batch_num += 1
+
+            yield _ConnectorBatch(
+                document_batch=document_batch,
+                doc_batch_cleaned=doc_batch_cleaned,
+                failure=failure,
+                next_checkpoint=next_checkpoint,
+                index_attempt_md=batch_md,
+            )
+
+        yield _ConnectorRunFinished(checkpoint=checkpoint)
+
+
+def _index_connector_batch(
+    stages: IndexingPipelineStages,
+    item: _ConnectorBatch,
+    db_session: Session,
+) -> IndexingPipelineResult:
+    """Runs whatever indexing stages haven't already been run for this batch in
+    the background."""
+    if item.doc_batch_cleaned is None or item.index_attempt_md is None:
+        raise RuntimeError("Cannot index a connector item without documents.")
+
+    stage_output = item.stage_output
+    if stage_output is None:
+        stage_output = stages.chunk(
+            item.doc_batch_cleaned, item.index_attempt_md, db_session
+        )
+    if isinstance(stage_output, ChunkedDocumentBatch):
+        stage_output = stages.embed(stage_output, item.index_attempt_md)
+    if isinstance(stage_output, EmbeddedDocumentBatch):
+        stage_output = stages.write(stage_output, item.index_attempt_md, db_session)
+
+    return stage_output
+
+
+@contextmanager
+def _pipelined_connector_batches(
+    fetch: Callable[[], Iterator[_ConnectorBatch | _ConnectorRunFinished]],
+    stages: IndexingPipelineStages,
+    queue_depth: int,
+) -> Generator[Iterator[_ConnectorBatch | _ConnectorRunFinished], None, None]:
+    """Runs fetching, chunking and embedding as separate background stages connected
+    by bounded queues. The caller consumes the embedded batches in order and is
+    responsible for the final write + bookkeeping, so checkpoints are still only
+    saved once every batch before them has been fully indexed."""
+    stop_event = threading.Event()
+
+    fetch_stage = PipelineStage("indexing_fetch", fetch, queue_depth, stop_event)
+
+    def _chunk() -> Iterator[_ConnectorBatch | _ConnectorRunFinished]:
+        for item in fetch_stage:
+            if (
+                isinstance(item, _ConnectorBatch)
+                and item.doc_batch_cleaned is not None
+                and item.index_attempt_md is not None
+            ):
+                with get_session_with_current_tenant() as db_session_temp:
+                    item.stage_output = stages.chunk(
+                        item.doc_batch_cleaned, item.index_attempt_md, db_session_temp
+                    )
+            yield item
+
+    chunk_stage = PipelineStage("indexing_chunk", _chunk, queue_depth, stop_event)
+
+    def _embed() -> Iterator[_ConnectorBatch | _ConnectorRunFinished]:
+        for item in chunk_stage:
+            if (
+                isinstance(item, _ConnectorBatch)
+                and isinstance(item.stage_output, ChunkedDocumentBatch)
+                and item.index_attempt_md is not None
+            ):
+                item.stage_output = stages.embed(
+                    item.stage_output, item.index_attempt_md
+                )
+            yield item
+
+    embed_stage = PipelineStage("indexing_embed", _embed, queue_depth, stop_event)
+
+    all_stages = [fetch_stage, chunk_stage, embed_stage]
+    for stage in all_stages:
+        stage.start()
+
+    try:
+        yield iter(embed_stage)
+    finally:
+        for stage in reversed(all_stages):
+            stage.stop(timeout=PIPELINE_STAGE_JOIN_TIMEOUT)
+        logger.info(
+            "Indexing pipeline stage stats: "
+            + " | ".join(stage.stats_str() for stage in all_stages)
+        )
+
+
 def _run_indexing(
     db_session: Session,
     index_attempt_id: int,
@@ -360,7 +558,7 @@ def _run_indexing(
         httpx_client=HttpxPool.get("vespa"),
     )
 
-    indexing_pipeline = build_indexing_pipeline(
+    indexing_pipeline_stages = build_indexing_pipeline_stages(
         embedder=embedding_model,
         information_content_classification_model=information_content_classification_model,
         document_index=document_index,
@@ -447,13 +645,49 @@ def _run_indexing(
                 error for error in unresolved_errors if error.entity_id
             ]
 
-        while checkpoint.has_more:
-            logger.info(
-                f"Running '{ctx.source.value}' connector with checkpoint: {checkpoint}"
+        fetch = partial(
+            _fetch_connector_batches,
+            connector_runner=connector_runner,
+            checkpoint=checkpoint,
+            ctx=ctx,
+            index_attempt_id=index_attempt_id,
+            tenant_id=tenant_id,
+            index_attempt_md=index_attempt_md,
+        )
+
+        # when pipelining, fetching / chunking / embedding of later batches happens in
+        # the background while the current batch is written
+        connector_batches_cm: AbstractContextManager[
+            Iterator[_ConnectorBatch | _ConnectorRunFinished]
+        ] = (
+            _pipelined_connector_batches(
+                fetch=fetch,
+                stages=indexing_pipeline_stages,
+                queue_depth=INDEXING_PIPELINE_QUEUE_DEPTH,
             )
-            for document_batch, failure, next_checkpoint in connector_runner.run(
-                checkpoint
-            ):
+            if INDEXING_PIPELINE_QUEUE_DEPTH > 0
+            else nullcontext(fetch())
+        )
+
+        with connector_batches_cm as connector_batches:
+            for item in connector_batches:
+                if isinstance(item, _ConnectorRunFinished):
+                    checkpoint = item.checkpoint
+
+                    # `make sure the checkpoints aren't getting too large`at some regular interval
+                    CHECKPOINT_SIZE_CHECK_INTERVAL = 100
+                    if batch_num % CHECKPOINT_SIZE_CHECK_INTERVAL == 0:
+                        check_checkpoint_size(checkpoint)
+
+                    # save latest checkpoint
+                    with get_session_with_current_tenant() as db_session_temp:
+                        save_checkpoint(
+                            db_session=db_session_temp,
+                            index_attempt_id=index_attempt_id,
+                            checkpoint=checkpoint,
+                        )
+                    continue
+
                 # Check if connector is disabled mid run and stop if so unless it's the secondary
                 # index being built. We want to populate it even for paused connectors
                 # Often paused connectors are sources that aren't updated frequently but the
@@ -475,6 +709,7 @@ def _run_indexing(
                     )
 
                 # save record of any failures at the connector level
+                failure = item.failure
                 if failure is not None:
                     total_failures += 1
                     with get_session_with_current_tenant() as db_session_temp:
@@ -490,48 +725,24 @@ def _run_indexing(
                     )
 
                 # save the new checkpoint (if one is provided)
-                if next_checkpoint:
-                    checkpoint = next_checkpoint
+                if item.next_checkpoint:
+                    checkpoint = item.next_checkpoint
 
                 # below is all document processing logic, so if no batch we can just continue
-                if document_batch is None:
+                document_batch = item.document_batch
+                doc_batch_cleaned = item.doc_batch_cleaned
+                if (
+                    document_batch is None
+                    or doc_batch_cleaned is None
+                    or item.index_attempt_md is None
+                ):
                     continue
 
-                batch_description = []
-
-                # Generate an ID that can be used to correlate activity between here
-                # and the embedding model server
-                doc_batch_cleaned = strip_null_characters(document_batch)
-                for doc in doc_batch_cleaned:
-                    batch_description.append(doc.to_short_descriptor())
-
-                    doc_size = 0
-                    for section in doc.sections:
-                        if (
-                            isinstance(section, TextSection)
-                            and section.text is not None
-                        ):
-                            doc_size += len(section.text)
-
-                    if doc_size > INDEXING_SIZE_WARNING_THRESHOLD:
-                        logger.warning(
-                            f"Document size: doc='{doc.to_short_descriptor()}' "
-                            f"size={doc_size} "
-                            f"threshold={INDEXING_SIZE_WARNING_THRESHOLD}"
-                        )
-
-                logger.debug(f"Indexing batch of documents: {batch_description}")
-
-                index_attempt_md.request_id = make_randomized_onyx_request_id("CIX")
-                index_attempt_md.structured_id = (
-                    f"{tenant_id}:{ctx.cc_pair_id}:{index_attempt_id}:{batch_num}"
-                )
-                index_attempt_md.batch_num = batch_num + 1  # use 1-index for this
-
                 # real work happens here!
-                index_pipeline_result = indexing_pipeline(
-                    document_batch=doc_batch_cleaned,
-                    index_attempt_metadata=index_attempt_md,
+                index_pipeline_result = _index_connector_batch(
+                    stages=indexing_pipeline_stages,
+                    item=item,
+                    db_session=db_session,
                 )
 
                 batch_num += 1
@@ -610,19 +821,6 @@ def _run_indexing(
 
                 memory_tracer.increment_and_maybe_trace()
 
-            # `make sure the checkpoints aren't getting too large`at some regular interval
-            CHECKPOINT_SIZE_CHECK_INTERVAL = 100
-            if batch_num % CHECKPOINT_SIZE_CHECK_INTERVAL == 0:
-                check_checkpoint_size(checkpoint)
-
-            # save latest checkpoint
-            with get_session_with_current_tenant() as db_session_temp:
-                save_checkpoint(
-                    db_session=db_session_temp,
-                    index_attempt_id=index_attempt_id,
-                    checkpoint=checkpoint,
-                )
-
         optional_telemetry(
             record_type=RecordType.INDEXING_COMPLETE,
             data={
@@ -17,7 +17,7 @@ from onyx.context.search.models import InferenceSection
 from onyx.context.search.models import RerankingDetails
 from onyx.context.search.models import RetrievalDetails
 from onyx.db.chat import create_chat_session
-from onyx.db.chat import get_chat_messages_by_session
+from onyx.db.chat import get_chat_mainline_messages
 from onyx.db.llm import fetch_existing_doc_sets
 from onyx.db.llm import fetch_existing_tools
 from onyx.db.models import ChatMessage
@@ -149,11 +149,10 @@ def create_chat_chain(
     """Build the linear chain of messages without including the root message"""
     mainline_messages: list[ChatMessage] = []
 
-    all_chat_messages = get_chat_messages_by_session(
+    # Only the current mainline is loaded, not every branch of the session
+    all_chat_messages = get_chat_mainline_messages(
         chat_session_id=chat_session_id,
-        user_id=None,
         db_session=db_session,
-        skip_permission_check=True,
         prefetch_tool_calls=prefetch_tool_calls,
     )
     id_to_msg = {msg.id: msg for msg in all_chat_messages}
@@ -68,7 +68,7 @@ from onyx.context.search.utils import dedupe_documents
 from onyx.context.search.utils import drop_llm_indices
 from onyx.context.search.utils import relevant_sections_to_indices
 from onyx.db.chat import attach_files_to_chat_message
-from onyx.db.chat import create_db_search_doc
+from onyx.db.chat import create_db_search_docs
 from onyx.db.chat import create_new_chat_message
 from onyx.db.chat import create_search_doc_from_user_file
 from onyx.db.chat import get_chat_message
@@ -227,10 +227,9 @@ def _handle_search_tool_response_summary(
         ):  # Extended tool responses are already deduped
             deduped_docs, dropped_inds = dedupe_documents(top_docs)
 
-        reference_db_search_docs = [
-            create_db_search_doc(server_search_doc=doc, db_session=db_session)
-            for doc in deduped_docs
-        ]
+        reference_db_search_docs = create_db_search_docs(
+            server_search_docs=deduped_docs, db_session=db_session
+        )
 
     else:
         reference_db_search_docs = selected_search_docs
@@ -290,10 +289,9 @@ def _handle_internet_search_tool_response_summary(
         internet_search_response
     )
 
-    reference_db_search_docs = [
-        create_db_search_doc(server_search_doc=doc, db_session=db_session)
-        for doc in server_search_docs
-    ]
+    reference_db_search_docs = create_db_search_docs(
+        server_search_docs=server_search_docs, db_session=db_session
+    )
     response_docs = [
         translate_db_search_doc_to_server_search_doc(db_search_doc)
         for db_search_doc in reference_db_search_docs
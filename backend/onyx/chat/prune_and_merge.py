@@ -1,6 +1,5 @@
 import json
 from collections import defaultdict
-from copy import deepcopy
 from typing import TypeVar
 
 from pydantic import BaseModel
@@ -16,11 +15,13 @@ from onyx.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
 from onyx.context.search.models import InferenceChunk
 from onyx.context.search.models import InferenceSection
 from onyx.llm.interfaces import LLMConfig
+from onyx.natural_language_processing.utils import BaseTokenizer
 from onyx.natural_language_processing.utils import get_tokenizer
 from onyx.natural_language_processing.utils import tokenizer_trim_content
 from onyx.prompts.prompt_utils import build_doc_context_str
 from onyx.tools.tool_implementations.search.search_utils import section_to_dict
 from onyx.utils.logger import setup_logger
+from onyx.utils.ttl_cache import TTLCache
 
 
 logger = setup_logger()
@@ -32,6 +33,12 @@ _METADATA_TOKEN_ESTIMATE = 75
 # this is only used to log a warning so we can be more forgiving with the buffer
 _OVERCOUNT_ESTIMATE = 256
 
+# Token counts of section contents per LLM tokenizer, the same sections are pruned
+# again on every turn of a chat session and by each step of the agent flows
+_CONTENT_TOKEN_COUNT_CACHE: TTLCache[tuple, int] = TTLCache(
+    maxsize=50_000, ttl_seconds=60 * 60
+)
+
 
 class PruningError(Exception):
     pass
@@ -131,6 +138,70 @@ def _remove_sections_to_ignore(
     ]
 
 
+def _with_combined_content(
+    section: InferenceSection, combined_content: str
+) -> InferenceSection:
+    # shallow copy, the chunks are shared with the original section
+    return section.model_copy(update={"combined_content": combined_content})
+
+
+def _get_content_token_count(
+    content: str,
+    section: InferenceSection,
+    llm_config: LLMConfig,
+    llm_tokenizer: BaseTokenizer,
+) -> int:
+    cache_key = (
+        llm_config.model_provider,
+        llm_config.model_name,
+        section.center_chunk.unique_id,
+        len(content),
+        hash(content),
+    )
+    token_count = _CONTENT_TOKEN_COUNT_CACHE.get(cache_key)
+    if token_count is None:
+        token_count = len(llm_tokenizer.encode(content))
+        _CONTENT_TOKEN_COUNT_CACHE.set(cache_key, token_count)
+    return token_count
+
+
+def _estimate_section_token_count(
+    section: InferenceSection,
+    ind: int,
+    using_tool_message: bool,
+    llm_config: LLMConfig,
+    llm_tokenizer: BaseTokenizer,
+) -> int:
+    """Estimates the tokens of the section as it is passed to the LLM. The content,
+    which makes up most of the section, is counted once per tokenizer and cached,
+    only the (short) title and metadata around it are encoded every time."""
+    # If using tool message, it will be a bit of an overestimate as the extra json text around the section
+    # will be counted towards the token count. However, once the Sections are merged, the extra json parts
+    # that overlap will not be counted multiple times like it is in the pruning step.
+    empty_section = section.model_copy(update={"combined_content": ""})
+    if using_tool_message:
+        wrapper_str = json.dumps(section_to_dict(empty_section, ind))
+        # count the content as it appears in the json, i.e. escaped
+        content = json.dumps(section.combined_content)[1:-1]
+    else:
+        wrapper_str = build_doc_context_str(
+            semantic_identifier=section.center_chunk.semantic_identifier,
+            source_type=section.center_chunk.source_type,
+            content="",
+            metadata_dict=section.center_chunk.metadata,
+            updated_at=section.center_chunk.updated_at,
+            ind=ind,
+        )
+        content = section.combined_content.strip()
+
+    return len(llm_tokenizer.encode(wrapper_str)) + _get_content_token_count(
+        content=content,
+        section=section,
+        llm_config=llm_config,
+        llm_tokenizer=llm_tokenizer,
+    )
+
+
 def _apply_pruning(
     sections: list[InferenceSection],
     section_relevance_list: list[bool] | None,
@@ -144,7 +215,7 @@ def _apply_pruning(
         provider_type=llm_config.model_provider,
         model_name=llm_config.model_name,
     )
-    sections = deepcopy(sections)  # don't modify in place
+    # sections are never modified in place, the ones that get truncated are copied
 
     # re-order docs with all the "relevant" docs at the front
     sections = reorder_sections(
@@ -159,23 +230,13 @@ def _apply_pruning(
     final_section_ind = None
     total_tokens = 0
     for ind, section in enumerate(sections):
-        section_str = (
-            # If using tool message, it will be a bit of an overestimate as the extra json text around the section
-            # will be counted towards the token count. However, once the Sections are merged, the extra json parts
-            # that overlap will not be counted multiple times like it is in the pruning step.
-            json.dumps(section_to_dict(section, ind))
-            if using_tool_message
-            else build_doc_context_str(
-                semantic_identifier=section.center_chunk.semantic_identifier,
-                source_type=section.center_chunk.source_type,
-                content=section.combined_content,
-                metadata_dict=section.center_chunk.metadata,
-                updated_at=section.center_chunk.updated_at,
-                ind=ind,
-            )
+        section_token_count = _estimate_section_token_count(
+            section=section,
+            ind=ind,
+            using_tool_message=using_tool_message,
+            llm_config=llm_config,
+            llm_tokenizer=llm_tokenizer,
         )
-
-        section_token_count = len(llm_tokenizer.encode(section_str))
         # if not using sections (specifically, using Sections where each section maps exactly to the one center chunk),
         # truncate chunks that are way too long. This can happen if the embedding model tokenizer is different
         # than the LLM tokenizer
@@ -197,10 +258,13 @@ def _apply_pruning(
                     "Found more tokens in Section than expected, "
                     "likely mismatch between embedding and LLM tokenizers. Trimming content..."
                 )
-            section.combined_content = tokenizer_trim_content(
-                content=section.combined_content,
-                desired_length=DOC_EMBEDDING_CONTEXT_SIZE,
-                tokenizer=llm_tokenizer,
+            sections[ind] = _with_combined_content(
+                section,
+                tokenizer_trim_content(
+                    content=section.combined_content,
+                    desired_length=DOC_EMBEDDING_CONTEXT_SIZE,
+                    tokenizer=llm_tokenizer,
+                ),
             )
             section_token_count = DOC_EMBEDDING_CONTEXT_SIZE
 
@@ -241,9 +305,16 @@ def _apply_pruning(
             amount_to_truncate = total_tokens - token_limit
             # NOTE: need to recalculate the length here, since the previous calculation included
             # overhead from JSON-fying the doc / the metadata
-            final_doc_content_length = len(
-                llm_tokenizer.encode(sections[final_section_ind].combined_content)
-            ) - (amount_to_truncate)
+            final_section = sections[final_section_ind]
+            final_doc_content_length = (
+                _get_content_token_count(
+                    content=final_section.combined_content,
+                    section=final_section,
+                    llm_config=llm_config,
+                    llm_tokenizer=llm_tokenizer,
+                )
+                - amount_to_truncate
+            )
             # this could occur if we only have space for the title / metadata
             # not ideal, but it's the most reasonable thing to do
             # NOTE: the frontend prevents documents from being selected if
@@ -256,10 +327,13 @@ def _apply_pruning(
                 )
                 sections.pop()
             else:
-                sections[final_section_ind].combined_content = tokenizer_trim_content(
-                    content=sections[final_section_ind].combined_content,
-                    desired_length=final_doc_content_length,
-                    tokenizer=llm_tokenizer,
+                sections[final_section_ind] = _with_combined_content(
+                    final_section,
+                    tokenizer_trim_content(
+                        content=final_section.combined_content,
+                        desired_length=final_doc_content_length,
+                        tokenizer=llm_tokenizer,
+                    ),
                 )
         else:
             # For search on chunk level (Section is just a chunk), don't truncate the final Chunk/Section unless it's the only one
@@ -267,12 +341,16 @@ def _apply_pruning(
             if final_section_ind != 0:
                 sections = sections[:final_section_ind]
             else:
-                sections[0].combined_content = tokenizer_trim_content(
-                    content=sections[0].combined_content,
-                    desired_length=token_limit - _METADATA_TOKEN_ESTIMATE,
-                    tokenizer=llm_tokenizer,
-                )
-                sections = [sections[0]]
+                sections = [
+                    _with_combined_content(
+                        sections[0],
+                        tokenizer_trim_content(
+                            content=sections[0].combined_content,
+                            desired_length=token_limit - _METADATA_TOKEN_ESTIMATE,
+                            tokenizer=llm_tokenizer,
+                        ),
+                    )
+                ]
 
     return sections
 
@@ -312,6 +312,11 @@ except ValueError:
 # The maximum number of tasks that can be queued up to sync to Vespa in a single pass
 VESPA_SYNC_MAX_TASKS = 1024
 
+# Document set / user group syncs send one task per VESPA_SYNC_BATCH_SIZE documents.
+# Each task updates up to VESPA_SYNC_BATCH_CONCURRENCY of its documents in parallel
+VESPA_SYNC_BATCH_SIZE = int(os.environ.get("VESPA_SYNC_BATCH_SIZE") or 64)
+VESPA_SYNC_BATCH_CONCURRENCY = int(os.environ.get("VESPA_SYNC_BATCH_CONCURRENCY") or 8)
+
 DB_YIELD_PER_DEFAULT = 64
 
 #####
@@ -544,6 +549,14 @@ INDEXING_SIZE_WARNING_THRESHOLD = int(
 # 0 disables this behavior and is the default.
 INDEXING_TRACER_INTERVAL = int(os.environ.get("INDEXING_TRACER_INTERVAL") or 0)
 
+# If > 0, fetching from the connector, chunking, embedding and writing to the
+# document index / Postgres run concurrently on different batches of an indexing
+# attempt, with at most this many batches queued between consecutive steps.
+# 0 (the default) processes one batch at a time.
+INDEXING_PIPELINE_QUEUE_DEPTH = int(
+    os.environ.get("INDEXING_PIPELINE_QUEUE_DEPTH") or 0
+)
+
 # Enable multi-threaded embedding model calls for parallel processing
 # Note: only applies for API-based embedding models
 INDEXING_EMBEDDING_MODEL_NUM_THREADS = int(
@@ -615,6 +628,17 @@ CUSTOM_ANSWER_VALIDITY_CONDITIONS = json.loads(
 )
 
 VESPA_REQUEST_TIMEOUT = int(os.environ.get("VESPA_REQUEST_TIMEOUT") or "15")
+# Connection limits for the pooled client shared by all Vespa search / visit requests
+# of a process. Requests beyond VESPA_SEARCH_MAX_CONNECTIONS wait for a free connection
+VESPA_SEARCH_MAX_CONNECTIONS = int(
+    os.environ.get("VESPA_SEARCH_MAX_CONNECTIONS") or "100"
+)
+VESPA_SEARCH_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("VESPA_SEARCH_MAX_KEEPALIVE_CONNECTIONS") or "20"
+)
+# Max number of concurrent document operations streamed over the HTTP/2 connection
+# used when feeding chunks to Vespa during indexing
+VESPA_FEED_MAX_IN_FLIGHT = int(os.environ.get("VESPA_FEED_MAX_IN_FLIGHT") or "128")
 
 SYSTEM_RECURSION_LIMIT = int(os.environ.get("SYSTEM_RECURSION_LIMIT") or "1000")
 
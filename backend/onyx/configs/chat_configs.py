@@ -89,6 +89,23 @@ STOP_STREAM_PAT = os.environ.get("STOP_STREAM_PAT") or None
 # As opposed to soft deleting them, which just hides them from non-admin users
 HARD_DELETE_CHATS = os.environ.get("HARD_DELETE_CHATS", "").lower() == "true"
 
+# Caches the ids of each chat session's current message chain in Redis so building
+# the chat history for a new turn only loads the messages on that chain. The cached
+# chain is validated against the loaded messages, so stale entries are self-healing
+CHAT_MAINLINE_CACHE_ENABLED = (
+    os.environ.get("CHAT_MAINLINE_CACHE_ENABLED", "").lower() == "true"
+)
+CHAT_MAINLINE_CACHE_TTL_SECONDS = int(
+    os.environ.get("CHAT_MAINLINE_CACHE_TTL_SECONDS") or 60 * 60 * 24
+)
+
+# The token rate limits are checked against per minute token counters in Redis, which
+# keep this many hours of usage. Rate limits with a longer period are checked against
+# Postgres directly
+TOKEN_USAGE_COUNTER_RETENTION_HOURS = int(
+    os.environ.get("TOKEN_USAGE_COUNTER_RETENTION_HOURS") or 24 * 7
+)
+
 # Internet Search
 BING_API_KEY = os.environ.get("BING_API_KEY") or None
 
@@ -50,6 +50,27 @@ BATCH_SIZE_ENCODE_CHUNKS_FOR_API_EMBEDDING_SERVICES = EMBEDDING_BATCH_SIZE or 51
 CROSS_ENCODER_RANGE_MAX = 1
 CROSS_ENCODER_RANGE_MIN = 0
 
+# Calls to the model server share one keep-alive connection pool per process
+MODEL_SERVER_HTTP2 = os.environ.get("MODEL_SERVER_HTTP2", "").lower() == "true"
+MODEL_SERVER_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("MODEL_SERVER_MAX_KEEPALIVE_CONNECTIONS") or 20
+)
+# Max number of in-flight requests per model server endpoint from a single process
+# so that e.g. indexing workers cannot exhaust the model server. 0 means unlimited.
+MODEL_SERVER_MAX_CONCURRENT_REQUESTS = int(
+    os.environ.get("MODEL_SERVER_MAX_CONCURRENT_REQUESTS") or 0
+)
+# Query embeddings are cached per process, keyed by the search settings + query text.
+# Set the size to 0 to disable the cache.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE") or 2048)
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = int(
+    os.environ.get("QUERY_EMBEDDING_CACHE_TTL_SECONDS") or 60 * 60
+)
+# Additionally share cached query embeddings across processes via Redis
+QUERY_EMBEDDING_CACHE_REDIS_ENABLED = (
+    os.environ.get("QUERY_EMBEDDING_CACHE_REDIS_ENABLED", "").lower() == "true"
+)
+
 
 #####
 # Generative AI Model Configs
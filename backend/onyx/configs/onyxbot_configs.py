@@ -50,6 +50,13 @@ DANSWER_BOT_MAX_QPM = int(os.environ.get("DANSWER_BOT_MAX_QPM") or 0) or None
 # Maximum time to wait when a question is queued
 DANSWER_BOT_MAX_WAIT_TIME = int(os.environ.get("DANSWER_BOT_MAX_WAIT_TIME") or 180)
 
+# How long Slack channel, user and user group info is cached for, in seconds.
+# Channel renames and user changes invalidate the cache right away when the Slack app
+# is subscribed to the channel_rename and user_change events
+DANSWER_BOT_METADATA_CACHE_TTL_SECONDS = int(
+    os.environ.get("DANSWER_BOT_METADATA_CACHE_TTL_SECONDS") or 30 * 60
+)
+
 # Time (in minutes) after which a Slack message is sent to the user to remind him to give feedback.
 # Set to 0 to disable it (default)
 DANSWER_BOT_FEEDBACK_REMINDER = int(
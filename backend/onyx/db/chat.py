@@ -10,12 +10,16 @@ from fastapi import HTTPException
 from sqlalchemy import delete
 from sqlalchemy import desc
 from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import literal
 from sqlalchemy import nullsfirst
 from sqlalchemy import or_
 from sqlalchemy import Row
+from sqlalchemy import Select
 from sqlalchemy import select
 from sqlalchemy import update
 from sqlalchemy.exc import MultipleResultsFound
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import Session
 
@@ -52,6 +56,9 @@ from onyx.file_store.models import FileDescriptor
 from onyx.file_store.models import InMemoryChatFile
 from onyx.llm.override_models import LLMOverride
 from onyx.llm.override_models import PromptOverride
+from onyx.redis.redis_chat_mainline import get_cached_chat_mainline
+from onyx.redis.redis_chat_mainline import set_cached_chat_mainline
+from onyx.redis.redis_chat_mainline import update_cached_chat_mainline
 from onyx.server.query_and_chat.models import ChatMessageDetail
 from onyx.server.query_and_chat.models import SubQueryDetail
 from onyx.server.query_and_chat.models import SubQuestionDetail
@@ -547,19 +554,123 @@ def get_chat_messages_by_session(
     )
 
     if prefetch_tool_calls:
-        stmt = stmt.options(
-            joinedload(ChatMessage.tool_call),
-            joinedload(ChatMessage.sub_questions).joinedload(
-                AgentSubQuestion.sub_queries
-            ),
-        )
-        result = db_session.scalars(stmt).unique().all()
+        result = db_session.scalars(_with_prefetched_tool_calls(stmt)).unique().all()
     else:
         result = db_session.scalars(stmt).all()
 
     return list(result)
 
 
+def _with_prefetched_tool_calls(
+    stmt: Select[tuple[ChatMessage]],
+) -> Select[tuple[ChatMessage]]:
+    return stmt.options(
+        joinedload(ChatMessage.tool_call),
+        joinedload(ChatMessage.sub_questions).joinedload(AgentSubQuestion.sub_queries),
+    )
+
+
+def get_chat_mainline_message_ids(
+    chat_session_id: UUID,
+    db_session: Session,
+    # Message to start following the chain from, defaults to the root message
+    start_message_id: int | None = None,
+) -> list[int]:
+    """Follows the latest_child_message pointers in a single recursive query.
+    Returns the ids of the chain in order, including the starting message."""
+    mainline = (
+        select(
+            ChatMessage.id,
+            ChatMessage.latest_child_message,
+            literal(0).label("depth"),
+        )
+        .where(ChatMessage.chat_session_id == chat_session_id)
+        .where(
+            ChatMessage.parent_message.is_(None)
+            if start_message_id is None
+            else ChatMessage.id == start_message_id
+        )
+        .cte("mainline", recursive=True)
+    )
+    child_message = aliased(ChatMessage)
+    mainline = mainline.union_all(
+        select(
+            child_message.id,
+            child_message.latest_child_message,
+            mainline.c.depth + 1,
+        )
+        .where(child_message.id == mainline.c.latest_child_message)
+        .where(child_message.chat_session_id == chat_session_id)
+    )
+
+    stmt = select(mainline.c.id).order_by(mainline.c.depth)
+    return list(db_session.scalars(stmt).all())
+
+
+def _get_chat_messages_by_ids(
+    chat_message_ids: list[int],
+    db_session: Session,
+    prefetch_tool_calls: bool,
+) -> dict[int, ChatMessage]:
+    if not chat_message_ids:
+        return {}
+
+    stmt = select(ChatMessage).where(ChatMessage.id.in_(chat_message_ids))
+    if prefetch_tool_calls:
+        result = db_session.scalars(_with_prefetched_tool_calls(stmt)).unique().all()
+    else:
+        result = db_session.scalars(stmt).all()
+
+    return {message.id: message for message in result}
+
+
+def get_chat_mainline_messages(
+    chat_session_id: UUID,
+    db_session: Session,
+    prefetch_tool_calls: bool = False,
+) -> list[ChatMessage]:
+    """Returns the messages of the current mainline, root message first, without
+    loading the other branches of the session.
+
+    If enabled, the mainline ids are read from the cache and checked against the
+    loaded messages. The valid prefix of the cached chain is kept and the rest is
+    followed from the database starting at its last message."""
+    cached_mainline = get_cached_chat_mainline(chat_session_id) or []
+    id_to_message = _get_chat_messages_by_ids(
+        cached_mainline, db_session, prefetch_tool_calls
+    )
+
+    mainline: list[ChatMessage] = []
+    for message_id in cached_mainline:
+        message = id_to_message.get(message_id)
+        if (
+            message is None
+            or message.chat_session_id != chat_session_id
+            or (not mainline and message.parent_message is not None)
+            or (mainline and mainline[-1].latest_child_message != message_id)
+        ):
+            break
+        mainline.append(message)
+
+    if mainline and mainline[-1].latest_child_message is None:
+        return mainline
+
+    # The cache is missing, stale or behind, follow the chain from the last
+    # message that is known to be on it
+    remaining_ids = get_chat_mainline_message_ids(
+        chat_session_id=chat_session_id,
+        db_session=db_session,
+        start_message_id=mainline[-1].id if mainline else None,
+    )[1 if mainline else 0 :]
+    id_to_message = _get_chat_messages_by_ids(
+        remaining_ids, db_session, prefetch_tool_calls
+    )
+    mainline.extend(id_to_message[message_id] for message_id in remaining_ids)
+
+    set_cached_chat_mainline(chat_session_id, [message.id for message in mainline])
+    return mainline
+
+
 def get_or_create_root_message(
     chat_session_id: UUID,
     db_session: Session,
@@ -645,12 +756,18 @@ def create_new_chat_message(
     refined_answer_improvement: bool | None = None,
     is_agentic: bool = False,
 ) -> ChatMessage:
+    # need to import here to avoid circular imports
+    from onyx.server.query_and_chat.token_limit import record_token_usage
+
+    # only the difference is added to the token usage counters
+    previous_token_count = 0
     if reserved_message_id is not None:
         # Edit existing message
         existing_message = db_session.query(ChatMessage).get(reserved_message_id)
         if existing_message is None:
             raise ValueError(f"No message found with id {reserved_message_id}")
 
+        previous_token_count = existing_message.token_count
         existing_message.chat_session_id = chat_session_id
         existing_message.parent_message = parent_message.id
         existing_message.message = message
@@ -700,6 +817,17 @@ def create_new_chat_message(
     if commit:
         db_session.commit()
 
+    update_cached_chat_mainline(
+        chat_session_id=chat_session_id,
+        parent_message_id=parent_message.id,
+        latest_child_message_id=new_chat_message.id,
+    )
+    record_token_usage(
+        chat_session_id=chat_session_id,
+        token_count=token_count - previous_token_count,
+        db_session=db_session,
+    )
+
     return new_chat_message
 
 
@@ -723,6 +851,12 @@ def set_as_latest_chat_message(
 
     db_session.commit()
 
+    update_cached_chat_mainline(
+        chat_session_id=chat_message.chat_session_id,
+        parent_message_id=parent_message_id,
+        latest_child_message_id=chat_message.id,
+    )
+
 
 def attach_files_to_chat_message(
     chat_message: ChatMessage,
@@ -821,11 +955,8 @@ def update_search_docs_table_with_relevance(
     db_session.commit()
 
 
-def create_db_search_doc(
-    server_search_doc: ServerSearchDoc,
-    db_session: Session,
-) -> SearchDoc:
-    db_search_doc = SearchDoc(
+def _search_doc_column_values(server_search_doc: ServerSearchDoc) -> dict[str, Any]:
+    return dict(
         document_id=server_search_doc.document_id,
         chunk_ind=server_search_doc.chunk_ind,
         semantic_id=server_search_doc.semantic_identifier,
@@ -846,9 +977,25 @@ def create_db_search_doc(
         is_internet=server_search_doc.is_internet,
     )
 
-    db_session.add(db_search_doc)
-    db_session.commit()
-    return db_search_doc
+
+def create_db_search_docs(
+    server_search_docs: list[ServerSearchDoc],
+    db_session: Session,
+    commit: bool = True,
+) -> list[SearchDoc]:
+    """Persists all the search docs with a single INSERT ... RETURNING.
+    The returned rows are in the same order as server_search_docs."""
+    if not server_search_docs:
+        return []
+
+    db_search_docs = db_session.scalars(
+        insert(SearchDoc).returning(SearchDoc, sort_by_parameter_order=True),
+        [_search_doc_column_values(doc) for doc in server_search_docs],
+    ).all()
+
+    if commit:
+        db_session.commit()
+    return list(db_search_docs)
 
 
 def get_db_search_doc_by_id(doc_id: int, db_session: Session) -> DBSearchDoc | None:
@@ -1171,10 +1318,9 @@ def log_agent_sub_question_results(
             search_docs = chunks_or_sections_to_search_docs(
                 sub_query.retrieved_documents
             )
-            for doc in search_docs:
-                db_doc = create_db_search_doc(doc, db_session)
-                db_session.add(db_doc)
-                sub_query_object.search_docs.append(db_doc)
+            sub_query_object.search_docs.extend(
+                create_db_search_docs(search_docs, db_session, commit=False)
+            )
             db_session.commit()
 
     return None
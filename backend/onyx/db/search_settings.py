@@ -21,6 +21,9 @@ from onyx.db.models import IndexAttempt
 from onyx.db.models import IndexModelStatus
 from onyx.db.models import SearchSettings
 from onyx.indexing.models import IndexingSetting
+from onyx.natural_language_processing.query_embedding_cache import (
+    invalidate_query_embedding_cache,
+)
 from onyx.natural_language_processing.search_nlp_models import clean_model_name
 from onyx.natural_language_processing.search_nlp_models import warm_up_cross_encoder
 from onyx.server.manage.embedding.models import (
@@ -235,6 +238,7 @@ def update_current_search_settings(
 
     update_search_settings(current_settings, search_settings, preserved_fields)
     db_session.commit()
+    invalidate_query_embedding_cache()
     logger.info("Current search settings updated successfully")
 
 
@@ -260,6 +264,7 @@ def update_search_settings_status(
 ) -> None:
     search_settings.status = new_status
     db_session.commit()
+    invalidate_query_embedding_cache()
 
 
 def user_has_overridden_embedding_model() -> bool:
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from datetime import timezone
+from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel
+
+from onyx.redis.redis_pool import get_redis_client
+
+# A cached article is served as is while it is younger than this
+DEEPSEARCH_ARTICLE_CACHE_TTL_SECONDS = int(
+    os.environ.get("DEEPSEARCH_ARTICLE_CACHE_TTL_SECONDS") or 24 * 60 * 60
+)
+# Cached research (the simulated conversations and their search results) is reused
+# to write a new article while it is younger than this
+DEEPSEARCH_RESEARCH_CACHE_TTL_SECONDS = int(
+    os.environ.get("DEEPSEARCH_RESEARCH_CACHE_TTL_SECONDS") or 7 * 24 * 60 * 60
+)
+# SearXNG results are shared by all runs while they are younger than this
+DEEPSEARCH_SEARCH_CACHE_TTL_SECONDS = int(
+    os.environ.get("DEEPSEARCH_SEARCH_CACHE_TTL_SECONDS") or 60 * 60
+)
+# Upper bound on how long a run can take, after which requests for the same topic
+# no longer wait on it
+DEEPSEARCH_IN_FLIGHT_TTL_SECONDS = int(
+    os.environ.get("DEEPSEARCH_IN_FLIGHT_TTL_SECONDS") or 2 * 60 * 60
+)
+
+_KEY_PREFIX = "deepsearch_cache"
+
+# releases the in flight key only if it still belongs to the job
+_RELEASE_IN_FLIGHT_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+# hands the in flight key of a lost job over to a new one
+_TAKE_OVER_IN_FLIGHT_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    redis.call("SET", KEYS[1], ARGV[2], "EX", ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class DeepSearchCachePolicy(str, Enum):
+    # serve a cached article, else reuse cached research, else run fully
+    CACHED = "cached"
+    # reuse cached research but always write a new article
+    REUSE_RESEARCH = "reuse_research"
+    # ignore the cache
+    FULL = "full"
+
+
+class CachedResult(BaseModel):
+    created_at: datetime
+    result: dict[str, Any]
+
+
+class CachedResearch(BaseModel):
+    created_at: datetime
+    # contents of the conversation_log.json STORM writes after the research stage
+    conversation_log: list[dict[str, Any]]
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+def get_cache_key(topic: str, config: dict[str, Any]) -> str:
+    """Identifies a topic researched with a given LM / retriever configuration, a
+    change to either produces different results and so a different key."""
+    content = json.dumps(
+        {"topic": normalize_topic(topic), "config": config}, sort_keys=True
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _result_key(cache_key: str) -> str:
+    return f"{_KEY_PREFIX}:{cache_key}:result"
+
+
+def _research_key(cache_key: str) -> str:
+    return f"{_KEY_PREFIX}:{cache_key}:research"
+
+
+def _in_flight_key(
+    cache_key: str, cache_policy: DeepSearchCachePolicy, tenant_id: str
+) -> str:
+    # scripts don't go through the tenant prefixing of the client, so the tenant
+    # is part of the key itself. Runs with different policies don't produce the
+    # same results, so they are not shared.
+    return f"{tenant_id}:{_KEY_PREFIX}:{cache_key}:{cache_policy.value}:in_flight"
+
+
+def get_cached_result(cache_key: str, tenant_id: str) -> CachedResult | None:
+    raw = get_redis_client(tenant_id=tenant_id).get(_result_key(cache_key))
+    return CachedResult.model_validate_json(raw) if raw is not None else None
+
+
+def get_cached_research(cache_key: str, tenant_id: str) -> CachedResearch | None:
+    raw = get_redis_client(tenant_id=tenant_id).get(_research_key(cache_key))
+    return CachedResearch.model_validate_json(raw) if raw is not None else None
+
+
+def cache_result(cache_key: str, result: dict[str, Any], tenant_id: str) -> None:
+    cached = CachedResult(created_at=datetime.now(timezone.utc), result=result)
+    get_redis_client(tenant_id=tenant_id).set(
+        _result_key(cache_key),
+        cached.model_dump_json(),
+        ex=DEEPSEARCH_ARTICLE_CACHE_TTL_SECONDS,
+    )
+
+
+def cache_research(
+    cache_key: str, conversation_log: list[dict[str, Any]], tenant_id: str
+) -> None:
+    cached = CachedResearch(
+        created_at=datetime.now(timezone.utc), conversation_log=conversation_log
+    )
+    get_redis_client(tenant_id=tenant_id).set(
+        _research_key(cache_key),
+        cached.model_dump_json(),
+        ex=DEEPSEARCH_RESEARCH_CACHE_TTL_SECONDS,
+    )
+
+
+def _get_in_flight_job_id(
+    cache_key: str, cache_policy: DeepSearchCachePolicy, tenant_id: str
+) -> str | None:
+    job_id = get_redis_client(tenant_id=tenant_id).get(
+        _in_flight_key(cache_key, cache_policy, tenant_id)
+    )
+    return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+
+def claim_in_flight(
+    cache_key: str, cache_policy: DeepSearchCachePolicy, job_id: str, tenant_id: str
+) -> str | None:
+    """Registers the job as the one running for the cache key. Returns None if it
+    was registered, else the id of the job that is already running."""
+    if get_redis_client(tenant_id=tenant_id).set(
+        _in_flight_key(cache_key, cache_policy, tenant_id),
+        job_id,
+        nx=True,
+        ex=DEEPSEARCH_IN_FLIGHT_TTL_SECONDS,
+    ):
+        return None
+
+    # None if it finished in between, the job then runs without being registered
+    return _get_in_flight_job_id(cache_key, cache_policy, tenant_id)
+
+
+def take_over_in_flight(
+    cache_key: str,
+    cache_policy: DeepSearchCachePolicy,
+    job_id: str,
+    lost_job_id: str,
+    tenant_id: str,
+) -> bool:
+    """Registers the job in place of one that is no longer running. Returns False
+    if another job took over first."""
+    redis_client = get_redis_client(tenant_id=tenant_id)
+    return bool(
+        redis_client.register_script(_TAKE_OVER_IN_FLIGHT_SCRIPT)(
+            keys=[_in_flight_key(cache_key, cache_policy, tenant_id)],
+            args=[lost_job_id, job_id, DEEPSEARCH_IN_FLIGHT_TTL_SECONDS],
+        )
+    )
+
+
+def release_in_flight(
+    cache_key: str, cache_policy: DeepSearchCachePolicy, job_id: str, tenant_id: str
+) -> None:
+    redis_client = get_redis_client(tenant_id=tenant_id)
+    redis_client.register_script(_RELEASE_IN_FLIGHT_SCRIPT)(
+        keys=[_in_flight_key(cache_key, cache_policy, tenant_id)], args=[job_id]
+    )
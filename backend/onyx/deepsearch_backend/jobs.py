@@ -0,0 +1,288 @@
+import os
+import socket
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timezone
+from enum import Enum
+from typing import Any
+
+from knowledge_storm.storm_wiki.modules.callback import BaseCallbackHandler
+from pydantic import BaseModel
+from pydantic import Field
+
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import get_current_tenant_id
+
+logger = setup_logger()
+
+# STORM runs are long and make many LLM / search calls, so only a few run at once
+# per API server process and the rest wait in the queue
+DEEPSEARCH_MAX_CONCURRENT_JOBS = int(
+    os.environ.get("DEEPSEARCH_MAX_CONCURRENT_JOBS") or 2
+)
+DEEPSEARCH_MAX_QUEUED_JOBS = int(os.environ.get("DEEPSEARCH_MAX_QUEUED_JOBS") or 20)
+# How long the status and result of a job can be polled for after its last update
+DEEPSEARCH_JOB_TTL_SECONDS = int(
+    os.environ.get("DEEPSEARCH_JOB_TTL_SECONDS") or 24 * 60 * 60
+)
+# A pending or running job is considered lost, e.g. because its API server
+# restarted, when its process has not reported it alive for this long
+DEEPSEARCH_JOB_HEARTBEAT_TIMEOUT_SECONDS = int(
+    os.environ.get("DEEPSEARCH_JOB_HEARTBEAT_TIMEOUT_SECONDS") or 60
+)
+_HEARTBEAT_INTERVAL_SECONDS = DEEPSEARCH_JOB_HEARTBEAT_TIMEOUT_SECONDS / 4
+
+_JOB_KEY_PREFIX = "deepsearch_job"
+# identifies the process running a job
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class DeepSearchQueueFullError(Exception):
+    pass
+
+
+class DeepSearchJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    ERROR = "error"
+
+
+class DeepSearchStage(str, Enum):
+    PERSPECTIVES = "perspectives"
+    CONVERSATIONS = "conversations"
+    OUTLINE = "outline"
+    ARTICLE = "article"
+
+
+class DeepSearchJob(BaseModel):
+    job_id: str
+    query: str
+    status: DeepSearchJobStatus = DeepSearchJobStatus.PENDING
+    # the latest stage that finished and the intermediate results so far
+    stage: DeepSearchStage | None = None
+    stages: dict[DeepSearchStage, Any] = Field(default_factory=dict)
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    owner: str | None = None
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+def _get_job_key(job_id: str) -> str:
+    return f"{_JOB_KEY_PREFIX}:{job_id}"
+
+
+def _get_heartbeat_key(job_id: str) -> str:
+    return f"{_JOB_KEY_PREFIX}:{job_id}:heartbeat"
+
+
+def save_job(job: DeepSearchJob, tenant_id: str) -> None:
+    job.updated_at = datetime.now(timezone.utc)
+    get_redis_client(tenant_id=tenant_id).set(
+        _get_job_key(job.job_id),
+        job.model_dump_json(),
+        ex=DEEPSEARCH_JOB_TTL_SECONDS,
+    )
+
+
+def get_job(job_id: str, tenant_id: str) -> DeepSearchJob | None:
+    raw_job = get_redis_client(tenant_id=tenant_id).get(_get_job_key(job_id))
+    if raw_job is None:
+        return None
+    return DeepSearchJob.model_validate_json(raw_job)
+
+
+def _send_heartbeat(job_id: str, tenant_id: str) -> None:
+    get_redis_client(tenant_id=tenant_id).set(
+        _get_heartbeat_key(job_id),
+        _OWNER,
+        ex=DEEPSEARCH_JOB_HEARTBEAT_TIMEOUT_SECONDS,
+    )
+
+
+def is_job_stale(job: DeepSearchJob, tenant_id: str) -> bool:
+    """Whether the job is unfinished but no process is working on it anymore"""
+    if job.status not in (DeepSearchJobStatus.PENDING, DeepSearchJobStatus.RUNNING):
+        return False
+    return not get_redis_client(tenant_id=tenant_id).exists(
+        _get_heartbeat_key(job.job_id)
+    )
+
+
+def save_completed_job(job_id: str, query: str, result: dict[str, Any]) -> None:
+    """Stores a job that needs no run, e.g. because its result was cached"""
+    job = DeepSearchJob(
+        job_id=job_id,
+        query=query,
+        status=DeepSearchJobStatus.COMPLETED,
+        result=result,
+    )
+    save_job(job, get_current_tenant_id())
+
+
+class DeepSearchProgressHandler(BaseCallbackHandler):
+    """Saves the results of each STORM stage to the job as soon as it finishes, so
+    that they can be shown while the rest of the pipeline is still running."""
+
+    def __init__(self, job: DeepSearchJob, tenant_id: str) -> None:
+        self.job = job
+        self.tenant_id = tenant_id
+        # the conversations of the different perspectives run in parallel threads
+        self._lock = threading.Lock()
+
+    def _update_stage(self, stage: DeepSearchStage, value: Any) -> None:
+        with self._lock:
+            self.job.stage = stage
+            self.job.stages[stage] = value
+            self._save()
+
+    def _save(self) -> None:
+        try:
+            save_job(self.job, self.tenant_id)
+        except Exception:
+            # progress is best effort, the job keeps running without it
+            logger.exception(
+                f"Failed to save progress of DeepSearch job {self.job.job_id}"
+            )
+
+    def on_identify_perspective_end(
+        self, perspectives: list[str], **kwargs: Any
+    ) -> None:
+        self._update_stage(DeepSearchStage.PERSPECTIVES, perspectives)
+
+    def on_dialogue_turn_end(self, dlg_turn: Any, **kwargs: Any) -> None:
+        turn = {
+            "user_utterance": dlg_turn.user_utterance,
+            "agent_utterance": dlg_turn.agent_utterance,
+            "search_queries": dlg_turn.search_queries,
+        }
+        with self._lock:
+            self.job.stage = DeepSearchStage.CONVERSATIONS
+            self.job.stages.setdefault(DeepSearchStage.CONVERSATIONS, []).append(turn)
+            self._save()
+
+    def on_outline_refinement_end(self, outline: str, **kwargs: Any) -> None:
+        self._update_stage(DeepSearchStage.OUTLINE, outline)
+
+    def on_article_generation_end(self, article: str, **kwargs: Any) -> None:
+        self._update_stage(DeepSearchStage.ARTICLE, article)
+
+
+# (query, job_id, callback_handler) -> result
+DeepSearchFunction = Callable[[str, str, BaseCallbackHandler], dict[str, Any]]
+
+_executor = ThreadPoolExecutor(
+    max_workers=DEEPSEARCH_MAX_CONCURRENT_JOBS, thread_name_prefix="deepsearch"
+)
+_num_queued_jobs = 0
+_num_queued_jobs_lock = threading.Lock()
+
+# job id -> tenant id of the jobs queued or running in this process
+_local_jobs: dict[str, str] = {}
+_local_jobs_lock = threading.Lock()
+_heartbeat_thread: threading.Thread | None = None
+
+
+def _heartbeat_loop() -> None:
+    while True:
+        with _local_jobs_lock:
+            local_jobs = list(_local_jobs.items())
+        for job_id, tenant_id in local_jobs:
+            try:
+                _send_heartbeat(job_id, tenant_id)
+            except Exception:
+                logger.exception(f"Failed to send heartbeat of DeepSearch job {job_id}")
+        time.sleep(_HEARTBEAT_INTERVAL_SECONDS)
+
+
+def _add_local_job(job_id: str, tenant_id: str) -> None:
+    global _heartbeat_thread
+
+    # reported alive before it is stored so that it is never seen as stale
+    _send_heartbeat(job_id, tenant_id)
+    with _local_jobs_lock:
+        _local_jobs[job_id] = tenant_id
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(
+                target=_heartbeat_loop, name="deepsearch-heartbeat", daemon=True
+            )
+            _heartbeat_thread.start()
+
+
+def _remove_local_job(job_id: str) -> None:
+    with _local_jobs_lock:
+        _local_jobs.pop(job_id, None)
+
+
+def _run_job(
+    job: DeepSearchJob,
+    tenant_id: str,
+    deepsearch_fn: DeepSearchFunction,
+    on_finished: Callable[[], None] | None,
+) -> None:
+    global _num_queued_jobs
+
+    try:
+        job.status = DeepSearchJobStatus.RUNNING
+        save_job(job, tenant_id)
+
+        handler = DeepSearchProgressHandler(job, tenant_id)
+        # STORM waits for its threads, so no callbacks run after this returns
+        job.result = deepsearch_fn(job.query, job.job_id, handler)
+        job.status = DeepSearchJobStatus.COMPLETED
+        save_job(job, tenant_id)
+    except Exception as e:
+        logger.exception(f"DeepSearch job {job.job_id} failed")
+        job.status = DeepSearchJobStatus.ERROR
+        job.error = str(e)
+        try:
+            save_job(job, tenant_id)
+        except Exception:
+            logger.exception(f"Failed to save DeepSearch job {job.job_id}")
+    finally:
+        if on_finished is not None:
+            try:
+                on_finished()
+            except Exception:
+                logger.exception(f"Failed to clean up DeepSearch job {job.job_id}")
+        _remove_local_job(job.job_id)
+        with _num_queued_jobs_lock:
+            _num_queued_jobs -= 1
+
+
+def submit_job(
+    job_id: str,
+    query: str,
+    deepsearch_fn: DeepSearchFunction,
+    on_finished: Callable[[], None] | None = None,
+) -> None:
+    """Queues the job to run on the process's DeepSearch workers. The job's status
+    and results are kept in Redis so they can be polled from any API server, which
+    can tell from the job's heartbeat whether this process is still working on it.
+
+    on_finished is called once the job stops running, whether or not it succeeded.
+    """
+    global _num_queued_jobs
+
+    tenant_id = get_current_tenant_id()
+    with _num_queued_jobs_lock:
+        if _num_queued_jobs >= DEEPSEARCH_MAX_QUEUED_JOBS:
+            raise DeepSearchQueueFullError(
+                f"Too many DeepSearch jobs in progress ({_num_queued_jobs})"
+            )
+        _num_queued_jobs += 1
+
+    try:
+        job = DeepSearchJob(job_id=job_id, query=query, owner=_OWNER)
+        _add_local_job(job_id, tenant_id)
+        save_job(job, tenant_id)
+        _executor.submit(_run_job, job, tenant_id, deepsearch_fn, on_finished)
+    except Exception:
+        _remove_local_job(job_id)
+        with _num_queued_jobs_lock:
+            _num_queued_jobs -= 1
+        raise
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Request, Depends, BackgroundTasks # type: ignore
+from fastapi import APIRouter, Request, Depends # type: ignore
 from pydantic import BaseModel # type: ignore
 from typing import Any, Dict
 from fastapi.responses import JSONResponse # type: ignore
@@ -6,65 +6,95 @@ from typing import Optional
 
 from knowledge_storm import STORMWikiRunnerArguments, STORMWikiRunner, STORMWikiLMConfigs
 from knowledge_storm.lm import LitellmModel
+from knowledge_storm.rm import RedisSearchResultCache
 from knowledge_storm.rm import SearXNG
+from knowledge_storm.storm_wiki.modules.callback import BaseCallbackHandler
+from knowledge_storm.utils import truncate_filename
 from onyx.auth.users import current_user # type: ignore
+from onyx.deepsearch_backend.cache import cache_research
+from onyx.deepsearch_backend.cache import cache_result
+from onyx.deepsearch_backend.cache import CachedResearch
+from onyx.deepsearch_backend.cache import claim_in_flight
+from onyx.deepsearch_backend.cache import DEEPSEARCH_SEARCH_CACHE_TTL_SECONDS
+from onyx.deepsearch_backend.cache import DeepSearchCachePolicy
+from onyx.deepsearch_backend.cache import get_cache_key
+from onyx.deepsearch_backend.cache import get_cached_research
+from onyx.deepsearch_backend.cache import get_cached_result
+from onyx.deepsearch_backend.cache import release_in_flight
+from onyx.deepsearch_backend.cache import take_over_in_flight
+from onyx.deepsearch_backend.jobs import DeepSearchJobStatus
+from onyx.deepsearch_backend.jobs import DeepSearchQueueFullError
+from onyx.deepsearch_backend.jobs import get_job
+from onyx.deepsearch_backend.jobs import is_job_stale
+from onyx.deepsearch_backend.jobs import save_completed_job
+from onyx.deepsearch_backend.jobs import submit_job
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import get_current_tenant_id
+from functools import partial
 import os
 import json
+import shutil
 import uuid
 import re
 
 # Load from env or fallback
-job_store: dict[str, dict[str, Any]] = {}
 SEARXNG_URL = os.getenv("SEARXNG_URL", "http://host.docker.internal:8087")
+DEEPSEARCH_OUTPUT_DIR = "./results/api_run"
+DEEPSEARCH_LM_MODEL = "gemini/gemini-2.0-flash"
+DEEPSEARCH_RUNNER_ARGS: dict[str, Any] = {
+    "max_conv_turn": 3,
+    "max_perspective": 3,
+    "search_top_k": 3,
+    "retrieve_top_k": 5,
+}
+
+logger = setup_logger()
+
+
+def _get_cache_config() -> dict[str, Any]:
+    # everything that changes the output of a run for the same topic
+    return {
+        "lm_model": DEEPSEARCH_LM_MODEL,
+        "runner_args": DEEPSEARCH_RUNNER_ARGS,
+        "searxng_url": SEARXNG_URL,
+    }
+
 
-# 1. Set up all language models using correct setter methods
-lm_configs = STORMWikiLMConfigs()
-
-conv_simulator_lm = LitellmModel(
-    model="gemini/gemini-2.0-flash",
-    api_key=os.getenv("LITELLM_API_KEY")
-)
-question_asker_lm = LitellmModel(
-    model="gemini/gemini-2.0-flash",
-    api_key=os.getenv("LITELLM_API_KEY")
-)
-outline_gen_lm = LitellmModel(
-    model="gemini/gemini-2.0-flash",
-    api_key=os.getenv("LITELLM_API_KEY")
-)
-article_gen_lm = LitellmModel(
-    model="gemini/gemini-2.0-flash",
-    api_key=os.getenv("LITELLM_API_KEY")
-)
-article_polish_lm = LitellmModel(
-    model="gemini/gemini-2.0-flash",
-    api_key=os.getenv("LITELLM_API_KEY")
-)
-
-# Set all LMs
-lm_configs.set_conv_simulator_lm(conv_simulator_lm)
-lm_configs.set_question_asker_lm(question_asker_lm)
-lm_configs.set_outline_gen_lm(outline_gen_lm)
-lm_configs.set_article_gen_lm(article_gen_lm)
-lm_configs.set_article_polish_lm(article_polish_lm)
-
-# 2. Runner args
-engine_args = STORMWikiRunnerArguments(
-    output_dir="./results/api_run",
-    max_conv_turn=3,
-    max_perspective=3,
-    search_top_k=3,
-    retrieve_top_k=5,
-)
-
-# 3. Retriever
-rm = SearXNG(
-    searxng_api_url=SEARXNG_URL,
-    k=engine_args.search_top_k,
-)
-
-# 4. Runner
-runner = STORMWikiRunner(engine_args, lm_configs, rm)
+def _build_lm() -> LitellmModel:
+    return LitellmModel(
+        model=DEEPSEARCH_LM_MODEL,
+        api_key=os.getenv("LITELLM_API_KEY")
+    )
+
+
+def build_runner(output_dir: str, tenant_id: str) -> STORMWikiRunner:
+    """Builds a runner for a single job. STORMWikiRunner keeps the topic and output
+    directory of the current run (and the LMs their call history) as instance state,
+    so concurrent jobs must not share one."""
+    # 1. Set up all language models using correct setter methods
+    lm_configs = STORMWikiLMConfigs()
+    lm_configs.set_conv_simulator_lm(_build_lm())
+    lm_configs.set_question_asker_lm(_build_lm())
+    lm_configs.set_outline_gen_lm(_build_lm())
+    lm_configs.set_article_gen_lm(_build_lm())
+    lm_configs.set_article_polish_lm(_build_lm())
+
+    # 2. Runner args
+    engine_args = STORMWikiRunnerArguments(
+        output_dir=output_dir, **DEEPSEARCH_RUNNER_ARGS
+    )
+
+    # 3. Retriever
+    rm = SearXNG(
+        searxng_api_url=SEARXNG_URL,
+        k=engine_args.search_top_k,
+        cache=RedisSearchResultCache(get_redis_client(tenant_id=tenant_id)),
+        cache_ttl_seconds=DEEPSEARCH_SEARCH_CACHE_TTL_SECONDS,
+    )
+
+    # 4. Runner
+    return STORMWikiRunner(engine_args, lm_configs, rm)
 
 def truncate_url(url: str, max_len: int = 100) -> str:
     if len(url) <= max_len:
@@ -172,11 +202,37 @@ def add_inline_citation_links(article_text: str, citations: dict) -> str:
 #     return re.sub(r"\[(\d+)\]", replace_with_link, article_text)
 
 # 5. Endpoint logic
-def run_deepsearch(query: str) -> dict:
+def run_deepsearch(
+    query: str,
+    job_id: str,
+    callback_handler: BaseCallbackHandler,
+    *,
+    cache_key: str,
+    tenant_id: str,
+    research: CachedResearch | None = None,
+) -> dict:
+    # every job writes to its own directory, which is removed once the results
+    # have been read since they are kept in the job store
+    output_dir = os.path.join(DEEPSEARCH_OUTPUT_DIR, job_id)
     try:
-        runner.run(topic=query)
-        topic_name = query.replace(" ", "_")
-        topic_dir = os.path.join(engine_args.output_dir, topic_name)
+        runner = build_runner(output_dir, tenant_id)
+        # same directory STORMWikiRunner.run uses for the topic
+        topic_dir = os.path.join(
+            output_dir, truncate_filename(query.replace(" ", "_").replace("/", "_"))
+        )
+        conversation_log_path = os.path.join(topic_dir, "conversation_log.json")
+        if research is not None:
+            # the research stage loads its results from the topic directory
+            # when it is skipped
+            os.makedirs(topic_dir, exist_ok=True)
+            with open(conversation_log_path, "w", encoding="utf-8") as f:
+                json.dump(research.conversation_log, f)
+
+        runner.run(
+            topic=query,
+            do_research=research is None,
+            callback_handler=callback_handler,
+        )
 
         def safe_read(path, is_json=False):
             if os.path.exists(path):
@@ -186,32 +242,35 @@ def run_deepsearch(query: str) -> dict:
 
         article_path = os.path.join(topic_dir, "storm_gen_article_polished.txt")
         citations_path = os.path.join(topic_dir, "url_to_info.json")
-        conversation_log_path = os.path.join(topic_dir, "conversation_log.json")
         outline_path = os.path.join(topic_dir, "storm_gen_outline.txt")
 
         article_text = safe_read(article_path)
         citations = safe_read(citations_path, is_json=True)
         article_with_links = add_inline_citation_links(article_text, citations)
 
-        return {
+        conversation_log = safe_read(conversation_log_path, is_json=True)
+        result = {
             "article": article_with_links,
             "outline": safe_read(outline_path),
             "citations": citations,
-            "conversation_log": safe_read(conversation_log_path, is_json=True),
+            "conversation_log": conversation_log,
         }
 
-    except Exception as e:
-        return {"error": str(e)}
-    
-def background_deepsearch(query: str, job_id: str):
-    try:
-        result = run_deepsearch(query)
-        job_store[job_id] = {"status": "completed", "result": result}
-    except Exception as e:
-        job_store[job_id] = {"status": "error", "error": str(e)}
-    
+        try:
+            if research is None and conversation_log:
+                cache_research(cache_key, conversation_log, tenant_id)
+            if article_text:
+                cache_result(cache_key, result, tenant_id)
+        except Exception:
+            logger.exception(f"Failed to cache the results of DeepSearch job {job_id}")
+
+        return result
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
 class DeepSearchRequest(BaseModel):
     query: str
+    cache_policy: DeepSearchCachePolicy = DeepSearchCachePolicy.CACHED
 
 router = APIRouter(prefix="/deepsearch", tags=["DeepSearch"])
 
@@ -220,21 +279,77 @@ router = APIRouter(prefix="/deepsearch", tags=["DeepSearch"])
 #     return run_deepsearch(request.query)
 
 @router.post("/submit")
-async def submit_deepsearch_job(request: DeepSearchRequest, background_tasks: BackgroundTasks, user=Depends(current_user)):
+async def submit_deepsearch_job(request: DeepSearchRequest, user=Depends(current_user)):
     job_id = str(uuid.uuid4())
-    job_store[job_id] = {"status": "pending"}
-    background_tasks.add_task(background_deepsearch, request.query, job_id)
+    tenant_id = get_current_tenant_id()
+    cache_key = get_cache_key(request.query, _get_cache_config())
+
+    if request.cache_policy == DeepSearchCachePolicy.CACHED:
+        cached_result = get_cached_result(cache_key, tenant_id)
+        if cached_result is not None:
+            save_completed_job(job_id, request.query, cached_result.result)
+            return {"job_id": job_id}
+
+    research = (
+        get_cached_research(cache_key, tenant_id)
+        if request.cache_policy != DeepSearchCachePolicy.FULL
+        else None
+    )
+
+    # identical requests wait on the run that is already in progress, unless the
+    # process running it is gone
+    in_flight_job_id = claim_in_flight(
+        cache_key, request.cache_policy, job_id, tenant_id
+    )
+    if in_flight_job_id is not None:
+        in_flight_job = get_job(in_flight_job_id, tenant_id)
+        if in_flight_job is not None and not is_job_stale(in_flight_job, tenant_id):
+            return {"job_id": in_flight_job_id}
+        # if another request took over first, this job runs without being registered
+        take_over_in_flight(
+            cache_key, request.cache_policy, job_id, in_flight_job_id, tenant_id
+        )
+
+    release = partial(
+        release_in_flight, cache_key, request.cache_policy, job_id, tenant_id
+    )
+    try:
+        submit_job(
+            job_id,
+            request.query,
+            partial(
+                run_deepsearch,
+                cache_key=cache_key,
+                tenant_id=tenant_id,
+                research=research,
+            ),
+            on_finished=release,
+        )
+    except DeepSearchQueueFullError:
+        release()
+        return JSONResponse(
+            status_code=429,
+            content={"error": "Too many Deep Search jobs in progress, try again later"},
+        )
     return {"job_id": job_id}
 
 @router.get("/status/{job_id}")
 async def get_deepsearch_job_status(job_id: str, user=Depends(current_user)):
-    job = job_store.get(job_id)
+    tenant_id = get_current_tenant_id()
+    job = get_job(job_id, tenant_id)
     if not job:
         return JSONResponse(status_code=404, content={"error": "Job not found"})
 
-    if job["status"] == "completed":
-        return {"status": "completed", "result": job["result"]}
-    elif job["status"] == "error":
-        return {"status": "error", "error": job["error"]}
+    if job.status == DeepSearchJobStatus.COMPLETED:
+        return {"status": "completed", "result": job.result}
+    elif job.status == DeepSearchJobStatus.ERROR:
+        return {"status": "error", "error": job.error}
+    elif is_job_stale(job, tenant_id):
+        # the process running it exited before it finished
+        return {
+            "status": "error",
+            "error": "Job was interrupted, please submit it again",
+        }
     else:
-        return {"status": "pending"}
+        # intermediate results of the stages that finished so far
+        return {"status": job.status.value, "stage": job.stage, "stages": job.stages}
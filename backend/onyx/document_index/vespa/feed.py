@@ -0,0 +1,250 @@
+"""Bulk feeding of document operations to Vespa.
+
+Vespa's /document/v1 API accepts a single operation per request, so bulk feeding
+(as done by Vespa's own feed client) means streaming many concurrent operations over
+a single HTTP/2 connection instead of paying a thread + request round trip per chunk.
+"""
+
+import asyncio
+import os
+import threading
+from collections.abc import Callable
+from collections.abc import Coroutine
+from enum import Enum
+from functools import partial
+from http import HTTPStatus
+from typing import Any
+from typing import TypeVar
+
+import httpx
+from pydantic import BaseModel
+
+from onyx.configs.app_configs import VESPA_FEED_MAX_IN_FLIGHT
+from onyx.configs.app_configs import VESPA_REQUEST_TIMEOUT
+from onyx.document_index.vespa.shared_utils.utils import get_vespa_cert_kwargs
+from onyx.document_index.vespa_constants import DOCUMENT_ID_ENDPOINT
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+T = TypeVar("T")
+
+_RETRY_INITIAL_DELAY = 1.0
+_RETRY_BACKOFF = 2.0
+
+
+class VespaFeedOperationType(str, Enum):
+    PUT = "put"
+    REMOVE = "remove"
+
+
+class VespaFeedOperation(BaseModel):
+    operation_type: VespaFeedOperationType
+    doc_chunk_id: str
+    # only used for puts
+    fields: dict[str, Any] | None = None
+    # used for logging, the original document the chunk belongs to
+    document_id: str | None = None
+
+    @property
+    def max_tries(self) -> int:
+        # matches the retry counts of the per chunk indexing / deletion helpers
+        return 5 if self.operation_type == VespaFeedOperationType.PUT else 10
+
+
+class VespaFeedResult(BaseModel):
+    operation: VespaFeedOperation
+    status_code: int | None = None
+    error: str | None = None
+    num_tries: int = 0
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+class VespaFeedError(httpx.HTTPError):
+    """Raised when some operations of a feed failed permanently."""
+
+    def __init__(self, message: str, failed_results: list[VespaFeedResult]) -> None:
+        super().__init__(message)
+        self.failed_results = failed_results
+
+
+def _is_retryable_status(status_code: int) -> bool:
+    # Vespa is overloaded or failed on its side, which may not happen again. Client
+    # errors (e.g. a malformed document) would fail the same way every time.
+    return (
+        status_code == HTTPStatus.TOO_MANY_REQUESTS
+        or status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+    )
+
+
+async def _send_operation(
+    http_client: httpx.AsyncClient,
+    operation: VespaFeedOperation,
+    index_name: str,
+    semaphore: asyncio.Semaphore,
+) -> VespaFeedResult:
+    url = (
+        f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{operation.doc_chunk_id}"
+    )
+    result = VespaFeedResult(operation=operation)
+    delay = _RETRY_INITIAL_DELAY
+
+    while True:
+        result.num_tries += 1
+        retryable = True
+        async with semaphore:
+            try:
+                if operation.operation_type == VespaFeedOperationType.PUT:
+                    response = await http_client.post(
+                        url,
+                        headers={"Content-Type": "application/json"},
+                        json={"fields": operation.fields},
+                    )
+                else:
+                    response = await http_client.delete(url)
+
+                result.status_code = response.status_code
+                if response.is_success:
+                    result.error = None
+                    return result
+
+                result.error = response.text
+                retryable = _is_retryable_status(response.status_code)
+            except httpx.TransportError as e:
+                result.status_code = None
+                result.error = f"{type(e).__name__}: {e}"
+
+        if not retryable or result.num_tries >= operation.max_tries:
+            return result
+
+        await asyncio.sleep(delay)
+        delay *= _RETRY_BACKOFF
+
+
+async def _feed_phases(
+    http_client: httpx.AsyncClient,
+    phases: list[list[VespaFeedOperation]],
+    index_name: str,
+    max_in_flight: int,
+) -> list[VespaFeedResult]:
+    semaphore = asyncio.Semaphore(max_in_flight)
+    results: list[VespaFeedResult] = []
+    for phase in phases:
+        phase_results = await asyncio.gather(
+            *(
+                _send_operation(http_client, operation, index_name, semaphore)
+                for operation in phase
+            )
+        )
+        results.extend(phase_results)
+        # later phases may depend on earlier ones (e.g. puts reusing chunk ids
+        # that are being removed), so don't continue past a failed phase
+        if not all(result.success for result in phase_results):
+            break
+
+    return results
+
+
+class _FeedLoop:
+    """Event loop running in a background thread, with an HTTP/2 client that is
+    kept open across feeds so every batch doesn't set up a new loop and
+    connection. Feeds from any thread, even one with a running event loop, are
+    run on it."""
+
+    def __init__(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        # only used from the loop
+        self._http_client: httpx.AsyncClient | None = None
+        threading.Thread(
+            target=self._loop.run_forever, name="vespa-feed", daemon=True
+        ).start()
+
+    def run(self, feed: Callable[[httpx.AsyncClient], Coroutine[Any, Any, T]]) -> T:
+        async def _run() -> T:
+            if self._http_client is None:
+                self._http_client = httpx.AsyncClient(
+                    **get_vespa_cert_kwargs(),
+                    timeout=VESPA_REQUEST_TIMEOUT,
+                    http2=True,
+                )
+            return await feed(self._http_client)
+
+        return asyncio.run_coroutine_threadsafe(_run(), self._loop).result()
+
+
+_feed_loop: _FeedLoop | None = None
+_feed_loop_lock = threading.Lock()
+
+
+def _get_feed_loop() -> _FeedLoop:
+    global _feed_loop
+
+    with _feed_loop_lock:
+        if _feed_loop is None:
+            _feed_loop = _FeedLoop()
+        return _feed_loop
+
+
+def _reset_feed_loop() -> None:
+    global _feed_loop, _feed_loop_lock
+
+    # a forked child (e.g. a celery worker) doesn't get the thread running the loop
+    _feed_loop = None
+    _feed_loop_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_feed_loop)
+
+
+def feed_vespa_operations(
+    phases: list[list[VespaFeedOperation]],
+    index_name: str,
+    max_in_flight: int = VESPA_FEED_MAX_IN_FLIGHT,
+    raise_on_failure: bool = True,
+) -> list[VespaFeedResult]:
+    """Feeds the operations to Vespa over a single HTTP/2 connection with up to
+    max_in_flight concurrent operations, retrying ones that fail transiently.
+
+    Each phase completes fully before the next one starts and feeding stops after a
+    phase with failures. Returns one result per attempted operation, or raises a
+    VespaFeedError listing the failed operations if raise_on_failure is set."""
+    if not any(phases):
+        return []
+
+    results = _get_feed_loop().run(
+        partial(
+            _feed_phases,
+            phases=phases,
+            index_name=index_name,
+            max_in_flight=max_in_flight,
+        )
+    )
+
+    failed_results = [result for result in results if not result.success]
+    for result in failed_results:
+        logger.error(
+            f"Failed to {result.operation.operation_type.value} Vespa chunk "
+            f"'{result.operation.doc_chunk_id}' of document "
+            f"'{result.operation.document_id}' after {result.num_tries} tries. "
+            f"Status: {result.status_code}, Error: '{result.error}'"
+        )
+    if any(
+        result.status_code == HTTPStatus.INSUFFICIENT_STORAGE
+        for result in failed_results
+    ):
+        logger.error(
+            "NOTE: HTTP Status 507 Insufficient Storage usually means "
+            "you need to allocate more memory or disk space to the "
+            "Vespa/index container."
+        )
+
+    if failed_results and raise_on_failure:
+        raise VespaFeedError(
+            f"Failed to feed {len(failed_results)} of {len(results)} operations to Vespa",
+            failed_results,
+        )
+
+    return results
@@ -34,7 +34,6 @@ from onyx.document_index.interfaces import DocumentIndex
 from onyx.document_index.interfaces import DocumentInsertionRecord
 from onyx.document_index.interfaces import EnrichedDocumentIndexingInfo
 from onyx.document_index.interfaces import IndexBatchParams
-from onyx.document_index.interfaces import MinimalDocumentIndexingInfo
 from onyx.document_index.interfaces import UpdateRequest
 from onyx.document_index.interfaces import VespaChunkRequest
 from onyx.document_index.interfaces import VespaDocumentFields
@@ -44,11 +43,13 @@ from onyx.document_index.vespa.chunk_retrieval import (
     parallel_visit_api_retrieval,
 )
 from onyx.document_index.vespa.chunk_retrieval import query_vespa
+from onyx.document_index.vespa.deletion import build_vespa_chunk_remove_operation
 from onyx.document_index.vespa.deletion import delete_vespa_chunks
+from onyx.document_index.vespa.feed import feed_vespa_operations
 from onyx.document_index.vespa.indexing_utils import BaseHTTPXClientContext
-from onyx.document_index.vespa.indexing_utils import batch_index_vespa_chunks
-from onyx.document_index.vespa.indexing_utils import check_for_final_chunk_existence
+from onyx.document_index.vespa.indexing_utils import build_vespa_chunk_put_operation
 from onyx.document_index.vespa.indexing_utils import clean_chunk_id_copy
+from onyx.document_index.vespa.indexing_utils import get_existing_chunk_counts
 from onyx.document_index.vespa.indexing_utils import GlobalHTTPXClientContext
 from onyx.document_index.vespa.indexing_utils import TemporaryHTTPXClientContext
 from onyx.document_index.vespa.shared_utils.utils import get_vespa_http_client
@@ -375,8 +376,20 @@ class VespaIndex(DocumentIndex):
         multiple chunk batches calling this function multiple times, otherwise only the last set of
         chunks will be kept"""
 
-        doc_id_to_previous_chunk_cnt = index_batch_params.doc_id_to_previous_chunk_cnt
-        doc_id_to_new_chunk_cnt = index_batch_params.doc_id_to_new_chunk_cnt
+        # Vespa stores the chunks under the cleaned document ids, so the existing
+        # chunks are looked up by those as well
+        doc_id_to_previous_chunk_cnt = {
+            replace_invalid_doc_id_characters(doc_id): chunk_count
+            for doc_id, chunk_count in (
+                index_batch_params.doc_id_to_previous_chunk_cnt.items()
+            )
+        }
+        doc_id_to_new_chunk_cnt = {
+            replace_invalid_doc_id_characters(doc_id): chunk_count
+            for doc_id, chunk_count in (
+                index_batch_params.doc_id_to_new_chunk_cnt.items()
+            )
+        }
         tenant_id = index_batch_params.tenant_id
         large_chunks_enabled = index_batch_params.large_chunks_enabled
 
@@ -393,27 +406,20 @@ class VespaIndex(DocumentIndex):
 
         existing_docs: set[str] = set()
 
-        # NOTE: using `httpx` here since `requests` doesn't support HTTP2. This is beneficial for
-        # indexing / updates / deletes since we have to make a large volume of requests.
-        with (
-            concurrent.futures.ThreadPoolExecutor(max_workers=NUM_THREADS) as executor,
-            self.httpx_client_context as http_client,
-        ):
+        with self.httpx_client_context as http_client:
             # We require the start and end index for each document in order to
             # know precisely which chunks to delete. This information exists for
             # documents that have `chunk_count` in the database, but not for
             # `old_version` documents.
 
-            enriched_doc_infos: list[EnrichedDocumentIndexingInfo] = [
-                VespaIndex.enrich_basic_chunk_info(
+            enriched_doc_infos: list[EnrichedDocumentIndexingInfo] = (
+                VespaIndex.enrich_basic_chunk_info_batch(
                     index_name=self.index_name,
                     http_client=http_client,
-                    document_id=doc_id,
-                    previous_chunk_count=doc_id_to_previous_chunk_cnt.get(doc_id, 0),
-                    new_chunk_count=doc_id_to_new_chunk_cnt.get(doc_id, 0),
+                    doc_id_to_previous_chunk_cnt=doc_id_to_previous_chunk_cnt,
+                    doc_id_to_new_chunk_cnt=doc_id_to_new_chunk_cnt,
                 )
-                for doc_id in doc_id_to_new_chunk_cnt.keys()
-            ]
+            )
 
             for cleaned_doc_info in enriched_doc_infos:
                 # If the document has previously indexed chunks, we know it previously existed
@@ -428,23 +434,21 @@ class VespaIndex(DocumentIndex):
                 large_chunks_enabled=large_chunks_enabled,
             )
 
-            # Delete old Vespa documents
-            for doc_chunk_ids_batch in batch_generator(chunks_to_delete, BATCH_SIZE):
-                delete_vespa_chunks(
-                    doc_chunk_ids=doc_chunk_ids_batch,
-                    index_name=self.index_name,
-                    http_client=http_client,
-                    executor=executor,
-                )
-
-            for chunk_batch in batch_generator(cleaned_chunks, BATCH_SIZE):
-                batch_index_vespa_chunks(
-                    chunks=chunk_batch,
-                    index_name=self.index_name,
-                    http_client=http_client,
-                    multitenant=self.multitenant,
-                    executor=executor,
-                )
+        # Stream the removal of stale chunks and then the new chunks to Vespa. The
+        # removals must complete first since new chunks may reuse the same chunk ids
+        feed_vespa_operations(
+            phases=[
+                [
+                    build_vespa_chunk_remove_operation(doc_chunk_id)
+                    for doc_chunk_id in chunks_to_delete
+                ],
+                [
+                    build_vespa_chunk_put_operation(chunk, self.multitenant)
+                    for chunk in cleaned_chunks
+                ],
+            ],
+            index_name=self.index_name,
+        )
 
         all_cleaned_doc_ids = {chunk.source_document.id for chunk in cleaned_chunks}
 
@@ -521,23 +525,27 @@ class VespaIndex(DocumentIndex):
             index_names.append(self.secondary_index_name)
 
         chunk_id_start_time = time.monotonic()
+        doc_id_to_previous_chunk_cnt: dict[str, int | None] = {
+            doc_info.doc_id: doc_info.chunk_start_index
+            for update_request in update_requests
+            for doc_info in update_request.minimal_document_indexing_info
+        }
         with self.httpx_client_context as http_client:
-            for update_request in update_requests:
-                for doc_info in update_request.minimal_document_indexing_info:
-                    for index_name in index_names:
-                        doc_chunk_info = VespaIndex.enrich_basic_chunk_info(
-                            index_name=index_name,
-                            http_client=http_client,
-                            document_id=doc_info.doc_id,
-                            previous_chunk_count=doc_info.chunk_start_index,
-                            new_chunk_count=0,
-                        )
-                        doc_chunk_ids = get_document_chunk_ids(
-                            enriched_document_info_list=[doc_chunk_info],
-                            tenant_id=tenant_id,
-                            large_chunks_enabled=False,
-                        )
-                        all_doc_chunk_ids[doc_info.doc_id] = doc_chunk_ids
+            for index_name in index_names:
+                doc_chunk_infos = VespaIndex.enrich_basic_chunk_info_batch(
+                    index_name=index_name,
+                    http_client=http_client,
+                    doc_id_to_previous_chunk_cnt=doc_id_to_previous_chunk_cnt,
+                    doc_id_to_new_chunk_cnt={
+                        doc_id: 0 for doc_id in doc_id_to_previous_chunk_cnt
+                    },
+                )
+                for doc_chunk_info in doc_chunk_infos:
+                    all_doc_chunk_ids[doc_chunk_info.doc_id] = get_document_chunk_ids(
+                        enriched_document_info_list=[doc_chunk_info],
+                        tenant_id=tenant_id,
+                        large_chunks_enabled=False,
+                    )
 
         logger.debug(
             f"Took {time.monotonic() - chunk_id_start_time:.2f} seconds to fetch all Vespa chunk IDs"
@@ -887,30 +895,61 @@ class VespaIndex(DocumentIndex):
         previous_chunk_count: int | None = None,
         new_chunk_count: int = 0,
     ) -> EnrichedDocumentIndexingInfo:
-        last_indexed_chunk = previous_chunk_count
+        return cls.enrich_basic_chunk_info_batch(
+            index_name=index_name,
+            http_client=http_client,
+            doc_id_to_previous_chunk_cnt={document_id: previous_chunk_count},
+            doc_id_to_new_chunk_cnt={document_id: new_chunk_count},
+        )[0]
 
+    @classmethod
+    def enrich_basic_chunk_info_batch(
+        cls,
+        index_name: str,
+        http_client: httpx.Client,
+        doc_id_to_previous_chunk_cnt: dict[str, int | None],
+        doc_id_to_new_chunk_cnt: dict[str, int],
+    ) -> list[EnrichedDocumentIndexingInfo]:
+        """Returns the enriched indexing info for every document in doc_id_to_new_chunk_cnt.
+        Documents missing from doc_id_to_previous_chunk_cnt are treated as having 0
+        previous chunks."""
         # If the document has no `chunk_count` in the database, we know that it
-        # has the old chunk ID system and we must check for the final chunk index
-        is_old_version = False
-        if last_indexed_chunk is None:
-            is_old_version = True
-            minimal_doc_info = MinimalDocumentIndexingInfo(
-                doc_id=document_id, chunk_start_index=new_chunk_count
-            )
-            last_indexed_chunk = check_for_final_chunk_existence(
-                minimal_doc_info=minimal_doc_info,
-                start_index=new_chunk_count,
+        # has the old chunk ID system and we must look up its final chunk index.
+        # This is done for all such documents at once
+        old_version_doc_ids = [
+            doc_id
+            for doc_id in doc_id_to_new_chunk_cnt
+            if doc_id in doc_id_to_previous_chunk_cnt
+            and doc_id_to_previous_chunk_cnt[doc_id] is None
+        ]
+        existing_chunk_counts = (
+            get_existing_chunk_counts(
+                document_ids=old_version_doc_ids,
                 index_name=index_name,
                 http_client=http_client,
             )
-
-        enriched_doc_info = EnrichedDocumentIndexingInfo(
-            doc_id=document_id,
-            chunk_start_index=new_chunk_count,
-            chunk_end_index=last_indexed_chunk,
-            old_version=is_old_version,
+            if old_version_doc_ids
+            else {}
         )
-        return enriched_doc_info
+
+        enriched_doc_infos: list[EnrichedDocumentIndexingInfo] = []
+        for doc_id, new_chunk_count in doc_id_to_new_chunk_cnt.items():
+            last_indexed_chunk = doc_id_to_previous_chunk_cnt.get(doc_id, 0)
+            is_old_version = last_indexed_chunk is None
+            if last_indexed_chunk is None:
+                last_indexed_chunk = max(
+                    new_chunk_count, existing_chunk_counts.get(doc_id, 0)
+                )
+
+            enriched_doc_infos.append(
+                EnrichedDocumentIndexingInfo(
+                    doc_id=doc_id,
+                    chunk_start_index=new_chunk_count,
+                    chunk_end_index=last_indexed_chunk,
+                    old_version=is_old_version,
+                )
+            )
+        return enriched_doc_infos
 
     @classmethod
     def delete_entries_by_tenant_id(
@@ -6,7 +6,7 @@ from abc import abstractmethod
 from collections.abc import Callable
 from datetime import datetime
 from datetime import timezone
-from http import HTTPStatus
+from typing import Any
 
 import httpx
 from retry import retry
@@ -15,8 +15,8 @@ from onyx.connectors.cross_connector_utils.miscellaneous_utils import (
     get_experts_stores_representations,
 )
 from onyx.document_index.document_index_utils import get_uuid_from_chunk
-from onyx.document_index.document_index_utils import get_uuid_from_chunk_info_old
-from onyx.document_index.interfaces import MinimalDocumentIndexingInfo
+from onyx.document_index.vespa.feed import VespaFeedOperation
+from onyx.document_index.vespa.feed import VespaFeedOperationType
 from onyx.document_index.vespa.shared_utils.utils import remove_invalid_unicode_chars
 from onyx.document_index.vespa.shared_utils.utils import (
     replace_invalid_doc_id_characters,
@@ -42,6 +42,7 @@ from onyx.document_index.vespa_constants import METADATA_LIST
 from onyx.document_index.vespa_constants import METADATA_SUFFIX
 from onyx.document_index.vespa_constants import NUM_THREADS
 from onyx.document_index.vespa_constants import PRIMARY_OWNERS
+from onyx.document_index.vespa_constants import SEARCH_ENDPOINT
 from onyx.document_index.vespa_constants import SECONDARY_OWNERS
 from onyx.document_index.vespa_constants import SECTION_CONTINUATION
 from onyx.document_index.vespa_constants import SEMANTIC_IDENTIFIER
@@ -53,12 +54,17 @@ from onyx.document_index.vespa_constants import TITLE
 from onyx.document_index.vespa_constants import TITLE_EMBEDDING
 from onyx.document_index.vespa_constants import USER_FILE
 from onyx.document_index.vespa_constants import USER_FOLDER
+from onyx.document_index.vespa_constants import VESPA_TIMEOUT
 from onyx.indexing.models import DocMetadataAwareIndexChunk
+from onyx.utils.batching import batch_generator
 from onyx.utils.logger import setup_logger
 
 
 logger = setup_logger()
 
+# Number of documents whose chunk counts are resolved by a single Vespa query
+CHUNK_COUNT_QUERY_BATCH_SIZE = 100
+
 
 @retry(tries=3, delay=1, backoff=2)
 def _does_doc_chunk_exist(
@@ -126,22 +132,14 @@ def get_existing_documents_from_chunks(
     return document_ids
 
 
-@retry(tries=5, delay=1, backoff=2)
-def _index_vespa_chunk(
+def build_vespa_chunk_fields(
     chunk: DocMetadataAwareIndexChunk,
-    index_name: str,
-    http_client: httpx.Client,
     multitenant: bool,
-) -> None:
-    json_header = {
-        "Content-Type": "application/json",
-    }
+) -> dict[str, Any]:
     document = chunk.source_document
 
     # No minichunk documents in vespa, minichunk vectors are stored in the chunk itself
 
-    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
-
     embeddings = chunk.embeddings
 
     embeddings_name_vector_map = {"full_chunk": embeddings.full_embedding}
@@ -216,55 +214,20 @@ def _index_vespa_chunk(
     if multitenant:
         if chunk.tenant_id:
             vespa_document_fields[TENANT_ID] = chunk.tenant_id
-    vespa_url = f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{vespa_chunk_id}"
-    logger.debug(f'Indexing to URL "{vespa_url}"')
-    res = http_client.post(
-        vespa_url, headers=json_header, json={"fields": vespa_document_fields}
-    )
-    try:
-        res.raise_for_status()
-    except Exception as e:
-        logger.exception(
-            f"Failed to index document: '{document.id}'. Got response: '{res.text}'"
-        )
-        if isinstance(e, httpx.HTTPStatusError):
-            if e.response.status_code == HTTPStatus.INSUFFICIENT_STORAGE:
-                logger.error(
-                    "NOTE: HTTP Status 507 Insufficient Storage usually means "
-                    "you need to allocate more memory or disk space to the "
-                    "Vespa/index container."
-                )
 
-        raise e
+    return vespa_document_fields
 
 
-def batch_index_vespa_chunks(
-    chunks: list[DocMetadataAwareIndexChunk],
-    index_name: str,
-    http_client: httpx.Client,
+def build_vespa_chunk_put_operation(
+    chunk: DocMetadataAwareIndexChunk,
     multitenant: bool,
-    executor: concurrent.futures.ThreadPoolExecutor | None = None,
-) -> None:
-    external_executor = True
-
-    if not executor:
-        external_executor = False
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=NUM_THREADS)
-
-    try:
-        chunk_index_future = {
-            executor.submit(
-                _index_vespa_chunk, chunk, index_name, http_client, multitenant
-            ): chunk
-            for chunk in chunks
-        }
-        for future in concurrent.futures.as_completed(chunk_index_future):
-            # Will raise exception if any indexing raised an exception
-            future.result()
-
-    finally:
-        if not external_executor:
-            executor.shutdown(wait=True)
+) -> VespaFeedOperation:
+    return VespaFeedOperation(
+        operation_type=VespaFeedOperationType.PUT,
+        doc_chunk_id=str(get_uuid_from_chunk(chunk)),
+        fields=build_vespa_chunk_fields(chunk, multitenant),
+        document_id=chunk.source_document.id,
+    )
 
 
 def clean_chunk_id_copy(
@@ -282,22 +245,75 @@ def clean_chunk_id_copy(
     return clean_chunk
 
 
-def check_for_final_chunk_existence(
-    minimal_doc_info: MinimalDocumentIndexingInfo,
-    start_index: int,
+def _escape_yql_string(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _build_chunk_count_yql(index_name: str, document_ids: list[str]) -> str:
+    document_id_conditions = " or ".join(
+        f'{DOCUMENT_ID} contains "{_escape_yql_string(document_id)}"'
+        for document_id in document_ids
+    )
+    return (
+        f"select {DOCUMENT_ID} from {index_name} where ({document_id_conditions}) "
+        f"| all(group({DOCUMENT_ID}) max({len(document_ids)}) "
+        f"each(output(max({CHUNK_ID}))))"
+    )
+
+
+def _parse_chunk_count_response(response_json: dict[str, Any]) -> dict[str, int]:
+    """Reads the max chunk_id per document from a grouping response shaped like
+    root -> group:root -> grouplist:document_id -> group:string:<document_id>"""
+    root = response_json["root"]
+    if root.get("errors"):
+        raise RuntimeError(f"Vespa chunk count query failed: {root['errors']}")
+
+    chunk_counts: dict[str, int] = {}
+    for root_group in root.get("children", []):
+        for group_list in root_group.get("children", []):
+            for group in group_list.get("children", []):
+                max_chunk_id = group.get("fields", {}).get(f"max({CHUNK_ID})")
+                if max_chunk_id is not None:
+                    chunk_counts[group["value"]] = int(max_chunk_id) + 1
+    return chunk_counts
+
+
+@retry(tries=3, delay=1, backoff=2)
+def _get_existing_chunk_counts_batch(
+    document_ids: list[str],
+    index_name: str,
+    http_client: httpx.Client,
+) -> dict[str, int]:
+    params: dict[str, str | int] = {
+        "yql": _build_chunk_count_yql(index_name, document_ids),
+        "hits": 0,
+        "timeout": VESPA_TIMEOUT,
+    }
+    response = http_client.post(SEARCH_ENDPOINT, json=params)
+    response.raise_for_status()
+    return _parse_chunk_count_response(response.json())
+
+
+def get_existing_chunk_counts(
+    document_ids: list[str],
     index_name: str,
     http_client: httpx.Client,
-) -> int:
-    index = start_index
-    while True:
-        doc_chunk_id = get_uuid_from_chunk_info_old(
-            document_id=minimal_doc_info.doc_id,
-            chunk_id=index,
-            large_chunk_reference_ids=[],
+) -> dict[str, int]:
+    """Returns the number of chunks currently in Vespa for each of the (Vespa cleaned)
+    document ids, i.e. one past the highest stored chunk_id. Documents without any
+    chunks are omitted.
+
+    Uses one grouping query per CHUNK_COUNT_QUERY_BATCH_SIZE documents, rather than
+    probing for the existence of each chunk id one at a time."""
+    chunk_counts: dict[str, int] = {}
+    unique_document_ids = list(dict.fromkeys(document_ids))
+    for document_id_batch in batch_generator(
+        unique_document_ids, CHUNK_COUNT_QUERY_BATCH_SIZE
+    ):
+        chunk_counts.update(
+            _get_existing_chunk_counts_batch(document_id_batch, index_name, http_client)
         )
-        if not _does_doc_chunk_exist(doc_chunk_id, index_name, http_client):
-            return index
-        index += 1
+    return chunk_counts
 
 
 class BaseHTTPXClientContext(ABC):
@@ -1,18 +1,47 @@
 import re
 import time
+from typing import Any
 from typing import cast
 
 import httpx
+from prometheus_client import Gauge
+from prometheus_client import Histogram
 
 from onyx.configs.app_configs import MANAGED_VESPA
 from onyx.configs.app_configs import VESPA_CLOUD_CERT_PATH
 from onyx.configs.app_configs import VESPA_CLOUD_KEY_PATH
 from onyx.configs.app_configs import VESPA_REQUEST_TIMEOUT
+from onyx.configs.app_configs import VESPA_SEARCH_MAX_CONNECTIONS
+from onyx.configs.app_configs import VESPA_SEARCH_MAX_KEEPALIVE_CONNECTIONS
 from onyx.document_index.vespa_constants import VESPA_APP_CONTAINER_URL
+from onyx.httpx.httpx_pool import HttpxPool
 from onyx.utils.logger import setup_logger
 
 logger = setup_logger()
 
+VESPA_SEARCH_HTTPX_POOL_NAME = "vespa_search"
+
+VESPA_SEARCH_REQUESTS_IN_FLIGHT = Gauge(
+    "onyx_vespa_search_requests_in_flight",
+    "Number of Vespa search requests currently in flight in this process",
+)
+VESPA_SEARCH_CONNECTION_WAIT_SECONDS = Histogram(
+    "onyx_vespa_search_connection_wait_seconds",
+    "Time a Vespa search request waited for a pooled connection before being sent",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+VESPA_SEARCH_POOL_CONNECTIONS = Gauge(
+    "onyx_vespa_search_pool_connections",
+    "Number of connections held by the pooled Vespa search client",
+    ["state"],
+)
+VESPA_SEARCH_POOL_CONNECTIONS.labels(state="active").set_function(
+    lambda: HttpxPool.get_connection_counts(VESPA_SEARCH_HTTPX_POOL_NAME)[0]
+)
+VESPA_SEARCH_POOL_CONNECTIONS.labels(state="idle").set_function(
+    lambda: HttpxPool.get_connection_counts(VESPA_SEARCH_HTTPX_POOL_NAME)[1]
+)
+
 # NOTE: This does not seem to be used in reality despite the Vespa Docs pointing to this code
 # See here for reference: https://docs.vespa.ai/en/documents.html
 # https://github.com/vespa-engine/vespa/blob/master/vespajlib/src/main/java/com/yahoo/text/Text.java
@@ -62,6 +91,17 @@ def remove_invalid_unicode_chars(text: str) -> str:
     return _illegal_xml_chars_RE.sub("", text)
 
 
+def get_vespa_cert_kwargs() -> dict[str, Any]:
+    return {
+        "cert": (
+            cast(tuple[str, str], (VESPA_CLOUD_CERT_PATH, VESPA_CLOUD_KEY_PATH))
+            if MANAGED_VESPA
+            else None
+        ),
+        "verify": False if not MANAGED_VESPA else True,
+    }
+
+
 def get_vespa_http_client(no_timeout: bool = False, http2: bool = True) -> httpx.Client:
     """
     Configure and return an HTTP client for communicating with Vespa,
@@ -69,17 +109,54 @@ def get_vespa_http_client(no_timeout: bool = False, http2: bool = True) -> httpx
     """
 
     return httpx.Client(
-        cert=(
-            cast(tuple[str, str], (VESPA_CLOUD_CERT_PATH, VESPA_CLOUD_KEY_PATH))
-            if MANAGED_VESPA
-            else None
-        ),
-        verify=False if not MANAGED_VESPA else True,
+        **get_vespa_cert_kwargs(),
         timeout=None if no_timeout else VESPA_REQUEST_TIMEOUT,
         http2=http2,
     )
 
 
+def get_vespa_search_http_client() -> httpx.Client:
+    """Returns the process wide pooled client used for Vespa search / visit requests.
+
+    Unlike get_vespa_http_client, this client is never closed by the caller, so
+    connections (and the TLS handshake for managed Vespa) are reused across queries.
+    """
+    HttpxPool.init_client(
+        name=VESPA_SEARCH_HTTPX_POOL_NAME,
+        **get_vespa_cert_kwargs(),
+        timeout=VESPA_REQUEST_TIMEOUT,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=VESPA_SEARCH_MAX_CONNECTIONS,
+            max_keepalive_connections=VESPA_SEARCH_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    )
+    return HttpxPool.get(VESPA_SEARCH_HTTPX_POOL_NAME)
+
+
+def vespa_search_request(method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """Sends a request through the pooled Vespa search client, recording pool metrics.
+
+    The connection wait is measured from issuing the request until its headers start
+    being sent, i.e. time spent waiting for a free pooled connection plus the time to
+    open a new one if needed."""
+    start = time.monotonic()
+    connection_acquired = False
+
+    def _trace(event_name: str, info: dict[str, Any]) -> None:
+        nonlocal connection_acquired
+        if connection_acquired or not event_name.endswith(
+            "send_request_headers.started"
+        ):
+            return
+        connection_acquired = True
+        VESPA_SEARCH_CONNECTION_WAIT_SECONDS.observe(time.monotonic() - start)
+
+    http_client = get_vespa_search_http_client()
+    with VESPA_SEARCH_REQUESTS_IN_FLIGHT.track_inprogress():
+        return http_client.request(method, url, extensions={"trace": _trace}, **kwargs)
+
+
 def wait_for_vespa_with_timeout(wait_interval: int = 5, wait_limit: int = 60) -> bool:
     """Waits for Vespa to become ready subject to a timeout.
     Returns True if Vespa is ready, False otherwise."""
@@ -55,3 +55,18 @@ class HttpxPool:
             if name not in cls._clients:
                 cls._clients[name] = cls._init_client()
             return cls._clients[name]
+
+    @classmethod
+    def get_connection_counts(cls, name: str) -> tuple[int, int]:
+        """Returns the (active, idle) connection counts of a client's pool.
+        Returns (0, 0) if the client has not been created yet."""
+        with cls._lock:
+            client = cls._clients.get(name)
+        if client is None:
+            return 0, 0
+
+        # httpx does not expose pool stats publicly, so read them off httpcore
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        num_idle = sum(1 for connection in connections if connection.is_idle())
+        return len(connections) - num_idle, num_idle
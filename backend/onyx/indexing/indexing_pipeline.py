@@ -103,6 +103,25 @@ class DocumentBatchPrepareContext(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
 
+class ChunkedDocumentBatch(BaseModel):
+    """Output of the chunking stage of the indexing pipeline."""
+
+    filtered_documents: list[Document]
+    ctx: DocumentBatchPrepareContext
+    chunks: list[DocAwareChunk]
+
+
+class EmbeddedDocumentBatch(BaseModel):
+    """Output of the embedding stage of the indexing pipeline."""
+
+    filtered_documents: list[Document]
+    ctx: DocumentBatchPrepareContext
+    chunks_with_embeddings: list[IndexChunk]
+    embedding_failures: list[ConnectorFailure]
+    chunk_content_scores: list[float]
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
 class IndexingPipelineResult(BaseModel):
     # number of documents that are completely new (e.g. did
     # not exist as a part of this OR any other connector)
@@ -291,32 +310,38 @@ def index_doc_batch_with_handler(
             llm=llm,
         )
     except Exception as e:
-        # don't log the batch directly, it's too much text
-        document_ids = [doc.id for doc in document_batch]
-        logger.exception(f"Failed to index document batch: {document_ids}")
-
-        index_pipeline_result = IndexingPipelineResult(
-            new_docs=0,
-            total_docs=len(document_batch),
-            total_chunks=0,
-            failures=[
-                ConnectorFailure(
-                    failed_document=DocumentFailure(
-                        document_id=document.id,
-                        document_link=(
-                            document.sections[0].link if document.sections else None
-                        ),
-                    ),
-                    failure_message=str(e),
-                    exception=e,
-                )
-                for document in document_batch
-            ],
-        )
+        index_pipeline_result = _build_failed_batch_result(document_batch, e)
 
     return index_pipeline_result
 
 
+def _build_failed_batch_result(
+    document_batch: list[Document], e: Exception
+) -> IndexingPipelineResult:
+    # don't log the batch directly, it's too much text
+    document_ids = [doc.id for doc in document_batch]
+    logger.exception(f"Failed to index document batch: {document_ids}")
+
+    return IndexingPipelineResult(
+        new_docs=0,
+        total_docs=len(document_batch),
+        total_chunks=0,
+        failures=[
+            ConnectorFailure(
+                failed_document=DocumentFailure(
+                    document_id=document.id,
+                    document_link=(
+                        document.sections[0].link if document.sections else None
+                    ),
+                ),
+                failure_message=str(e),
+                exception=e,
+            )
+            for document in document_batch
+        ],
+    )
+
+
 def index_doc_batch_prepare(
     documents: list[Document],
     index_attempt_metadata: IndexAttemptMetadata,
@@ -695,37 +720,21 @@ def add_contextual_summaries(
     return chunks
 
 
-@log_function_time(debug_only=True)
-def index_doc_batch(
+def index_doc_batch_chunk(
     *,
     document_batch: list[Document],
     chunker: Chunker,
-    embedder: IndexingEmbedder,
-    information_content_classification_model: InformationContentClassificationModel,
-    document_index: DocumentIndex,
     index_attempt_metadata: IndexAttemptMetadata,
     db_session: Session,
-    tenant_id: str,
     enable_contextual_rag: bool = False,
     llm: LLM | None = None,
     ignore_time_skip: bool = False,
     filter_fnc: Callable[[list[Document]], list[Document]] = filter_documents,
-) -> IndexingPipelineResult:
-    """Takes different pieces of the indexing pipeline and applies it to a batch of documents
-    Note that the documents should already be batched at this point so that it does not inflate the
-    memory requirements
-
-    Returns a tuple where the first element is the number of new docs and the
-    second element is the number of chunks."""
-
-    no_access = DocumentAccess.build(
-        user_emails=[],
-        user_groups=[],
-        external_user_emails=[],
-        external_user_group_ids=[],
-        is_public=False,
-    )
+) -> ChunkedDocumentBatch | IndexingPipelineResult:
+    """First stage of the indexing pipeline: filters the batch, upserts the documents
+    into Postgres and chunks whatever actually needs to be (re)indexed.
 
+    Returns an IndexingPipelineResult directly if there is nothing left to index."""
     filtered_documents = filter_fnc(document_batch)
 
     ctx = index_doc_batch_prepare(
@@ -769,12 +778,11 @@ def index_doc_batch(
     # NOTE: no special handling for failures here, since the chunker is not
     # a common source of failure for the indexing pipeline
     chunks: list[DocAwareChunk] = chunker.chunk(ctx.indexable_docs)
-    llm_tokenizer: BaseTokenizer | None = None
 
     # contextual RAG
     if enable_contextual_rag:
         assert llm is not None, "must provide an LLM for contextual RAG"
-        llm_tokenizer = get_tokenizer(
+        llm_tokenizer: BaseTokenizer = get_tokenizer(
             model_name=llm.config.model_name,
             provider_type=llm.config.model_provider,
         )
@@ -788,15 +796,30 @@ def index_doc_batch(
             chunk_token_limit=chunker.chunk_token_limit * 2,
         )
 
+    return ChunkedDocumentBatch(
+        filtered_documents=filtered_documents, ctx=ctx, chunks=chunks
+    )
+
+
+def index_doc_batch_embed(
+    *,
+    chunked_batch: ChunkedDocumentBatch,
+    embedder: IndexingEmbedder,
+    information_content_classification_model: InformationContentClassificationModel,
+    tenant_id: str,
+    request_id: str | None,
+) -> EmbeddedDocumentBatch:
+    """Second stage of the indexing pipeline: embeds the chunks and computes their
+    information content boost."""
     logger.debug("Starting embedding")
     chunks_with_embeddings, embedding_failures = (
         embed_chunks_with_failure_handling(
-            chunks=chunks,
+            chunks=chunked_batch.chunks,
             embedder=embedder,
             tenant_id=tenant_id,
-            request_id=index_attempt_metadata.request_id,
+            request_id=request_id,
         )
-        if chunks
+        if chunked_batch.chunks
         else ([], [])
     )
 
@@ -808,6 +831,40 @@ def index_doc_batch(
         else [1.0] * len(chunks_with_embeddings)
     )
 
+    return EmbeddedDocumentBatch(
+        filtered_documents=chunked_batch.filtered_documents,
+        ctx=chunked_batch.ctx,
+        chunks_with_embeddings=chunks_with_embeddings,
+        embedding_failures=embedding_failures,
+        chunk_content_scores=chunk_content_scores,
+    )
+
+
+def index_doc_batch_write(
+    *,
+    embedded_batch: EmbeddedDocumentBatch,
+    document_index: DocumentIndex,
+    index_attempt_metadata: IndexAttemptMetadata,
+    db_session: Session,
+    tenant_id: str,
+    large_chunks_enabled: bool,
+) -> IndexingPipelineResult:
+    """Final stage of the indexing pipeline: writes the chunks to the document index
+    and records the outcome in Postgres."""
+    no_access = DocumentAccess.build(
+        user_emails=[],
+        user_groups=[],
+        external_user_emails=[],
+        external_user_group_ids=[],
+        is_public=False,
+    )
+
+    ctx = embedded_batch.ctx
+    filtered_documents = embedded_batch.filtered_documents
+    chunks_with_embeddings = embedded_batch.chunks_with_embeddings
+    embedding_failures = embedded_batch.embedding_failures
+    chunk_content_scores = embedded_batch.chunk_content_scores
+
     updatable_ids = [doc.id for doc in ctx.updatable_docs]
     updatable_chunk_data = [
         UpdatableChunkData(
@@ -861,11 +918,11 @@ def index_doc_batch(
         }
 
         try:
-            llm, _ = get_default_llms()
+            default_llm, _ = get_default_llms()
 
             llm_tokenizer = get_tokenizer(
-                model_name=llm.config.model_name,
-                provider_type=llm.config.model_provider,
+                model_name=default_llm.config.model_name,
+                provider_type=default_llm.config.model_provider,
             )
         except Exception as e:
             logger.error(f"Error getting tokenizer: {e}")
@@ -948,7 +1005,7 @@ def index_doc_batch(
                 doc_id_to_previous_chunk_cnt=doc_id_to_previous_chunk_cnt,
                 doc_id_to_new_chunk_cnt=doc_id_to_new_chunk_cnt,
                 tenant_id=tenant_id,
-                large_chunks_enabled=chunker.enable_large_chunks,
+                large_chunks_enabled=large_chunks_enabled,
             ),
         )
 
@@ -1045,7 +1102,144 @@ def index_doc_batch(
     return result
 
 
-def build_indexing_pipeline(
+@log_function_time(debug_only=True)
+def index_doc_batch(
+    *,
+    document_batch: list[Document],
+    chunker: Chunker,
+    embedder: IndexingEmbedder,
+    information_content_classification_model: InformationContentClassificationModel,
+    document_index: DocumentIndex,
+    index_attempt_metadata: IndexAttemptMetadata,
+    db_session: Session,
+    tenant_id: str,
+    enable_contextual_rag: bool = False,
+    llm: LLM | None = None,
+    ignore_time_skip: bool = False,
+    filter_fnc: Callable[[list[Document]], list[Document]] = filter_documents,
+) -> IndexingPipelineResult:
+    """Takes different pieces of the indexing pipeline and applies it to a batch of documents
+    Note that the documents should already be batched at this point so that it does not inflate the
+    memory requirements
+
+    Returns a tuple where the first element is the number of new docs and the
+    second element is the number of chunks."""
+    chunked_batch = index_doc_batch_chunk(
+        document_batch=document_batch,
+        chunker=chunker,
+        index_attempt_metadata=index_attempt_metadata,
+        db_session=db_session,
+        enable_contextual_rag=enable_contextual_rag,
+        llm=llm,
+        ignore_time_skip=ignore_time_skip,
+        filter_fnc=filter_fnc,
+    )
+    if isinstance(chunked_batch, IndexingPipelineResult):
+        return chunked_batch
+
+    embedded_batch = index_doc_batch_embed(
+        chunked_batch=chunked_batch,
+        embedder=embedder,
+        information_content_classification_model=information_content_classification_model,
+        tenant_id=tenant_id,
+        request_id=index_attempt_metadata.request_id,
+    )
+
+    return index_doc_batch_write(
+        embedded_batch=embedded_batch,
+        document_index=document_index,
+        index_attempt_metadata=index_attempt_metadata,
+        db_session=db_session,
+        tenant_id=tenant_id,
+        large_chunks_enabled=chunker.enable_large_chunks,
+    )
+
+
+class IndexingPipelineStages:
+    """The individual stages of `index_doc_batch`, for callers that want to run
+    chunking, embedding and writing concurrently on different batches.
+
+    Each stage converts exceptions into a failed `IndexingPipelineResult` for the
+    whole batch, the same way `index_doc_batch_with_handler` does."""
+
+    def __init__(
+        self,
+        *,
+        chunker: Chunker,
+        embedder: IndexingEmbedder,
+        information_content_classification_model: InformationContentClassificationModel,
+        document_index: DocumentIndex,
+        tenant_id: str,
+        ignore_time_skip: bool = False,
+        enable_contextual_rag: bool = False,
+        llm: LLM | None = None,
+    ):
+        self.chunker = chunker
+        self.embedder = embedder
+        self.information_content_classification_model = (
+            information_content_classification_model
+        )
+        self.document_index = document_index
+        self.tenant_id = tenant_id
+        self.ignore_time_skip = ignore_time_skip
+        self.enable_contextual_rag = enable_contextual_rag
+        self.llm = llm
+
+    def chunk(
+        self,
+        document_batch: list[Document],
+        index_attempt_metadata: IndexAttemptMetadata,
+        db_session: Session,
+    ) -> ChunkedDocumentBatch | IndexingPipelineResult:
+        try:
+            return index_doc_batch_chunk(
+                document_batch=document_batch,
+                chunker=self.chunker,
+                index_attempt_metadata=index_attempt_metadata,
+                db_session=db_session,
+                enable_contextual_rag=self.enable_contextual_rag,
+                llm=self.llm,
+                ignore_time_skip=self.ignore_time_skip,
+            )
+        except Exception as e:
+            return _build_failed_batch_result(document_batch, e)
+
+    def embed(
+        self,
+        chunked_batch: ChunkedDocumentBatch,
+        index_attempt_metadata: IndexAttemptMetadata,
+    ) -> EmbeddedDocumentBatch | IndexingPipelineResult:
+        try:
+            return index_doc_batch_embed(
+                chunked_batch=chunked_batch,
+                embedder=self.embedder,
+                information_content_classification_model=self.information_content_classification_model,
+                tenant_id=self.tenant_id,
+                request_id=index_attempt_metadata.request_id,
+            )
+        except Exception as e:
+            return _build_failed_batch_result(chunked_batch.filtered_documents, e)
+
+    def write(
+        self,
+        embedded_batch: EmbeddedDocumentBatch,
+        index_attempt_metadata: IndexAttemptMetadata,
+        db_session: Session,
+    ) -> IndexingPipelineResult:
+        try:
+            return index_doc_batch_write(
+                embedded_batch=embedded_batch,
+                document_index=self.document_index,
+                index_attempt_metadata=index_attempt_metadata,
+                db_session=db_session,
+                tenant_id=self.tenant_id,
+                large_chunks_enabled=self.chunker.enable_large_chunks,
+            )
+        except Exception as e:
+            return _build_failed_batch_result(embedded_batch.filtered_documents, e)
+
+
+def build_indexing_pipeline_stages(
     *,
     embedder: IndexingEmbedder,
     information_content_classification_model: InformationContentClassificationModel,
@@ -1055,8 +1249,9 @@ def build_indexing_pipeline(
     chunker: Chunker | None = None,
     ignore_time_skip: bool = False,
     callback: IndexingHeartbeatInterface | None = None,
-) -> IndexingPipelineProtocol:
-    """Builds a pipeline which takes in a list (batch) of docs and indexes them."""
+) -> IndexingPipelineStages:
+    """Same as build_indexing_pipeline, but exposes the chunk / embed / write
+    stages separately so that they can be overlapped across batches."""
     all_search_settings = get_active_search_settings(db_session)
     if (
         all_search_settings.secondary
@@ -1088,15 +1283,50 @@ def build_indexing_pipeline(
         callback=callback,
     )
 
-    return partial(
-        index_doc_batch_with_handler,
+    return IndexingPipelineStages(
         chunker=chunker,
         embedder=embedder,
         information_content_classification_model=information_content_classification_model,
         document_index=document_index,
-        ignore_time_skip=ignore_time_skip,
-        db_session=db_session,
         tenant_id=tenant_id,
+        ignore_time_skip=ignore_time_skip,
         enable_contextual_rag=enable_contextual_rag,
         llm=llm,
     )
+
+
+def build_indexing_pipeline(
+    *,
+    embedder: IndexingEmbedder,
+    information_content_classification_model: InformationContentClassificationModel,
+    document_index: DocumentIndex,
+    db_session: Session,
+    tenant_id: str,
+    chunker: Chunker | None = None,
+    ignore_time_skip: bool = False,
+    callback: IndexingHeartbeatInterface | None = None,
+) -> IndexingPipelineProtocol:
+    """Builds a pipeline which takes in a list (batch) of docs and indexes them."""
+    stages = build_indexing_pipeline_stages(
+        embedder=embedder,
+        information_content_classification_model=information_content_classification_model,
+        document_index=document_index,
+        db_session=db_session,
+        tenant_id=tenant_id,
+        chunker=chunker,
+        ignore_time_skip=ignore_time_skip,
+        callback=callback,
+    )
+
+    return partial(
+        index_doc_batch_with_handler,
+        chunker=stages.chunker,
+        embedder=stages.embedder,
+        information_content_classification_model=stages.information_content_classification_model,
+        document_index=stages.document_index,
+        ignore_time_skip=stages.ignore_time_skip,
+        db_session=db_session,
+        tenant_id=tenant_id,
+        enable_contextual_rag=stages.enable_contextual_rag,
+        llm=stages.llm,
+    )
@@ -23,6 +23,7 @@ from sentry_sdk.integrations.starlette import StarletteIntegration
 from starlette.types import Lifespan
 
 from onyx import __version__
+from onyx.agents.agent_search.run_graph import compile_agent_graphs
 from onyx.auth.schemas import UserCreate
 from onyx.auth.schemas import UserRead
 from onyx.auth.schemas import UserUpdate
@@ -248,6 +249,9 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     if AUTH_RATE_LIMITING_ENABLED:
         await setup_auth_limiter()
 
+    # so that no chat request pays for building the agent graphs
+    compile_agent_graphs()
+
     yield
 
     SqlEngine.reset_engine()
@@ -0,0 +1,156 @@
+import hashlib
+import unicodedata
+from collections.abc import Callable
+from typing import cast
+
+import numpy as np
+
+from onyx.configs.model_configs import QUERY_EMBEDDING_CACHE_REDIS_ENABLED
+from onyx.configs.model_configs import QUERY_EMBEDDING_CACHE_SIZE
+from onyx.configs.model_configs import QUERY_EMBEDDING_CACHE_TTL_SECONDS
+from onyx.db.models import SearchSettings
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+from onyx.utils.ttl_cache import TTLCache
+from shared_configs.contextvars import get_current_tenant_id
+from shared_configs.model_server_models import Embedding
+
+logger = setup_logger()
+
+_REDIS_KEY_PREFIX = "query_embedding"
+
+# (tenant id, search settings id, provider, model name, normalize, query prefix,
+# reduced dimension, normalized query text)
+QueryEmbeddingCacheKey = tuple[
+    str, int, str | None, str, bool, str | None, int | None, str
+]
+
+_query_embedding_cache: TTLCache[QueryEmbeddingCacheKey, Embedding] = TTLCache(
+    maxsize=QUERY_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+)
+
+
+def normalize_query_text(query: str) -> str:
+    """Queries differing only in unicode representation or whitespace share an embedding."""
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+def build_query_embedding_cache_key(
+    tenant_id: str, search_settings: SearchSettings, query: str
+) -> QueryEmbeddingCacheKey:
+    # The search settings id is part of the key so that swapping to new settings
+    # never serves embeddings from the old model, even from another process' Redis
+    # entries. The remaining fields cover in-place edits of the current settings.
+    return (
+        tenant_id,
+        search_settings.id,
+        search_settings.provider_type.value if search_settings.provider_type else None,
+        search_settings.model_name,
+        search_settings.normalize,
+        search_settings.query_prefix,
+        search_settings.reduced_dimension,
+        normalize_query_text(query),
+    )
+
+
+def _redis_key(cache_key: QueryEmbeddingCacheKey) -> str:
+    digest = hashlib.sha256(repr(cache_key).encode("utf-8")).hexdigest()
+    return f"{_REDIS_KEY_PREFIX}:{digest}"
+
+
+def _get_from_redis(
+    tenant_id: str, cache_keys: list[QueryEmbeddingCacheKey]
+) -> list[Embedding | None]:
+    try:
+        redis_client = get_redis_client(tenant_id=tenant_id)
+        values = redis_client.mget([_redis_key(key) for key in cache_keys])
+    except Exception:
+        logger.exception("Failed to read query embeddings from Redis")
+        return [None] * len(cache_keys)
+
+    return [
+        np.frombuffer(value, dtype=np.float32).tolist() if value else None
+        for value in values
+    ]
+
+
+def _set_in_redis(
+    tenant_id: str, entries: dict[QueryEmbeddingCacheKey, Embedding]
+) -> None:
+    try:
+        redis_client = get_redis_client(tenant_id=tenant_id)
+        pipe = redis_client.pipeline(transaction=False)
+        for key, embedding in entries.items():
+            pipe.set(
+                _redis_key(key),
+                np.asarray(embedding, dtype=np.float32).tobytes(),
+                ex=QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+            )
+        pipe.execute()
+    except Exception:
+        logger.exception("Failed to write query embeddings to Redis")
+
+
+def get_cached_query_embeddings(
+    queries: list[str],
+    search_settings: SearchSettings,
+    embed: Callable[[list[str]], list[Embedding]],
+) -> list[Embedding]:
+    """Returns the embeddings of the queries, only calling embed for the ones
+    that are in neither the in-process cache nor (if enabled) Redis."""
+    if QUERY_EMBEDDING_CACHE_SIZE <= 0:
+        return embed(queries)
+
+    tenant_id = get_current_tenant_id()
+    cache_keys = [
+        build_query_embedding_cache_key(tenant_id, search_settings, query)
+        for query in queries
+    ]
+    embeddings: list[Embedding | None] = [
+        _query_embedding_cache.get(key) for key in cache_keys
+    ]
+
+    if QUERY_EMBEDDING_CACHE_REDIS_ENABLED:
+        missing_indices = [i for i, emb in enumerate(embeddings) if emb is None]
+        if missing_indices:
+            redis_embeddings = _get_from_redis(
+                tenant_id, [cache_keys[i] for i in missing_indices]
+            )
+            for i, embedding in zip(missing_indices, redis_embeddings):
+                if embedding is not None:
+                    embeddings[i] = embedding
+                    _query_embedding_cache.set(cache_keys[i], embedding)
+
+    # Several queries may normalize to the same key, only embed each once
+    queries_to_embed: dict[QueryEmbeddingCacheKey, str] = {}
+    for key, query, embedding in zip(cache_keys, queries, embeddings):
+        if embedding is None and key not in queries_to_embed:
+            queries_to_embed[key] = query
+
+    if queries_to_embed:
+        new_embeddings = dict(
+            zip(queries_to_embed.keys(), embed(list(queries_to_embed.values())))
+        )
+        for key, embedding in new_embeddings.items():
+            _query_embedding_cache.set(key, embedding)
+        if QUERY_EMBEDDING_CACHE_REDIS_ENABLED:
+            _set_in_redis(tenant_id, new_embeddings)
+
+        embeddings = [
+            embedding if embedding is not None else new_embeddings[key]
+            for key, embedding in zip(cache_keys, embeddings)
+        ]
+
+    logger.debug(
+        f"Query embedding cache: embedded {len(queries_to_embed)} "
+        f"of {len(queries)} queries"
+    )
+    return cast(list[Embedding], embeddings)
+
+
+def invalidate_query_embedding_cache() -> None:
+    """Drops this process' cached query embeddings. Redis entries do not need to be
+    deleted since changed search settings produce different cache keys and the
+    stale entries expire on their own."""
+    _query_embedding_cache.clear()
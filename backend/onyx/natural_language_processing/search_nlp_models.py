@@ -1,17 +1,16 @@
 import threading
 import time
 from collections.abc import Callable
+from collections.abc import Iterator
 from concurrent.futures import as_completed
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import partial
 from functools import wraps
 from typing import Any
 
-import requests
+import httpx
 from httpx import HTTPError
-from requests import JSONDecodeError
-from requests import RequestException
-from requests import Response
 from retry import retry
 
 from onyx.configs.app_configs import INDEXING_EMBEDDING_MODEL_NUM_THREADS
@@ -22,7 +21,11 @@ from onyx.configs.model_configs import (
     BATCH_SIZE_ENCODE_CHUNKS_FOR_API_EMBEDDING_SERVICES,
 )
 from onyx.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
+from onyx.configs.model_configs import MODEL_SERVER_HTTP2
+from onyx.configs.model_configs import MODEL_SERVER_MAX_CONCURRENT_REQUESTS
+from onyx.configs.model_configs import MODEL_SERVER_MAX_KEEPALIVE_CONNECTIONS
 from onyx.db.models import SearchSettings
+from onyx.httpx.httpx_pool import HttpxPool
 from onyx.indexing.indexing_heartbeat import IndexingHeartbeatInterface
 from onyx.natural_language_processing.exceptions import (
     ModelServerRateLimitError,
@@ -32,6 +35,7 @@ from onyx.natural_language_processing.utils import tokenizer_trim_content
 from onyx.utils.logger import setup_logger
 from shared_configs.configs import INDEXING_MODEL_SERVER_HOST
 from shared_configs.configs import INDEXING_MODEL_SERVER_PORT
+from shared_configs.configs import MODEL_SERVER_EMBEDDING_TRANSPORT
 from shared_configs.configs import MODEL_SERVER_HOST
 from shared_configs.configs import MODEL_SERVER_PORT
 from shared_configs.enums import EmbeddingProvider
@@ -40,9 +44,13 @@ from shared_configs.enums import RerankerProvider
 from shared_configs.model_server_models import ConnectorClassificationRequest
 from shared_configs.model_server_models import ConnectorClassificationResponse
 from shared_configs.model_server_models import ContentClassificationPrediction
+from shared_configs.model_server_models import decode_binary_embeddings
 from shared_configs.model_server_models import Embedding
+from shared_configs.model_server_models import EMBEDDING_DIM_HEADER
 from shared_configs.model_server_models import EmbedRequest
 from shared_configs.model_server_models import EmbedResponse
+from shared_configs.model_server_models import get_binary_embedding_media_type
+from shared_configs.model_server_models import get_embedding_accept_header
 from shared_configs.model_server_models import InformationContentClassificationResponses
 from shared_configs.model_server_models import IntentRequest
 from shared_configs.model_server_models import IntentResponse
@@ -78,6 +86,69 @@ def build_model_server_url(
     return f"http://{model_server_url}"
 
 
+MODEL_SERVER_HTTPX_POOL_NAME = "model_server"
+
+_endpoint_semaphores: dict[str, threading.BoundedSemaphore] = {}
+_endpoint_semaphores_lock = threading.Lock()
+
+
+def _get_model_server_client() -> httpx.Client:
+    # no-op if the client already exists, but makes sure it's (re)created with the
+    # right settings if the pool was closed in the meantime
+    HttpxPool.init_client(
+        name=MODEL_SERVER_HTTPX_POOL_NAME,
+        http2=MODEL_SERVER_HTTP2,
+        # large embedding batches on CPU can legitimately take a long time
+        timeout=None,
+        limits=httpx.Limits(
+            max_keepalive_connections=MODEL_SERVER_MAX_KEEPALIVE_CONNECTIONS
+        ),
+    )
+    return HttpxPool.get(MODEL_SERVER_HTTPX_POOL_NAME)
+
+
+@contextmanager
+def _model_server_request_slot(endpoint: str) -> Iterator[None]:
+    """Limits the number of in-flight requests this process sends to an endpoint."""
+    if MODEL_SERVER_MAX_CONCURRENT_REQUESTS <= 0:
+        yield
+        return
+
+    with _endpoint_semaphores_lock:
+        semaphore = _endpoint_semaphores.get(endpoint)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(MODEL_SERVER_MAX_CONCURRENT_REQUESTS)
+            _endpoint_semaphores[endpoint] = semaphore
+
+    with semaphore:
+        yield
+
+
+def post_to_model_server(endpoint: str, **kwargs: Any) -> httpx.Response:
+    """POSTs to the model server over the process-wide keep-alive connection pool."""
+    with _model_server_request_slot(endpoint):
+        return _get_model_server_client().post(endpoint, **kwargs)
+
+
+def _parse_embed_response(response: httpx.Response) -> EmbedResponse:
+    binary_media_type = get_binary_embedding_media_type(
+        response.headers.get("Content-Type")
+    )
+    if binary_media_type is None:
+        return EmbedResponse(**response.json())
+
+    embeddings = decode_binary_embeddings(
+        response.content,
+        binary_media_type,
+        int(response.headers[EMBEDDING_DIM_HEADER]),
+    )
+    # Every consumer of the embeddings (the pydantic index chunk models, the JSON
+    # document index feeds and the query embedding cache) needs lists of floats, so
+    # they are converted here in a single pass over the matrix. The vectors come
+    # straight from the model server, no need to re-validate them.
+    return EmbedResponse.model_construct(embeddings=embeddings.tolist())
+
+
 class EmbeddingModel:
     def __init__(
         self,
@@ -121,7 +192,7 @@ class EmbeddingModel:
         tenant_id: str | None = None,
         request_id: str | None = None,
     ) -> EmbedResponse:
-        def _make_request() -> Response:
+        def _make_request() -> httpx.Response:
             headers = {}
             if tenant_id:
                 headers["X-Onyx-Tenant-ID"] = tenant_id
@@ -129,7 +200,12 @@ class EmbeddingModel:
             if request_id:
                 headers["X-Onyx-Request-ID"] = request_id
 
-            response = requests.post(
+            # ask for raw vectors if enabled, servers that don't support them reply with JSON
+            headers["Accept"] = get_embedding_accept_header(
+                MODEL_SERVER_EMBEDDING_TRANSPORT
+            )
+
+            response = post_to_model_server(
                 self.embed_server_endpoint,
                 headers=headers,
                 json=embed_request.model_dump(),
@@ -149,28 +225,23 @@ class EmbeddingModel:
             final_make_request_func = retry(
                 tries=3,
                 delay=5,
-                exceptions=(RequestException, ValueError, JSONDecodeError),
+                exceptions=(httpx.HTTPError, ValueError),
             )(final_make_request_func)
             # use 10 second delay as per Azure suggestion
             final_make_request_func = retry(
                 tries=10, delay=10, exceptions=ModelServerRateLimitError
             )(final_make_request_func)
 
-        response: Response | None = None
-
         try:
             response = final_make_request_func()
-            return EmbedResponse(**response.json())
-        except requests.HTTPError as e:
-            if not response:
-                raise HTTPError("HTTP error occurred - response is None.") from e
-
+            return _parse_embed_response(response)
+        except httpx.HTTPStatusError as e:
             try:
-                error_detail = response.json().get("detail", str(e))
+                error_detail = e.response.json().get("detail", str(e))
             except Exception:
-                error_detail = response.text
+                error_detail = e.response.text
             raise HTTPError(f"HTTP error occurred: {error_detail}") from e
-        except requests.RequestException as e:
+        except httpx.RequestError as e:
             raise HTTPError(f"Request failed: {str(e)}") from e
 
     def _batch_encode_texts(
@@ -380,7 +451,7 @@ class RerankingModel:
             api_url=self.api_url,
         )
 
-        response = requests.post(
+        response = post_to_model_server(
             self.rerank_server_endpoint, json=rerank_request.model_dump()
         )
         response.raise_for_status()
@@ -413,7 +484,7 @@ class QueryAnalysisModel:
             semantic_percent_threshold=self.semantic_percent_threshold,
         )
 
-        response = requests.post(
+        response = post_to_model_server(
             self.intent_server_endpoint, json=intent_request.model_dump()
         )
         response.raise_for_status()
@@ -438,7 +509,7 @@ class InformationContentClassificationModel:
         self,
         queries: list[str],
     ) -> list[ContentClassificationPrediction]:
-        response = requests.post(self.content_server_endpoint, json=queries)
+        response = post_to_model_server(self.content_server_endpoint, json=queries)
         response.raise_for_status()
 
         model_responses = InformationContentClassificationResponses(
@@ -468,7 +539,7 @@ class ConnectorClassificationModel:
             available_connectors=available_connectors,
             query=query,
         )
-        response = requests.post(
+        response = post_to_model_server(
             self.connector_classification_endpoint,
             json=connector_classification_request.dict(),
         )
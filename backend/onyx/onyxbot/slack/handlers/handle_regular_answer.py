@@ -50,12 +50,7 @@ def rate_limits(
     def decorator(func: Callable[..., RT]) -> Callable[..., RT]:
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> RT:
-            if not srl.is_available():
-                func_randid, position = srl.init_waiter()
-                srl.notify(client, channel, position, thread_ts)
-                while not srl.is_available():
-                    srl.waiter(func_randid)
-            srl.acquire_slot()
+            srl.acquire(client=client, channel=channel, thread_ts=thread_ts)
             return func(*args, **kwargs)
 
         return wrapper
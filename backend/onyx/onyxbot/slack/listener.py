@@ -31,6 +31,7 @@ from onyx.configs.app_configs import POD_NAME
 from onyx.configs.app_configs import POD_NAMESPACE
 from onyx.configs.constants import MessageType
 from onyx.configs.constants import OnyxRedisLocks
+from onyx.configs.onyxbot_configs import DANSWER_BOT_MAX_QPM
 from onyx.configs.onyxbot_configs import DANSWER_BOT_REPHRASE_MESSAGE
 from onyx.configs.onyxbot_configs import DANSWER_BOT_RESPOND_EVERY_CHANNEL
 from onyx.configs.onyxbot_configs import NOTIFY_SLACKBOT_NO_ANSWER
@@ -82,6 +83,7 @@ from onyx.onyxbot.slack.handlers.handle_message import (
     remove_scheduled_feedback_reminder,
 )
 from onyx.onyxbot.slack.handlers.handle_message import schedule_feedback_reminder
+from onyx.onyxbot.slack.metadata_cache import handle_workspace_metadata_event
 from onyx.onyxbot.slack.models import SlackMessageInfo
 from onyx.onyxbot.slack.utils import check_message_limit
 from onyx.onyxbot.slack.utils import decompose_action_id
@@ -91,6 +93,7 @@ from onyx.onyxbot.slack.utils import read_slack_thread
 from onyx.onyxbot.slack.utils import remove_onyx_bot_tag
 from onyx.onyxbot.slack.utils import rephrase_slack_message
 from onyx.onyxbot.slack.utils import respond_in_thread_or_channel
+from onyx.onyxbot.slack.utils import SlackRateLimiter
 from onyx.onyxbot.slack.utils import TenantSocketModeClient
 from onyx.redis.redis_pool import get_redis_client
 from onyx.server.manage.models import SlackBotTokens
@@ -114,6 +117,14 @@ active_tenants_gauge = Gauge(
     "Number of active tenants handled by this pod",
     ["namespace", "pod"],
 )
+# Questions waiting for the OnyxBot rate limit across the tenants of this pod. The
+# time they wait is exported by the SlackRateLimiter as
+# slack_question_queue_wait_seconds
+slack_question_queue_depth_gauge = Gauge(
+    "slack_question_queue_depth",
+    "Number of Slack questions queued by the rate limit for the tenants of this pod",
+    ["namespace", "pod"],
+)
 
 # In rare cases, some users have been experiencing a massive amount of trivial messages coming through
 # to the Slack Bot with trivial messages. Adding this to avoid exploding LLM costs while we track down
@@ -200,10 +211,23 @@ class SlackbotHandler:
                 logger.debug(
                     f"Sent heartbeats for {len(self.tenant_ids)} active tenants"
                 )
+                self.update_queue_depth_metric()
             except Exception as e:
                 logger.exception(f"Error in heartbeat loop: {e}")
             self._shutdown_event.wait(timeout=TENANT_HEARTBEAT_INTERVAL)
 
+    def update_queue_depth_metric(self) -> None:
+        if DANSWER_BOT_MAX_QPM is None:
+            return
+
+        queue_depth = sum(
+            SlackRateLimiter.get_queue_depth(tenant_id)
+            for tenant_id in list(self.tenant_ids)
+        )
+        slack_question_queue_depth_gauge.labels(
+            namespace=POD_NAMESPACE, pod=POD_NAME
+        ).set(queue_depth)
+
     def _manage_clients_per_tenant(
         self, db_session: Session, tenant_id: str, bot: SlackBot
     ) -> None:
@@ -947,6 +971,10 @@ def create_process_slack_event() -> (
                 elif req.payload.get("type") == "view_submission":
                     return view_routing(req, client)
             elif req.type == "events_api" or req.type == "slash_commands":
+                if req.type == "events_api" and handle_workspace_metadata_event(
+                    client.web_client, req.payload.get("event", {})
+                ):
+                    return
                 return process_message(req, client)
         except Exception:
             logger.exception("Failed to process slack event")
@@ -0,0 +1,197 @@
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import cast
+
+from slack_sdk import WebClient
+
+from onyx.configs.onyxbot_configs import DANSWER_BOT_METADATA_CACHE_TTL_SECONDS
+from onyx.utils.logger import setup_logger
+from onyx.utils.ttl_cache import TTLCache
+
+logger = setup_logger()
+
+_MAX_CACHED_CHANNELS = 10_000
+_MAX_CACHED_USERS = 100_000
+# users.list is a tier 2 method, so very large workspaces are only partially
+# prefetched and the remaining users are looked up one by one
+_USERS_LIST_PAGE_SIZE = 1000
+_MAX_USERS_LIST_PAGES = 20
+_USERGROUPS_KEY = "usergroups"
+
+_CHANNEL_EVENT_TYPES = {
+    "channel_rename",
+    "channel_archive",
+    "channel_unarchive",
+    "channel_deleted",
+    "group_rename",
+    "group_archive",
+    "group_unarchive",
+    "group_deleted",
+}
+_USER_EVENT_TYPES = {"user_change", "team_join"}
+_USERGROUP_EVENT_TYPES = {
+    "subteam_created",
+    "subteam_updated",
+    "subteam_members_changed",
+}
+
+
+def _new_cache(maxsize: int) -> TTLCache:
+    return TTLCache(maxsize=maxsize, ttl_seconds=DANSWER_BOT_METADATA_CACHE_TTL_SECONDS)
+
+
+@dataclass
+class SlackWorkspaceMetadata:
+    # channel id -> conversations.info channel
+    channels: TTLCache[str, dict[str, Any]] = field(
+        default_factory=lambda: _new_cache(_MAX_CACHED_CHANNELS)
+    )
+    # user id -> users.info / users.list user
+    users: TTLCache[str, dict[str, Any]] = field(
+        default_factory=lambda: _new_cache(_MAX_CACHED_USERS)
+    )
+    # lowercased email -> user id
+    user_ids_by_email: TTLCache[str, str] = field(
+        default_factory=lambda: _new_cache(_MAX_CACHED_USERS)
+    )
+    # single entry holding the usergroups.list groups
+    usergroups: TTLCache[str, list[dict[str, Any]]] = field(
+        default_factory=lambda: _new_cache(1)
+    )
+    # usergroup id -> user ids
+    usergroup_members: TTLCache[str, list[str]] = field(
+        default_factory=lambda: _new_cache(_MAX_CACHED_CHANNELS)
+    )
+    users_prefetched_at: float | None = None
+    users_prefetch_lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+# Keyed by bot token, which identifies the workspace the client talks to
+_WORKSPACE_METADATA: dict[str, SlackWorkspaceMetadata] = {}
+_WORKSPACE_METADATA_LOCK = threading.Lock()
+
+
+def get_workspace_metadata(client: WebClient) -> SlackWorkspaceMetadata:
+    token = client.token or ""
+    with _WORKSPACE_METADATA_LOCK:
+        metadata = _WORKSPACE_METADATA.get(token)
+        if metadata is None:
+            metadata = SlackWorkspaceMetadata()
+            _WORKSPACE_METADATA[token] = metadata
+        return metadata
+
+
+def cache_user(metadata: SlackWorkspaceMetadata, user: dict[str, Any]) -> None:
+    user_id = user.get("id")
+    if not user_id:
+        return
+
+    metadata.users.set(user_id, user)
+    email = user.get("profile", {}).get("email")
+    if not email:
+        return
+    if user.get("deleted"):
+        metadata.user_ids_by_email.delete(email.lower())
+    else:
+        metadata.user_ids_by_email.set(email.lower(), user_id)
+
+
+def prefetch_workspace_users(client: WebClient) -> None:
+    """Loads the workspace's users with users.list so that users can be looked up
+    by email without a users.lookupByEmail call each. Runs at most once per cache
+    TTL per workspace."""
+    metadata = get_workspace_metadata(client)
+    with metadata.users_prefetch_lock:
+        if (
+            metadata.users_prefetched_at is not None
+            and time.monotonic() - metadata.users_prefetched_at
+            < DANSWER_BOT_METADATA_CACHE_TTL_SECONDS
+        ):
+            return
+        # also set on failure so a failing workspace isn't retried on every message
+        metadata.users_prefetched_at = time.monotonic()
+
+        cursor: str | None = None
+        num_users = 0
+        try:
+            for _ in range(_MAX_USERS_LIST_PAGES):
+                response = client.users_list(limit=_USERS_LIST_PAGE_SIZE, cursor=cursor)
+                data = cast(dict[str, Any], response.data)
+                for user in data.get("members", []):
+                    cache_user(metadata, user)
+                    num_users += 1
+
+                cursor = data.get("response_metadata", {}).get("next_cursor")
+                if not cursor:
+                    break
+        except Exception:
+            logger.exception("Failed to prefetch Slack users")
+            return
+
+        logger.info(f"Prefetched {num_users} Slack users")
+
+
+def handle_workspace_metadata_event(client: WebClient, event: dict[str, Any]) -> bool:
+    """Updates the cache for Slack events that change workspace metadata. Returns
+    True if the event was a metadata event, which needs no further processing."""
+    event_type = event.get("type")
+    metadata = get_workspace_metadata(client)
+
+    if event_type in _CHANNEL_EVENT_TYPES:
+        # the channel is an object for renames and just the id otherwise
+        channel = event.get("channel")
+        channel_id = channel.get("id") if isinstance(channel, dict) else channel
+        if channel_id:
+            metadata.channels.delete(channel_id)
+        return True
+
+    if event_type in _USER_EVENT_TYPES:
+        user = event.get("user")
+        if isinstance(user, dict):
+            cache_user(metadata, user)
+        return True
+
+    if event_type in _USERGROUP_EVENT_TYPES:
+        metadata.usergroups.clear()
+        subteam = event.get("subteam")
+        subteam_id = (
+            subteam.get("id") if isinstance(subteam, dict) else event.get("subteam_id")
+        )
+        if subteam_id:
+            metadata.usergroup_members.delete(subteam_id)
+        return True
+
+    return False
+
+
+def get_usergroups(client: WebClient) -> list[dict[str, Any]] | None:
+    metadata = get_workspace_metadata(client)
+    usergroups = metadata.usergroups.get(_USERGROUPS_KEY)
+    if usergroups is not None:
+        return usergroups
+
+    response = client.usergroups_list()
+    if not isinstance(response.data, dict):
+        return None
+
+    usergroups = response.data.get("usergroups", [])
+    metadata.usergroups.set(_USERGROUPS_KEY, usergroups)
+    return usergroups
+
+
+def get_usergroup_members(client: WebClient, usergroup_id: str) -> list[str] | None:
+    metadata = get_workspace_metadata(client)
+    members = metadata.usergroup_members.get(usergroup_id)
+    if members is not None:
+        return members
+
+    response = client.usergroups_users_list(usergroup=usergroup_id)
+    if not isinstance(response.data, dict):
+        return None
+
+    members = response.data.get("users", [])
+    metadata.usergroup_members.set(usergroup_id, members)
+    return members
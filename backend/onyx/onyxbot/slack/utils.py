@@ -9,6 +9,7 @@ from contextlib import contextmanager
 from typing import Any
 from typing import cast
 
+from prometheus_client import Histogram
 from retry import retry
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
@@ -38,20 +39,44 @@ from onyx.llm.factory import get_default_llms
 from onyx.llm.utils import dict_based_prompt_to_langchain_prompt
 from onyx.llm.utils import message_to_string
 from onyx.onyxbot.slack.constants import FeedbackVisibility
+from onyx.onyxbot.slack.metadata_cache import cache_user
+from onyx.onyxbot.slack.metadata_cache import get_usergroup_members
+from onyx.onyxbot.slack.metadata_cache import get_usergroups
+from onyx.onyxbot.slack.metadata_cache import get_workspace_metadata
+from onyx.onyxbot.slack.metadata_cache import prefetch_workspace_users
 from onyx.onyxbot.slack.models import ThreadMessage
 from onyx.prompts.miscellaneous_prompts import SLACK_LANGUAGE_REPHRASE_PROMPT
+from onyx.redis.redis_pool import get_redis_client
 from onyx.utils.logger import setup_logger
 from onyx.utils.telemetry import optional_telemetry
 from onyx.utils.telemetry import RecordType
 from onyx.utils.text_processing import replace_whitespaces_w_space
 from shared_configs.contextvars import CURRENT_TENANT_ID_CONTEXTVAR
+from shared_configs.contextvars import get_current_tenant_id
 
 logger = setup_logger()
 
 
 _DANSWER_BOT_SLACK_BOT_ID: str | None = None
-_DANSWER_BOT_MESSAGE_COUNT: int = 0
-_DANSWER_BOT_COUNT_START_TIME: float = time.time()
+_DANSWER_BOT_MESSAGE_COUNT_KEY = "slack_bot_message_count"
+
+# Counts a message, starting a new period if the previous one expired. The expiry
+# is set in the same step as the increment, so the count can't be left without one
+# and block the bot for good.
+_MESSAGE_COUNT_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+if redis.call('TTL', KEYS[1]) == -1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return count
+"""
+
+# Time Slack questions spend queued by the SlackRateLimiter, exported by the listener
+slack_question_wait_seconds = Histogram(
+    "slack_question_queue_wait_seconds",
+    "Time Slack questions wait for the question rate limit before being answered",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300),
+)
 
 
 def get_onyx_bot_slack_bot_id(web_client: WebClient) -> Any:
@@ -66,23 +91,30 @@ def check_message_limit() -> bool:
     This isnt a perfect solution.
     High traffic at the end of one period and start of another could cause
     the limit to be exceeded.
+
+    The count is kept in Redis so the limit is shared by all listener pods.
     """
     if DANSWER_BOT_RESPONSE_LIMIT_PER_TIME_PERIOD == 0:
         return True
-    global _DANSWER_BOT_MESSAGE_COUNT
-    global _DANSWER_BOT_COUNT_START_TIME
-    time_since_start = time.time() - _DANSWER_BOT_COUNT_START_TIME
-    if time_since_start > DANSWER_BOT_RESPONSE_LIMIT_TIME_PERIOD_SECONDS:
-        _DANSWER_BOT_MESSAGE_COUNT = 0
-        _DANSWER_BOT_COUNT_START_TIME = time.time()
-    if (_DANSWER_BOT_MESSAGE_COUNT + 1) > DANSWER_BOT_RESPONSE_LIMIT_PER_TIME_PERIOD:
+
+    try:
+        redis_client = get_redis_client()
+        # scripts don't go through the tenant prefixing of the client
+        message_count = redis_client.register_script(_MESSAGE_COUNT_SCRIPT)(
+            keys=[f"{get_current_tenant_id()}:{_DANSWER_BOT_MESSAGE_COUNT_KEY}"],
+            args=[DANSWER_BOT_RESPONSE_LIMIT_TIME_PERIOD_SECONDS],
+        )
+    except Exception:
+        logger.exception("Failed to check the OnyxBot message limit")
+        return True
+
+    if message_count > DANSWER_BOT_RESPONSE_LIMIT_PER_TIME_PERIOD:
         logger.error(
             f"OnyxBot has reached the message limit {DANSWER_BOT_RESPONSE_LIMIT_PER_TIME_PERIOD}"
             f" for the time period {DANSWER_BOT_RESPONSE_LIMIT_TIME_PERIOD_SECONDS} seconds."
             " These limits are configurable in backend/onyx/configs/onyxbot_configs.py"
         )
         return False
-    _DANSWER_BOT_MESSAGE_COUNT += 1
     return True
 
 
@@ -393,9 +425,16 @@ def remove_slack_text_interactions(slack_str: str) -> str:
 
 
 def get_channel_from_id(client: WebClient, channel_id: str) -> dict[str, Any]:
+    channel_cache = get_workspace_metadata(client).channels
+    channel = channel_cache.get(channel_id)
+    if channel is not None:
+        return channel
+
     response = client.conversations_info(channel=channel_id)
     response.validate()
-    return response["channel"]
+    channel = response["channel"]
+    channel_cache.set(channel_id, channel)
+    return channel
 
 
 def get_channel_name_from_id(
@@ -416,9 +455,22 @@ def fetch_slack_user_ids_from_emails(
 ) -> tuple[list[str], list[str]]:
     user_ids: list[str] = []
     failed_to_find: list[str] = []
+    metadata = get_workspace_metadata(client)
+    if any(
+        metadata.user_ids_by_email.get(email.lower()) is None for email in user_emails
+    ):
+        # one paged users.list instead of a users.lookupByEmail per email
+        prefetch_workspace_users(client)
+
     for email in user_emails:
+        user_id = metadata.user_ids_by_email.get(email.lower())
+        if user_id is not None:
+            user_ids.append(user_id)
+            continue
+
         try:
             user = client.users_lookupByEmail(email=email)
+            cache_user(metadata, user.data["user"])  # type: ignore
             user_ids.append(user.data["user"]["id"])  # type: ignore
         except Exception:
             logger.error(f"Was not able to find slack user by email: {email}")
@@ -433,12 +485,11 @@ def fetch_user_ids_from_groups(
     user_ids: list[str] = []
     failed_to_find: list[str] = []
     try:
-        response = client.usergroups_list()
-        if not isinstance(response.data, dict):
+        all_group_data = get_usergroups(client)
+        if all_group_data is None:
             logger.error("Error fetching user groups")
             return user_ids, given_names
 
-        all_group_data = response.data.get("usergroups", [])
         name_id_map = {d["name"]: d["id"] for d in all_group_data}
         handle_id_map = {d["handle"]: d["id"] for d in all_group_data}
         for given_name in given_names:
@@ -449,9 +500,9 @@ def fetch_user_ids_from_groups(
                 failed_to_find.append(given_name)
                 continue
             try:
-                response = client.usergroups_users_list(usergroup=group_id)
-                if isinstance(response.data, dict):
-                    user_ids.extend(response.data.get("users", []))
+                members = get_usergroup_members(client, group_id)
+                if members is not None:
+                    user_ids.extend(members)
                 else:
                     failed_to_find.append(given_name)
             except Exception as e:
@@ -471,13 +522,11 @@ def fetch_group_ids_from_names(
     failed_to_find: list[str] = []
 
     try:
-        response = client.usergroups_list()
-        if not isinstance(response.data, dict):
+        all_group_data = get_usergroups(client)
+        if all_group_data is None:
             logger.error("Error fetching user groups")
             return group_data, given_names
 
-        all_group_data = response.data.get("usergroups", [])
-
         name_id_map = {d["name"]: d["id"] for d in all_group_data}
         handle_id_map = {d["handle"]: d["id"] for d in all_group_data}
 
@@ -501,11 +550,15 @@ def fetch_user_semantic_id_from_id(
     if not user_id:
         return None
 
-    response = client.users_info(user=user_id)
-    if not response["ok"]:
-        return None
+    metadata = get_workspace_metadata(client)
+    user = metadata.users.get(user_id)
+    if user is None:
+        response = client.users_info(user=user_id)
+        if not response["ok"]:
+            return None
 
-    user: dict = cast(dict[Any, dict], response.data).get("user", {})
+        user = cast(dict[Any, dict], response.data).get("user", {})
+        cache_user(metadata, user)
 
     return (
         user.get("real_name")
@@ -603,19 +656,151 @@ def slack_usage_report(action: str, sender_id: str | None, client: WebClient) ->
     )
 
 
+# Waiters re-run the acquire script at least this often, which keeps their ticket
+# in the queue. A ticket that isn't kept for _QUEUE_LEASE_SECONDS belongs to a
+# waiter that died and is dropped, so it can't hold up the waiters behind it.
+_QUEUE_RECHECK_SECONDS = 5.0
+_QUEUE_LEASE_SECONDS = 3 * _QUEUE_RECHECK_SECONDS
+
+# Takes a token from the bucket for the ticket once it is at the head of the queue.
+# Tickets are ordered by a per channel virtual time, so a busy channel can't starve
+# the others: each new ticket of a channel is scheduled one token interval after
+# the previous one. Returns {acquired, position in queue, ms until the next token
+# or -1 if the ticket isn't at the head of the queue}.
+_ACQUIRE_SCRIPT = """
+local bucket_key, queue_key, deadlines_key, channels_key = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local ticket, channel, notify_prefix = ARGV[1], ARGV[2], ARGV[3]
+local max_qpm = tonumber(ARGV[4])
+local max_wait = tonumber(ARGV[5])
+local lease = tonumber(ARGV[6])
+local ttl = math.ceil(max_wait) + 60
+
+local redis_time = redis.call('TIME')
+local now = tonumber(redis_time[1]) + tonumber(redis_time[2]) / 1000000
+local refill_per_second = max_qpm / 60
+
+local bucket = redis.call('HMGET', bucket_key, 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or max_qpm
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(max_qpm, tokens + math.max(0, now - updated_at) * refill_per_second)
+
+local function save_bucket()
+    redis.call('HSET', bucket_key, 'tokens', tostring(tokens), 'updated_at', tostring(now))
+    redis.call('EXPIRE', bucket_key, ttl)
+end
+
+local function notify_head()
+    local head = redis.call('ZRANGE', queue_key, 0, 0)[1]
+    if head then
+        redis.call('RPUSH', notify_prefix .. head, 1)
+        redis.call('EXPIRE', notify_prefix .. head, ttl)
+    end
+end
+
+-- the waiter of the ticket is alive, extend its lease
+if redis.call('ZSCORE', queue_key, ticket) then
+    redis.call('HSET', deadlines_key, ticket, tostring(now + lease))
+end
+
+-- drop tickets of waiters that timed out or died so they don't block the queue
+local dropped_head = false
+while true do
+    local head = redis.call('ZRANGE', queue_key, 0, 0)[1]
+    if not head then
+        break
+    end
+    local deadline = tonumber(redis.call('HGET', deadlines_key, head))
+    if deadline and deadline > now then
+        break
+    end
+    redis.call('ZREM', queue_key, head)
+    redis.call('HDEL', deadlines_key, head)
+    dropped_head = true
+end
+
+if not redis.call('ZSCORE', queue_key, ticket) then
+    if redis.call('ZCARD', queue_key) == 0 and tokens >= 1 then
+        tokens = tokens - 1
+        save_bucket()
+        return {1, 0, 0}
+    end
+
+    local score = math.max(now, tonumber(redis.call('HGET', channels_key, channel)) or 0)
+    redis.call('HSET', channels_key, channel, tostring(score + 1 / refill_per_second))
+    redis.call('ZADD', queue_key, score, ticket)
+    redis.call('HSET', deadlines_key, ticket, tostring(now + lease))
+    redis.call('EXPIRE', channels_key, ttl)
+    redis.call('EXPIRE', queue_key, ttl)
+    redis.call('EXPIRE', deadlines_key, ttl)
+end
+
+local head = redis.call('ZRANGE', queue_key, 0, 0)[1]
+if head == ticket and tokens >= 1 then
+    tokens = tokens - 1
+    save_bucket()
+    redis.call('ZREM', queue_key, ticket)
+    redis.call('HDEL', deadlines_key, ticket)
+    redis.call('DEL', notify_prefix .. ticket)
+    notify_head()
+    return {1, 0, 0}
+end
+
+save_bucket()
+if dropped_head then
+    notify_head()
+end
+
+local position = redis.call('ZRANK', queue_key, ticket) + 1
+if head == ticket then
+    return {0, position, math.ceil((1 - tokens) / refill_per_second * 1000)}
+end
+return {0, position, -1}
+"""
+
+# Removes the ticket of a waiter that gives up, waking up the next waiter if the
+# ticket was at the head of the queue
+_CANCEL_SCRIPT = """
+local queue_key, deadlines_key = KEYS[1], KEYS[2]
+local ticket, notify_prefix = ARGV[1], ARGV[2]
+
+local was_head = redis.call('ZRANGE', queue_key, 0, 0)[1] == ticket
+redis.call('ZREM', queue_key, ticket)
+redis.call('HDEL', deadlines_key, ticket)
+redis.call('DEL', notify_prefix .. ticket)
+if was_head then
+    local head = redis.call('ZRANGE', queue_key, 0, 0)[1]
+    if head then
+        redis.call('RPUSH', notify_prefix .. head, 1)
+    end
+end
+return 0
+"""
+
+
 class SlackRateLimiter:
+    """Limits the questions answered by OnyxBot to DANSWER_BOT_MAX_QPM per tenant,
+    across all listener pods.
+
+    The limit is a token bucket in Redis. Questions that don't get a token wait in a
+    queue that is shared by all pods and ordered fairly between channels. Waiters
+    block on a Redis list until they are notified that they reached the head of the
+    queue, and the head waiter sleeps until the bucket has a token again."""
+
     def __init__(self) -> None:
         self.max_qpm: int | None = DANSWER_BOT_MAX_QPM
         self.max_wait_time = DANSWER_BOT_MAX_WAIT_TIME
-        self.active_question = 0
-        self.last_reset_time = time.time()
-        self.waiting_questions: list[int] = []
 
-    def refill(self) -> None:
-        # If elapsed time is greater than the period, reset the active question count
-        if (time.time() - self.last_reset_time) > 60:
-            self.active_question = 0
-            self.last_reset_time = time.time()
+    @staticmethod
+    def _key_prefix(tenant_id: str) -> str:
+        # scripts and blocking pops don't go through the tenant prefixing of the
+        # client, so the tenant is part of the keys themselves
+        return f"{tenant_id}:slack_rate_limiter"
+
+    @classmethod
+    def get_queue_depth(cls, tenant_id: str) -> int:
+        return get_redis_client(tenant_id=tenant_id).zcard(
+            f"{cls._key_prefix(tenant_id)}:queue"
+        )
 
     def notify(
         self, client: WebClient, channel: str, position: int, thread_ts: str | None
@@ -629,39 +814,65 @@ class SlackRateLimiter:
             thread_ts=thread_ts,
         )
 
-    def is_available(self) -> bool:
-        if self.max_qpm is None:
-            return True
-
-        self.refill()
-        return self.active_question < self.max_qpm
-
-    def acquire_slot(self) -> None:
-        self.active_question += 1
-
-    def init_waiter(self) -> tuple[int, int]:
-        func_randid = random.getrandbits(128)
-        self.waiting_questions.append(func_randid)
-        position = self.waiting_questions.index(func_randid) + 1
-
-        return func_randid, position
-
-    def waiter(self, func_randid: int) -> None:
+    def acquire(self, client: WebClient, channel: str, thread_ts: str | None) -> None:
+        """Blocks until the question may be answered, raises TimeoutError if that
+        takes longer than max_wait_time."""
         if self.max_qpm is None:
             return
 
-        wait_time = 0
-        while (
-            self.active_question >= self.max_qpm
-            or self.waiting_questions[0] != func_randid
-        ):
-            if wait_time > self.max_wait_time:
-                raise TimeoutError
-            time.sleep(2)
-            wait_time += 2
-            self.refill()
-
-        del self.waiting_questions[0]
+        redis_client = get_redis_client()
+        key_prefix = self._key_prefix(get_current_tenant_id())
+        queue_key = f"{key_prefix}:queue"
+        deadlines_key = f"{key_prefix}:deadlines"
+        notify_prefix = f"{key_prefix}:notify:"
+        ticket = uuid.uuid4().hex
+
+        acquire_script = redis_client.register_script(_ACQUIRE_SCRIPT)
+        start_time = time.monotonic()
+        deadline = start_time + self.max_wait_time
+        notified_user = False
+        try:
+            while True:
+                acquired, position, wait_ms = acquire_script(
+                    keys=[
+                        f"{key_prefix}:bucket",
+                        queue_key,
+                        deadlines_key,
+                        f"{key_prefix}:channels",
+                    ],
+                    args=[
+                        ticket,
+                        channel,
+                        notify_prefix,
+                        self.max_qpm,
+                        self.max_wait_time,
+                        _QUEUE_LEASE_SECONDS,
+                    ],
+                )
+                if acquired:
+                    break
+
+                if not notified_user:
+                    self.notify(client, channel, position, thread_ts)
+                    notified_user = True
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError
+
+                # re-run the script every few seconds even without being notified,
+                # to keep the ticket and to drop a head whose waiter died
+                timeout = min(remaining, _QUEUE_RECHECK_SECONDS)
+                if wait_ms >= 0:
+                    timeout = min(timeout, wait_ms / 1000)
+                redis_client.blpop([notify_prefix + ticket], timeout=max(timeout, 0.01))
+        except BaseException:
+            redis_client.register_script(_CANCEL_SCRIPT)(
+                keys=[queue_key, deadlines_key], args=[ticket, notify_prefix]
+            )
+            raise
+        finally:
+            slack_question_wait_seconds.observe(time.monotonic() - start_time)
 
 
 def get_feedback_visibility() -> FeedbackVisibility:
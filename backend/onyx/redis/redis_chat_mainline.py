@@ -0,0 +1,79 @@
+import json
+from uuid import UUID
+
+from onyx.configs.chat_configs import CHAT_MAINLINE_CACHE_ENABLED
+from onyx.configs.chat_configs import CHAT_MAINLINE_CACHE_TTL_SECONDS
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+
+logger = setup_logger()
+
+_KEY_PREFIX = "chat_mainline"
+
+
+def _key(chat_session_id: UUID) -> str:
+    return f"{_KEY_PREFIX}:{chat_session_id}"
+
+
+def get_cached_chat_mainline(chat_session_id: UUID) -> list[int] | None:
+    """Returns the cached message ids of the session's mainline (root first), if any.
+    Callers must validate the ids against the messages they load since the cache may
+    be ahead of (uncommitted writes) or behind (other writers) the database."""
+    if not CHAT_MAINLINE_CACHE_ENABLED:
+        return None
+
+    try:
+        value = get_redis_client().get(_key(chat_session_id))
+    except Exception:
+        logger.exception("Failed to read the chat mainline cache")
+        return None
+
+    if value is None:
+        return None
+    return json.loads(value)
+
+
+def set_cached_chat_mainline(chat_session_id: UUID, message_ids: list[int]) -> None:
+    if not CHAT_MAINLINE_CACHE_ENABLED:
+        return
+
+    try:
+        get_redis_client().set(
+            _key(chat_session_id),
+            json.dumps(message_ids),
+            ex=CHAT_MAINLINE_CACHE_TTL_SECONDS,
+        )
+    except Exception:
+        logger.exception("Failed to write the chat mainline cache")
+
+
+def delete_cached_chat_mainline(chat_session_id: UUID) -> None:
+    if not CHAT_MAINLINE_CACHE_ENABLED:
+        return
+
+    try:
+        get_redis_client().delete(_key(chat_session_id))
+    except Exception:
+        logger.exception("Failed to delete the chat mainline cache")
+
+
+def update_cached_chat_mainline(
+    chat_session_id: UUID, parent_message_id: int, latest_child_message_id: int
+) -> None:
+    """Called when latest_child_message_id becomes the latest child of
+    parent_message_id. The cached mainline is cut after the parent and the child is
+    appended. Anything below the child (e.g. when switching back to an older branch)
+    is picked up on the next read, which extends the chain from its last message."""
+    cached_mainline = get_cached_chat_mainline(chat_session_id)
+    if cached_mainline is None:
+        return
+
+    if parent_message_id not in cached_mainline:
+        delete_cached_chat_mainline(chat_session_id)
+        return
+
+    parent_index = cached_mainline.index(parent_message_id)
+    set_cached_chat_mainline(
+        chat_session_id,
+        cached_mainline[: parent_index + 1] + [latest_child_message_id],
+    )
@@ -124,6 +124,9 @@ class TenantRedis(redis.Redis):
             "hexists",
             "hset",
             "hdel",
+            "hincrby",
+            "hgetall",
+            "expire",
             "ttl",
             "pttl",
         ]  # Regular methods that need simple prefixing
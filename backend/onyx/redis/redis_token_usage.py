@@ -0,0 +1,214 @@
+from collections.abc import Callable
+from collections.abc import Sequence
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from uuid import UUID
+
+from onyx.configs.chat_configs import TOKEN_USAGE_COUNTER_RETENTION_HOURS
+from onyx.redis.redis_pool import get_redis_client
+from onyx.utils.logger import setup_logger
+from shared_configs.contextvars import get_current_tenant_id
+
+logger = setup_logger()
+
+_KEY_PREFIX = "token_usage"
+# Marks a counter as complete, counters without it only hold the increments made
+# since they expired and are seeded from Postgres on the next read
+_SEEDED_FIELD = "seeded"
+# Increments are also logged for this long, so that replacing a counter with the
+# usage from Postgres keeps the ones made while Postgres was being read
+_INCREMENT_LOG_SECONDS = 5 * 60
+# Max number of buckets written per HSET, to stay within Lua's unpack limit
+_SET_BATCH_SIZE = 1000
+
+# Adds ARGV[2] tokens to bucket ARGV[1] and logs the increment with its time
+_INCREMENT_SCRIPT = """
+local counter_key, log_key = KEYS[1], KEYS[2]
+local bucket, token_count = ARGV[1], ARGV[2]
+local retention_seconds, log_seconds = tonumber(ARGV[3]), tonumber(ARGV[4])
+
+local redis_time = redis.call('TIME')
+local now_ms = tonumber(redis_time[1]) * 1000 + math.floor(tonumber(redis_time[2]) / 1000)
+
+redis.call('HINCRBY', counter_key, bucket, token_count)
+redis.call('EXPIRE', counter_key, retention_seconds)
+
+redis.call('RPUSH', log_key, now_ms .. ':' .. bucket .. ':' .. token_count)
+while true do
+    local oldest = redis.call('LINDEX', log_key, 0)
+    if not oldest or tonumber(string.match(oldest, '^(%d+):')) >= now_ms - log_seconds * 1000 then
+        break
+    end
+    redis.call('LPOP', log_key)
+end
+redis.call('EXPIRE', log_key, log_seconds)
+"""
+
+# Replaces the counter with the buckets in ARGV[3:], then re-applies the increments
+# logged since ARGV[1] (ms), which the buckets may not include
+_REPLACE_SCRIPT = """
+local counter_key, log_key = KEYS[1], KEYS[2]
+local since_ms, retention_seconds = tonumber(ARGV[1]), tonumber(ARGV[2])
+local batch_size = tonumber(ARGV[3])
+
+redis.call('DEL', counter_key)
+for i = 4, #ARGV, batch_size do
+    redis.call('HSET', counter_key, unpack(ARGV, i, math.min(i + batch_size - 1, #ARGV)))
+end
+
+for _, entry in ipairs(redis.call('LRANGE', log_key, 0, -1)) do
+    local logged_ms, bucket, token_count = string.match(entry, '^(%d+):(%d+):(%d+)$')
+    if tonumber(logged_ms) >= since_ms then
+        redis.call('HINCRBY', counter_key, bucket, token_count)
+    end
+end
+redis.call('EXPIRE', counter_key, retention_seconds)
+"""
+
+USER_TOKEN_USAGE_KEY_PREFIX = f"{_KEY_PREFIX}:user:"
+USER_GROUP_TOKEN_USAGE_KEY_PREFIX = f"{_KEY_PREFIX}:user_group:"
+
+TokenUsage = Sequence[tuple[datetime, int]]
+
+
+def get_global_token_usage_key() -> str:
+    return f"{_KEY_PREFIX}:global"
+
+
+def get_user_token_usage_key(user_id: UUID) -> str:
+    return f"{USER_TOKEN_USAGE_KEY_PREFIX}{user_id}"
+
+
+def get_user_group_token_usage_key(user_group_id: int) -> str:
+    return f"{USER_GROUP_TOKEN_USAGE_KEY_PREFIX}{user_group_id}"
+
+
+def get_token_usage_keys() -> list[str]:
+    return [
+        key.decode() if isinstance(key, bytes) else key
+        for key in get_redis_client().scan_iter(match=f"{_KEY_PREFIX}:*")
+    ]
+
+
+def _get_script_keys(key: str) -> list[str]:
+    # scripts don't go through the tenant prefixing of the client, so the tenant
+    # is part of the keys themselves
+    counter_key = f"{get_current_tenant_id()}:{key}"
+    return [counter_key, f"{counter_key}:increments"]
+
+
+def _retention_seconds() -> int:
+    return TOKEN_USAGE_COUNTER_RETENTION_HOURS * 60 * 60
+
+
+def get_retention_cutoff_time() -> datetime:
+    return datetime.now(tz=timezone.utc) - timedelta(
+        hours=TOKEN_USAGE_COUNTER_RETENTION_HOURS
+    )
+
+
+def _to_bucket(time: datetime) -> int:
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return int(time.timestamp()) // 60
+
+
+def _from_bucket(bucket: int) -> datetime:
+    return datetime.fromtimestamp(bucket * 60, tz=timezone.utc)
+
+
+def increment_token_usage(keys: list[str], token_count: int) -> None:
+    """Adds the tokens to the current minute of each counter"""
+    if not keys or token_count <= 0:
+        return
+
+    bucket = str(_to_bucket(datetime.now(tz=timezone.utc)))
+    increment_script = get_redis_client().register_script(_INCREMENT_SCRIPT)
+    for key in keys:
+        increment_script(
+            keys=_get_script_keys(key),
+            args=[bucket, token_count, _retention_seconds(), _INCREMENT_LOG_SECONDS],
+        )
+
+
+def set_token_usage(
+    key: str, fetch_usage: Callable[[], TokenUsage | None]
+) -> TokenUsage | None:
+    """Replaces the counter with the usage returned by fetch_usage, e.g. as computed
+    from Postgres, and returns it. Increments made while fetch_usage runs are kept,
+    those of messages fetch_usage already saw may then be counted twice until the
+    counter is replaced again. Nothing is replaced if fetch_usage returns None."""
+    redis_client = get_redis_client()
+    seconds, microseconds = redis_client.time()
+    fetch_started_ms = seconds * 1000 + microseconds // 1000
+
+    usage = fetch_usage()
+    if usage is None:
+        return None
+
+    buckets: dict[str, int] = {_SEEDED_FIELD: 1}
+    for time_sent, token_count in usage:
+        bucket = str(_to_bucket(time_sent))
+        buckets[bucket] = buckets.get(bucket, 0) + int(token_count or 0)
+
+    redis_client.register_script(_REPLACE_SCRIPT)(
+        keys=_get_script_keys(key),
+        args=[
+            fetch_started_ms,
+            _retention_seconds(),
+            2 * _SET_BATCH_SIZE,
+            *(item for bucket in buckets.items() for item in bucket),
+        ],
+    )
+    return usage
+
+
+def get_token_usage(
+    key: str,
+    cutoff_time: datetime,
+    fetch_usage: Callable[[datetime], TokenUsage],
+) -> TokenUsage:
+    """Returns the usage since cutoff_time grouped by minute, in the same format as
+    fetch_usage which computes it from Postgres. fetch_usage is used when the counter
+    doesn't go back far enough, hasn't been seeded yet or Redis is unavailable."""
+    retention_cutoff_time = get_retention_cutoff_time()
+    if cutoff_time < retention_cutoff_time:
+        return fetch_usage(cutoff_time)
+
+    try:
+        redis_client = get_redis_client()
+        counter = {
+            (field.decode() if isinstance(field, bytes) else field): int(value)
+            for field, value in redis_client.hgetall(key).items()
+        }
+
+        if _SEEDED_FIELD not in counter:
+            # seed with the full retention window so that later reads with an
+            # older cutoff time are complete as well
+            usage = (
+                set_token_usage(key, lambda: fetch_usage(retention_cutoff_time)) or []
+            )
+            return [
+                (time_sent, token_count)
+                for time_sent, token_count in usage
+                if _to_bucket(time_sent) >= _to_bucket(cutoff_time)
+            ]
+
+        del counter[_SEEDED_FIELD]
+        retention_bucket = _to_bucket(retention_cutoff_time)
+        expired_buckets = [
+            bucket for bucket in counter if int(bucket) < retention_bucket
+        ]
+        if expired_buckets:
+            redis_client.hdel(key, *expired_buckets)
+    except Exception:
+        logger.exception(f"Failed to read token usage counter {key}")
+        return fetch_usage(cutoff_time)
+
+    cutoff_bucket = _to_bucket(cutoff_time)
+    return [
+        (_from_bucket(int(bucket)), token_count)
+        for bucket, token_count in counter.items()
+        if int(bucket) >= cutoff_bucket
+    ]
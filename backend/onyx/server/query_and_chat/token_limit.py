@@ -3,6 +3,8 @@ from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
 from functools import lru_cache
+from functools import partial
+from uuid import UUID
 
 from dateutil import tz
 from fastapi import Depends
@@ -18,6 +20,13 @@ from onyx.db.models import ChatSession
 from onyx.db.models import TokenRateLimit
 from onyx.db.models import User
 from onyx.db.token_limit import fetch_all_global_token_rate_limits
+from onyx.redis.redis_token_usage import get_global_token_usage_key
+from onyx.redis.redis_token_usage import get_retention_cutoff_time
+from onyx.redis.redis_token_usage import get_token_usage
+from onyx.redis.redis_token_usage import get_token_usage_keys
+from onyx.redis.redis_token_usage import increment_token_usage
+from onyx.redis.redis_token_usage import set_token_usage
+from onyx.redis.redis_token_usage import TokenUsage
 from onyx.utils.logger import setup_logger
 from onyx.utils.variable_functionality import fetch_versioned_implementation
 
@@ -59,7 +68,13 @@ def _user_is_rate_limited_by_global() -> None:
 
         if global_rate_limits:
             global_cutoff_time = _get_cutoff_time(global_rate_limits)
-            global_usage = _fetch_global_usage(global_cutoff_time, db_session)
+            global_usage = get_token_usage(
+                key=get_global_token_usage_key(),
+                cutoff_time=global_cutoff_time,
+                fetch_usage=lambda cutoff_time: _fetch_global_usage(
+                    cutoff_time, db_session
+                ),
+            )
 
             if _is_rate_limited(global_rate_limits, global_usage):
                 raise HTTPException(
@@ -89,6 +104,57 @@ def _fetch_global_usage(
     return [(row[0], row[1]) for row in result]
 
 
+"""
+Token usage counters
+"""
+
+
+def record_token_usage(
+    chat_session_id: UUID, token_count: int, db_session: Session
+) -> None:
+    """Adds the tokens of a newly saved chat message to the token usage counters
+    that the rate limits are checked against"""
+    if token_count <= 0 or not any_rate_limit_exists():
+        return
+
+    try:
+        versioned_get_token_usage_keys = fetch_versioned_implementation(
+            "onyx.server.query_and_chat.token_limit", _get_token_usage_keys.__name__
+        )
+        increment_token_usage(
+            versioned_get_token_usage_keys(chat_session_id, db_session), token_count
+        )
+    except Exception:
+        # the counters are reconciled against Postgres periodically
+        logger.exception("Failed to record token usage")
+
+
+def _get_token_usage_keys(_: UUID, __: Session) -> list[str]:
+    return [get_global_token_usage_key()]
+
+
+def reconcile_token_usage_counters(db_session: Session) -> None:
+    """Recomputes the existing token usage counters from Postgres"""
+    versioned_fetch_token_usage = fetch_versioned_implementation(
+        "onyx.server.query_and_chat.token_limit", _fetch_token_usage.__name__
+    )
+    cutoff_time = get_retention_cutoff_time()
+    for key in get_token_usage_keys():
+        usage = set_token_usage(
+            key, partial(versioned_fetch_token_usage, key, cutoff_time, db_session)
+        )
+        if usage is None:
+            logger.warning(f"Skipping unknown token usage counter {key}")
+
+
+def _fetch_token_usage(
+    key: str, cutoff_time: datetime, db_session: Session
+) -> TokenUsage | None:
+    if key == get_global_token_usage_key():
+        return _fetch_global_usage(cutoff_time, db_session)
+    return None
+
+
 """
 Common functions
 """
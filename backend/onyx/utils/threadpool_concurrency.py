@@ -1,7 +1,9 @@
 import collections.abc
 import contextvars
 import copy
+import queue
 import threading
+import time
 import uuid
 from collections.abc import Callable
 from collections.abc import Iterator
@@ -384,3 +386,124 @@ def parallel_yield(gens: list[Iterator[R]], max_workers: int = 10) -> Iterator[R
                     )
                     next_ind += 1
                 del future_to_index[future]
+
+
+class _PipelineStageDone:
+    pass
+
+
+class _PipelineStageError:
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+class PipelineStage(Generic[R]):
+    """
+    Runs `produce` in a background thread and hands the items it yields to the
+    consumer through a bounded queue. Once `queue_depth` items are waiting, the
+    producer blocks until the consumer catches up (back-pressure).
+
+    Stages can be chained by having `produce` iterate over an upstream stage, which
+    lets each step of a multi-step workload (e.g. fetch -> chunk -> embed) run
+    concurrently with the others while still preserving item order.
+
+    Exceptions raised by `produce` are re-raised in the consumer at the position
+    they occurred. If the consumer bails out early, `stop` must be called (or the
+    stage used as a context manager) so that the producer thread exits.
+    """
+
+    _PUT_POLL_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        name: str,
+        produce: Callable[[], Iterator[R]],
+        queue_depth: int,
+        stop_event: threading.Event | None = None,
+    ):
+        if queue_depth < 1:
+            raise ValueError(f"queue_depth must be at least 1, got {queue_depth}")
+
+        self.name = name
+        self._produce = produce
+        self._queue: queue.Queue[R | _PipelineStageDone | _PipelineStageError] = (
+            queue.Queue(maxsize=queue_depth)
+        )
+        # shared between chained stages so that stopping the last stage stops all of them
+        self.stop_event = stop_event or threading.Event()
+        self._context = contextvars.copy_context()
+        self._thread = threading.Thread(
+            target=self._context.run, args=(self._run,), name=name, daemon=True
+        )
+
+        # time spent blocked on a full queue (consumer is the bottleneck) and
+        # blocked on an empty queue (this stage is the bottleneck)
+        self.producer_wait_time = 0.0
+        self.consumer_wait_time = 0.0
+        self.num_items = 0
+
+    def start(self) -> "PipelineStage[R]":
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        self.stop_event.set()
+        self._thread.join(timeout)
+
+    def __enter__(self) -> "PipelineStage[R]":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop(timeout=self._PUT_POLL_INTERVAL * 2)
+
+    def _put(self, item: R | _PipelineStageDone | _PipelineStageError) -> bool:
+        start = time.monotonic()
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self._queue.put(item, timeout=self._PUT_POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.producer_wait_time += time.monotonic() - start
+
+    def _run(self) -> None:
+        try:
+            for item in self._produce():
+                if not self._put(item):
+                    return
+                self.num_items += 1
+        except BaseException as e:
+            self._put(_PipelineStageError(e))
+            return
+
+        self._put(_PipelineStageDone())
+
+    def __iter__(self) -> Iterator[R]:
+        while True:
+            start = time.monotonic()
+            try:
+                item = self._queue.get(timeout=self._PUT_POLL_INTERVAL)
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    return
+                continue
+            finally:
+                self.consumer_wait_time += time.monotonic() - start
+
+            if isinstance(item, _PipelineStageDone):
+                return
+            if isinstance(item, _PipelineStageError):
+                raise item.exception
+
+            yield item
+
+    def stats_str(self) -> str:
+        return (
+            f"stage={self.name} "
+            f"items={self.num_items} "
+            f"producer_wait={self.producer_wait_time:.2f}s "
+            f"consumer_wait={self.consumer_wait_time:.2f}s"
+        )
@@ -0,0 +1,130 @@
+"""Compares the model server backends for local embedding / reranking models.
+
+For every backend, reports the throughput and how far its output drifts from the
+full precision torch model (cosine similarity of the embeddings, absolute
+difference of the rerank scores).
+
+Usage, from the backend directory:
+
+python scripts/benchmark_model_backends.py --model nomic-ai/nomic-embed-text-v1
+
+python scripts/benchmark_model_backends.py --rerank \
+    --model mixedbread-ai/mxbai-rerank-xsmall-v1 --backends torch onnx
+
+The ONNX backend requires optimum[onnxruntime] to be installed.
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from model_server.model_backends import load_cross_encoder
+from model_server.model_backends import load_sentence_transformer
+from model_server.model_backends import LocalModelBackend
+
+_WORDS = (
+    "the search index stores chunks of documents from every connector so that "
+    "questions can be answered with citations to the most relevant sources while "
+    "respecting the permissions of each user and the freshness of the content"
+).split()
+
+
+def _generate_texts(num_texts: int, num_words: int) -> list[str]:
+    rng = random.Random(0)
+    return [" ".join(rng.choices(_WORDS, k=num_words)) for _ in range(num_texts)]
+
+
+def _benchmark_embedding(
+    model_name: str,
+    backend: LocalModelBackend,
+    texts: list[str],
+    batch_size: int,
+    max_context_length: int,
+) -> tuple[np.ndarray, float]:
+    model = load_sentence_transformer(model_name, backend)
+    model.max_seq_length = max_context_length
+    # warm up so lazy initialization isn't part of the measurement
+    model.encode(texts[:batch_size], batch_size=batch_size)
+
+    start = time.monotonic()
+    embeddings = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    elapsed = time.monotonic() - start
+    return np.asarray(embeddings, dtype=np.float32), len(texts) / elapsed
+
+
+def _benchmark_rerank(
+    model_name: str,
+    backend: LocalModelBackend,
+    texts: list[str],
+    batch_size: int,
+) -> tuple[np.ndarray, float]:
+    model = load_cross_encoder(model_name, backend)
+    pairs = [(texts[0], text) for text in texts]
+    model.predict(pairs[:batch_size], batch_size=batch_size)
+
+    start = time.monotonic()
+    scores = model.predict(pairs, batch_size=batch_size)
+    elapsed = time.monotonic() - start
+    return np.asarray(scores, dtype=np.float32), len(pairs) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--model", required=True, help="HuggingFace model name")
+    parser.add_argument(
+        "--rerank", action="store_true", help="Benchmark a cross encoder model"
+    )
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=[backend.value for backend in LocalModelBackend],
+        choices=[backend.value for backend in LocalModelBackend],
+    )
+    parser.add_argument("--num-texts", type=int, default=512)
+    parser.add_argument("--num-words", type=int, default=128)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-context-length", type=int, default=512)
+    args = parser.parse_args()
+
+    texts = _generate_texts(args.num_texts, args.num_words)
+    # the full precision model is always run first as the reference
+    backends = [LocalModelBackend.TORCH] + [
+        LocalModelBackend(backend)
+        for backend in args.backends
+        if backend != LocalModelBackend.TORCH.value
+    ]
+
+    reference: np.ndarray | None = None
+    unit = "pairs/sec" if args.rerank else "vectors/sec"
+    for backend in backends:
+        if args.rerank:
+            outputs, throughput = _benchmark_rerank(
+                args.model, backend, texts, args.batch_size
+            )
+        else:
+            outputs, throughput = _benchmark_embedding(
+                args.model,
+                backend,
+                texts,
+                args.batch_size,
+                args.max_context_length,
+            )
+
+        if reference is None:
+            reference = outputs
+            drift = "reference"
+        elif args.rerank:
+            abs_diff = np.abs(outputs - reference)
+            drift = f"score diff mean={abs_diff.mean():.5f} max={abs_diff.max():.5f}"
+        else:
+            # both sides are normalized, so the row-wise dot product is the cosine
+            cosine = np.sum(outputs * reference, axis=1)
+            drift = f"cosine mean={cosine.mean():.5f} min={cosine.min():.5f}"
+
+        print(f"{backend.value:>10}: {throughput:10.1f} {unit}, {drift}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import json
 import os
 from typing import Any
 from typing import List
@@ -56,6 +57,51 @@ MIN_THREADS_ML_MODELS = int(os.environ.get("MIN_THREADS_ML_MODELS") or 1)
 # or intent classification
 INDEXING_ONLY = os.environ.get("INDEXING_ONLY", "").lower() == "true"
 
+# Concurrent embedding / reranking requests for the same local model are coalesced
+# into a single forward pass of up to this many texts, waiting at most
+# MODEL_SERVER_MAX_BATCH_WAIT_MS for other requests to arrive. Set the wait to 0 to
+# run every request on its own
+MODEL_SERVER_MAX_BATCH_SIZE = int(os.environ.get("MODEL_SERVER_MAX_BATCH_SIZE") or 64)
+MODEL_SERVER_MAX_BATCH_WAIT_MS = float(
+    os.environ.get("MODEL_SERVER_MAX_BATCH_WAIT_MS") or 5
+)
+
+# Query analysis / classification models run in a dedicated pool of this many workers
+# so their forward passes don't block the event loop, with at most
+# MODEL_SERVER_PER_MODEL_CONCURRENCY concurrent calls of any one model
+MODEL_SERVER_INFERENCE_WORKERS = int(
+    os.environ.get("MODEL_SERVER_INFERENCE_WORKERS") or 4
+)
+MODEL_SERVER_PER_MODEL_CONCURRENCY = int(
+    os.environ.get("MODEL_SERVER_PER_MODEL_CONCURRENCY") or 2
+)
+# Set to "true" to use worker processes instead of threads so inference can use
+# multiple CPU cores. Each process loads its own copy of the models
+MODEL_SERVER_INFERENCE_PROCESS_POOL = (
+    os.environ.get("MODEL_SERVER_INFERENCE_PROCESS_POOL", "").lower() == "true"
+)
+
+
+def _parse_model_backends(env_var_name: str) -> dict[str, str]:
+    raw_model_backends = os.environ.get(env_var_name)
+    if not raw_model_backends:
+        return {}
+    try:
+        return dict(json.loads(raw_model_backends))
+    except (json.JSONDecodeError, TypeError, ValueError):
+        raise ValueError(
+            f"{env_var_name} must be a JSON object mapping model names to backends"
+        )
+
+
+# Execution backend of local embedding / reranking models, as a JSON object mapping
+# the model name to "torch" (the default), "torch_int8" (dynamically quantized to
+# int8, CPU only) or "onnx" (ONNX Runtime, requires optimum[onnxruntime]). The
+# listed models are loaded and warmed up when the model server starts, e.g.
+# {"nomic-ai/nomic-embed-text-v1": "onnx"}
+EMBEDDING_MODEL_BACKENDS = _parse_model_backends("EMBEDDING_MODEL_BACKENDS")
+RERANK_MODEL_BACKENDS = _parse_model_backends("RERANK_MODEL_BACKENDS")
+
 # The process needs to have this for the log file to write to
 # otherwise, it will not create additional log files
 # This should just be the filename base without extension or path.
@@ -71,6 +117,17 @@ LOG_LEVEL = os.environ.get("LOG_LEVEL") or "info"
 # allow us to specify a custom timeout
 API_BASED_EMBEDDING_TIMEOUT = int(os.environ.get("API_BASED_EMBEDDING_TIMEOUT", "600"))
 
+# Max concurrent requests (and pooled connections) from the model server to each
+# embedding provider. When a provider rate limits a request, requests to it are
+# paused for its Retry-After, the concurrency is temporarily reduced and the
+# request is retried up to CLOUD_EMBEDDING_RATE_LIMIT_RETRIES times
+CLOUD_EMBEDDING_MAX_CONCURRENCY = int(
+    os.environ.get("CLOUD_EMBEDDING_MAX_CONCURRENCY") or 16
+)
+CLOUD_EMBEDDING_RATE_LIMIT_RETRIES = int(
+    os.environ.get("CLOUD_EMBEDDING_RATE_LIMIT_RETRIES") or 3
+)
+
 # Local batch size for VertexAI embedding models currently calibrated for item size of 512 tokens
 # NOTE: increasing this value may lead to API errors due to token limit exhaustion per call.
 VERTEXAI_EMBEDDING_LOCAL_BATCH_SIZE = int(
@@ -82,6 +139,14 @@ OPENAI_EMBEDDING_TIMEOUT = int(
     os.environ.get("OPENAI_EMBEDDING_TIMEOUT", API_BASED_EMBEDDING_TIMEOUT)
 )
 
+# Wire format requested for embeddings returned by the model server. "float32" and
+# "float16" send the vectors as raw little-endian buffers instead of JSON lists of
+# floats, "json" always uses JSON. Model servers that don't support the binary
+# formats just ignore the request and respond with JSON.
+MODEL_SERVER_EMBEDDING_TRANSPORT = (
+    os.environ.get("MODEL_SERVER_EMBEDDING_TRANSPORT") or "float32"
+).lower()
+
 # Whether or not to strictly enforce token limit for chunking.
 STRICT_CHUNK_TOKEN_LIMIT = (
     os.environ.get("STRICT_CHUNK_TOKEN_LIMIT", "").lower() == "true"
@@ -1,3 +1,4 @@
+import numpy as np
 from pydantic import BaseModel
 
 from shared_configs.enums import EmbeddingProvider
@@ -45,6 +46,60 @@ class EmbedResponse(BaseModel):
     embeddings: list[Embedding]
 
 
+# Binary alternatives to the JSON EmbedResponse. The body is the embeddings as one
+# contiguous little-endian (num_texts x dim) matrix, and the dimension is sent in
+# the EMBEDDING_DIM_HEADER header. Clients opt in via the Accept header.
+EMBEDDING_FLOAT32_MEDIA_TYPE = "application/vnd.onyx.embeddings.float32"
+EMBEDDING_FLOAT16_MEDIA_TYPE = "application/vnd.onyx.embeddings.float16"
+EMBEDDING_DIM_HEADER = "X-Onyx-Embedding-Dim"
+
+_EMBEDDING_MEDIA_TYPE_TO_DTYPE: dict[str, str] = {
+    EMBEDDING_FLOAT32_MEDIA_TYPE: "<f4",
+    EMBEDDING_FLOAT16_MEDIA_TYPE: "<f2",
+}
+_EMBEDDING_TRANSPORT_TO_MEDIA_TYPE: dict[str, str] = {
+    "float32": EMBEDDING_FLOAT32_MEDIA_TYPE,
+    "float16": EMBEDDING_FLOAT16_MEDIA_TYPE,
+}
+
+
+def get_embedding_accept_header(transport: str) -> str:
+    """Accept header for an embed request, preferring the binary format if enabled."""
+    media_type = _EMBEDDING_TRANSPORT_TO_MEDIA_TYPE.get(transport)
+    if media_type is None:
+        return "application/json"
+    return f"{media_type}, application/json;q=0.5"
+
+
+def get_binary_embedding_media_type(accept_header: str | None) -> str | None:
+    """Returns the binary embedding media type the client accepts, if any."""
+    if not accept_header:
+        return None
+
+    for accepted in accept_header.split(","):
+        media_type = accepted.split(";")[0].strip().lower()
+        if media_type in _EMBEDDING_MEDIA_TYPE_TO_DTYPE:
+            return media_type
+    return None
+
+
+def encode_binary_embeddings(
+    embeddings: "np.ndarray | list[Embedding]", media_type: str
+) -> tuple[bytes, int]:
+    """Returns the raw buffer and the dimension of the embeddings."""
+    matrix = np.asarray(embeddings, dtype=_EMBEDDING_MEDIA_TYPE_TO_DTYPE[media_type])
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a 2D embedding matrix, got shape {matrix.shape}")
+    return matrix.tobytes(), matrix.shape[1]
+
+
+def decode_binary_embeddings(content: bytes, media_type: str, dim: int) -> np.ndarray:
+    """Zero-copy view of a binary embedding response as a (num_texts x dim) matrix."""
+    return np.frombuffer(
+        content, dtype=_EMBEDDING_MEDIA_TYPE_TO_DTYPE[media_type]
+    ).reshape(-1, dim)
+
+
 class RerankRequest(BaseModel):
     query: str
     documents: list[str]
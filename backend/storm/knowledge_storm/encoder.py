@@ -1,7 +1,10 @@
+import hashlib
 import os
+import threading
 import numpy as np
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import List, Tuple, Union, Optional, Dict, Literal
 from pathlib import Path
 
@@ -32,6 +35,64 @@ except ImportError:
 
     litellm = LitellmPlaceholder()
 
+# Max number of inputs per embedding request supported by each provider
+MAX_EMBEDDING_BATCH_SIZES = {"openai": 2048, "azure": 2048}
+# Max number of tokens, summed over all inputs, per embedding request supported by
+# each provider
+MAX_EMBEDDING_BATCH_TOKENS = {"openai": 300_000, "azure": 300_000}
+
+
+def estimate_token_count(text: str) -> int:
+    """
+    Cheap upper-bound-ish estimate of the number of tokens of a text, at about one
+    token per 3 bytes of UTF-8. English text averages about 4 characters per token and
+    CJK text about one token per 3-byte character.
+    """
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+class EmbeddingCache:
+    """
+    A thread-safe in-memory LRU cache of embeddings keyed by (model, text hash), shared
+    by all Encoder instances so that snippets embedded once are not sent again.
+
+    Args:
+        max_size (int): The maximum number of embeddings to keep. 0 disables the cache.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._embeddings: OrderedDict[Tuple[str, str], np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model: str, text: str) -> Tuple[str, str]:
+        return model, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        key = self._key(model, text)
+        with self._lock:
+            embedding = self._embeddings.get(key)
+            if embedding is not None:
+                self._embeddings.move_to_end(key)
+            return embedding
+
+    def set(self, model: str, text: str, embedding: List[float]):
+        if self.max_size <= 0:
+            return
+        key = self._key(model, text)
+        with self._lock:
+            self._embeddings[key] = np.asarray(embedding, dtype=np.float32)
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.max_size:
+                self._embeddings.popitem(last=False)
+
+
+# At 1536 float32 dimensions per embedding, the default bound is about 60MB
+embedding_cache = EmbeddingCache(
+    max_size=int(os.getenv("STORM_EMBEDDING_CACHE_SIZE", "10000"))
+)
+
 
 class Encoder:
     """
@@ -45,8 +106,9 @@ class Encoder:
 
     Features:
         - Support for multiple embedding models (e.g., OpenAI, Azure).
-        - Parallel processing for faster embedding generation.
-        - Local disk caching to store and reuse embedding results.
+        - Batched requests, processed in parallel, for faster embedding generation.
+        - In-memory caching of embeddings per text and local disk caching of
+          embedding requests to store and reuse embedding results.
         - Total token usage tracking for cost monitoring.
 
     Note:
@@ -60,6 +122,8 @@ class Encoder:
         api_key: Optional[str] = None,
         api_base: Optional[str] = None,
         api_version: Optional[str] = None,
+        max_batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
     ):
         """
         Initializes the Encoder with the appropriate embedding model.
@@ -69,6 +133,10 @@ class Encoder:
             api_key (Optional[str]): API key for the encoder service.
             api_base (Optional[str]): API base URL for the encoder service.
             api_version (Optional[str]): API version for the encoder service.
+            max_batch_size (Optional[int]): Max number of texts per embedding request,
+                defaults to the max supported by the encoder service.
+            max_batch_tokens (Optional[int]): Max estimated number of tokens per
+                embedding request, defaults to the max supported by the encoder service.
         """
         self.embedding_model_name = None
         self.kargs = {}
@@ -93,6 +161,12 @@ class Encoder:
             raise ValueError(
                 f"Unsupported ENCODER_API_TYPE '{encoder_type}'. Supported types are 'openai', 'azure', 'together'."
             )
+        self.max_batch_size = (
+            max_batch_size or MAX_EMBEDDING_BATCH_SIZES[encoder_type.lower()]
+        )
+        self.max_batch_tokens = (
+            max_batch_tokens or MAX_EMBEDDING_BATCH_TOKENS[encoder_type.lower()]
+        )
 
     def get_total_token_usage(self, reset: bool = False) -> int:
         """
@@ -121,58 +195,104 @@ class Encoder:
         """
         return self._get_text_embeddings(texts, max_workers=max_workers)
 
-    def _get_single_text_embedding(self, text):
+    def _get_batch_embeddings(
+        self, batch: List[str]
+    ) -> Tuple[List[Tuple[str, List[float]]], int]:
         response = litellm.embedding(
-            model=self.embedding_model_name, input=text, caching=True, **self.kargs
+            model=self.embedding_model_name, input=batch, caching=True, **self.kargs
         )
-        embedding = response.data[0]["embedding"]
+        # the embeddings are returned in the order of the inputs
+        embeddings = [data["embedding"] for data in response.data]
         token_usage = response.get("usage", {}).get("total_tokens", 0)
-        return text, embedding, token_usage
+        return list(zip(batch, embeddings)), token_usage
+
+    def _split_into_batches(self, texts: List[str]) -> List[List[str]]:
+        batches = []
+        batch: List[str] = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = estimate_token_count(text)
+            if batch and (
+                len(batch) >= self.max_batch_size
+                or batch_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
 
     def _get_text_embeddings(
         self,
         texts: Union[str, List[str]],
         max_workers: int = 5,
-    ) -> Tuple[np.ndarray, int]:
+    ) -> np.ndarray:
         """
-        Get text embeddings using OpenAI's text-embedding-3-small model.
+        Get text embeddings using the configured embedding model.
+
+        Texts that are in the embedding cache are not sent again, the remaining unique
+        texts are sent in batches of up to `max_batch_size` texts and `max_batch_tokens`
+        estimated tokens per request. A batch that fails is split in halves and retried,
+        until only the texts that fail on their own are left out.
 
         Args:
             texts (Union[str, List[str]]): A single text string or a list of text strings to embed.
             max_workers (int): The maximum number of workers for parallel processing.
-            api_key (str): The API key for accessing OpenAI's services.
-            embedding_cache (Optional[Dict[str, np.ndarray]]): A cache to store previously computed embeddings.
 
         Returns:
-            Tuple[np.ndarray, int]: The 2D array of embeddings and the total token usage.
+            np.ndarray: The embedding for a single text, or the 2D array of embeddings
+                in the order of the input texts. Texts that failed to embed are skipped.
         """
+        single_text = isinstance(texts, str)
+        text_list = [texts] if single_text else texts
+
+        embeddings: Dict[str, np.ndarray] = {}
+        uncached_texts = []
+        for text in dict.fromkeys(text_list):
+            embedding = embedding_cache.get(self.embedding_model_name, text)
+            if embedding is not None:
+                embeddings[text] = embedding
+            else:
+                uncached_texts.append(text)
 
-        if isinstance(texts, str):
-            _, embedding, tokens = self._get_single_text_embedding(texts)
-            self.total_token_usage += tokens
-            return np.array(embedding)
-
-        embeddings = []
         total_tokens = 0
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {
-                executor.submit(self._get_single_text_embedding, text): text
-                for text in texts
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            pending: Dict[Future, List[str]] = {
+                executor.submit(self._get_batch_embeddings, batch): batch
+                for batch in self._split_into_batches(uncached_texts)
             }
-
-            for future in as_completed(futures):
-                try:
-                    text, embedding, tokens = future.result()
-                    embeddings.append((text, embedding, tokens))
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = pending.pop(future)
+                    try:
+                        batch_embeddings, tokens = future.result()
+                    except Exception as e:
+                        # errors for a single text are raised, lists skip the texts
+                        # that failed
+                        if single_text:
+                            raise
+                        if len(batch) == 1:
+                            print(f"An error occurred for text: {batch[0]}")
+                            print(e)
+                            continue
+                        middle = len(batch) // 2
+                        for half in (batch[:middle], batch[middle:]):
+                            half_future = executor.submit(
+                                self._get_batch_embeddings, half
+                            )
+                            pending[half_future] = half
+                        continue
+
+                    # tokens are only used by requests, cached texts don't count
                     total_tokens += tokens
-                except Exception as e:
-                    print(f"An error occurred for text: {futures[future]}")
-                    print(e)
-
-        # Sort results to match the order of the input texts
-        embeddings.sort(key=lambda x: texts.index(x[0]))
-        embeddings = [result[1] for result in embeddings]
+                    for text, embedding in batch_embeddings:
+                        embedding_cache.set(self.embedding_model_name, text, embedding)
+                        embeddings[text] = np.asarray(embedding, dtype=np.float32)
         self.total_token_usage += total_tokens
 
-        return np.array(embeddings)
+        if single_text:
+            return embeddings[texts]
+        return np.array([embeddings[text] for text in text_list if text in embeddings])
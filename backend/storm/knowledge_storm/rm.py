@@ -1,11 +1,18 @@
+import hashlib
+import json
 import logging
 import os
-from typing import Callable, Union, List
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Union, List, Optional
 
 import backoff
 import dspy
 import requests
 from dsp import backoff_hdlr, giveup_hdlr
+from requests.adapters import HTTPAdapter
 
 from .utils import WebPageHelper
 
@@ -641,6 +648,70 @@ class BraveRM(dspy.Retrieve):
         return collected_results
 
 
+class SearchResultCache:
+    """Interface of the caches SearXNG stores the results of each query in. Values
+    are JSON serializable lists of search results."""
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        raise NotImplementedError
+
+    def set(self, key: str, results: List[dict], ttl_seconds: int):
+        raise NotImplementedError
+
+
+class InMemorySearchResultCache(SearchResultCache):
+    """Thread-safe LRU cache with per-entry TTL, shared by the retrievers it is
+    passed to within a process."""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, results = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return results
+
+    def set(self, key: str, results: List[dict], ttl_seconds: int):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class RedisSearchResultCache(SearchResultCache):
+    """Cache in Redis, to share search results across processes and jobs.
+
+    Args:
+        redis_client: A redis-py compatible client.
+        key_prefix (str): Prefix of the cache keys.
+    """
+
+    def __init__(self, redis_client, key_prefix: str = "searxng_results"):
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        value = self.redis_client.get(f"{self.key_prefix}:{key}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, results: List[dict], ttl_seconds: int):
+        self.redis_client.set(
+            f"{self.key_prefix}:{key}", json.dumps(results), ex=ttl_seconds
+        )
+
+
 class SearXNG(dspy.Retrieve):
     def __init__(
         self,
@@ -648,6 +719,10 @@ class SearXNG(dspy.Retrieve):
         searxng_api_key=None,
         k=3,
         is_valid_source: Callable = None,
+        timeout: float = 10,
+        max_threads: int = 8,
+        cache: Optional[SearchResultCache] = None,
+        cache_ttl_seconds: int = 60 * 60,
     ):
         """Initialize the SearXNG search retriever.
         Please set up SearXNG according to https://docs.searxng.org/index.html.
@@ -658,13 +733,34 @@ class SearXNG(dspy.Retrieve):
             k (int, optional): The number of top passages to retrieve. Defaults to 3.
             is_valid_source (Callable, optional): A function that takes a URL and returns a boolean indicating if the
             source is valid. Defaults to None.
+            timeout (float, optional): Timeout in seconds of each search request. Defaults to 10.
+            max_threads (int, optional): The max number of queries searched concurrently, which is
+            also the size of the connection pool. Defaults to 8.
+            cache (SearchResultCache, optional): Cache of the results of each query, e.g. a
+            RedisSearchResultCache to share results across processes. Defaults to None (no caching).
+            cache_ttl_seconds (int, optional): How long cached results are used. Defaults to 1 hour.
         """
         super().__init__(k=k)
         if not searxng_api_url:
             raise RuntimeError("You must supply searxng_api_url")
         self.searxng_api_url = searxng_api_url
         self.searxng_api_key = searxng_api_key
+        self.timeout = timeout
+        self.max_threads = max(1, max_threads)
+        self.cache = cache
+        self.cache_ttl_seconds = cache_ttl_seconds
         self.usage = 0
+        self.cache_hits = 0
+        self.latencies: List[float] = []
+        # forward is called from several threads, e.g. one per persona conversation
+        self._usage_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_threads)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if searxng_api_key:
+            self.session.headers["Authorization"] = f"Bearer {searxng_api_key}"
 
         if is_valid_source:
             self.is_valid_source = is_valid_source
@@ -672,15 +768,90 @@ class SearXNG(dspy.Retrieve):
             self.is_valid_source = lambda x: True
 
     def get_usage_and_reset(self):
-        usage = self.usage
-        self.usage = 0
-        return {"SearXNG": usage}
+        """Returns the number of queries sent to SearXNG, as well as the number of
+        queries answered from the cache and the latency of the requests in ms."""
+        with self._usage_lock:
+            usage = self.usage
+            cache_hits = self.cache_hits
+            latencies = sorted(self.latencies)
+            self.usage = 0
+            self.cache_hits = 0
+            self.latencies = []
+
+        latency_stats = {"cache_hits": cache_hits}
+        if latencies:
+            p95_index = min(len(latencies) - 1, int(0.95 * len(latencies)))
+            latency_stats.update(
+                {
+                    "mean_ms": round(1000 * sum(latencies) / len(latencies), 1),
+                    "p50_ms": round(1000 * latencies[len(latencies) // 2], 1),
+                    "p95_ms": round(1000 * latencies[p95_index], 1),
+                    "max_ms": round(1000 * latencies[-1], 1),
+                }
+            )
+        return {"SearXNG": usage, "SearXNG_latency": latency_stats}
+
+    def _get_cache_key(self, query: str) -> str:
+        return hashlib.sha256(
+            f"{self.searxng_api_url.rstrip('/')}|{query}".encode("utf-8")
+        ).hexdigest()
+
+    def _search(self, query: str) -> List[dict]:
+        """Returns the SearXNG results of the query, from the cache if possible"""
+        cache_key = self._get_cache_key(query)
+        if self.cache is not None:
+            try:
+                results = self.cache.get(cache_key)
+            except Exception as e:
+                logging.warning(f"Failed to read cached results of query {query}: {e}")
+                results = None
+            if results is not None:
+                with self._usage_lock:
+                    self.cache_hits += 1
+                return results
+
+        start = time.monotonic()
+        try:
+            response = self.session.get(
+                self.searxng_api_url.rstrip("/") + "/search",
+                params={"q": query, "format": "json"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            results = [
+                {
+                    "content": r.get("content", ""),
+                    "title": r.get("title", ""),
+                    "url": r["url"],
+                }
+                for r in response.json()["results"]
+            ]
+        finally:
+            with self._usage_lock:
+                self.usage += 1
+                self.latencies.append(time.monotonic() - start)
+
+        if self.cache is not None:
+            try:
+                self.cache.set(cache_key, results, self.cache_ttl_seconds)
+            except Exception as e:
+                logging.warning(f"Failed to cache results of query {query}: {e}")
+        return results
+
+    def _search_or_log(self, query: str) -> List[dict]:
+        try:
+            return self._search(query)
+        except Exception as e:
+            logging.error(f"Error occurs when searching query {query}: {e}")
+            return []
 
     def forward(
         self, query_or_queries: Union[str, List[str]], exclude_urls: List[str] = []
     ):
         """Search with SearxNG for self.k top passages for query or queries
 
+        The queries are searched concurrently.
+
         Args:
             query_or_queries (Union[str, List[str]]): The query or queries to search for.
             exclude_urls (List[str]): A list of urls to exclude from the search results.
@@ -693,32 +864,27 @@ class SearXNG(dspy.Retrieve):
             if isinstance(query_or_queries, str)
             else query_or_queries
         )
-        self.usage += len(queries)
-        collected_results = []
-        headers = (
-            {"Authorization": f"Bearer {self.searxng_api_key}"}
-            if self.searxng_api_key
-            else {}
-        )
-
-        for query in queries:
-            try:
-                params = {"q": query, "format": "json"}
-                response = requests.get(self.searxng_api_url.rstrip("/") + "/search", headers=headers, params=params)
-                results = response.json()
+        if len(queries) <= 1:
+            query_results = [self._search_or_log(query) for query in queries]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(len(queries), self.max_threads)
+            ) as executor:
+                # map keeps the results in the order of the queries
+                query_results = list(executor.map(self._search_or_log, queries))
 
-                for r in results["results"]:
-                    if self.is_valid_source(r["url"]) and r["url"] not in exclude_urls:
-                        collected_results.append(
-                            {
-                                "description": r.get("content", ""),
-                                "snippets": [r.get("content", "")],
-                                "title": r.get("title", ""),
-                                "url": r["url"],
-                            }
-                        )
-            except Exception as e:
-                logging.error(f"Error occurs when searching query {query}: {e}")
+        collected_results = []
+        for results in query_results:
+            for r in results:
+                if self.is_valid_source(r["url"]) and r["url"] not in exclude_urls:
+                    collected_results.append(
+                        {
+                            "description": r["content"],
+                            "snippets": [r["content"]],
+                            "title": r["title"],
+                            "url": r["url"],
+                        }
+                    )
 
         return collected_results
 
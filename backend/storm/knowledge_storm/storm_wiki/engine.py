@@ -271,6 +271,10 @@ class STORMWikiRunner(Engine):
         draft_article.dump_reference_to_file(
             os.path.join(self.article_output_dir, "url_to_info.json")
         )
+        if callback_handler is not None:
+            callback_handler.on_article_generation_end(
+                article=draft_article.to_string()
+            )
         return draft_article
 
     def run_article_polishing_module(
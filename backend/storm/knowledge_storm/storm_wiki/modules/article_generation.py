@@ -2,7 +2,7 @@ import concurrent.futures
 import copy
 import logging
 from concurrent.futures import as_completed
-from typing import List, Union
+from typing import List, Optional, Union
 
 import dspy
 
@@ -31,13 +31,24 @@ class StormArticleGenerationModule(ArticleGenerationModule):
         self.section_gen = ConvToSection(engine=self.article_gen_lm)
 
     def generate_section(
-        self, topic, section_name, information_table, section_outline, section_query
+        self,
+        topic,
+        section_name,
+        information_table,
+        section_outline,
+        section_query,
+        collected_info: Optional[List[Information]] = None,
     ):
-        collected_info: List[Information] = []
-        if information_table is not None:
-            collected_info = information_table.retrieve_information(
-                queries=section_query, search_top_k=self.retrieve_top_k
-            )
+        """
+        Writes a section. The collected_info for the section can be passed in when it
+        was already retrieved, otherwise it is retrieved for the section_query.
+        """
+        if collected_info is None:
+            collected_info = []
+            if information_table is not None:
+                collected_info = information_table.retrieve_information(
+                    queries=section_query, search_top_k=self.retrieve_top_k
+                )
         output = self.section_gen(
             topic=topic,
             outline=section_outline,
@@ -88,26 +99,42 @@ class StormArticleGenerationModule(ArticleGenerationModule):
             )
             section_output_dict_collection = [section_output_dict]
         else:
+            sections = []
+            for section_title in sections_to_write:
+                # We don't want to write a separate introduction section.
+                if section_title.lower().strip() == "introduction":
+                    continue
+                    # We don't want to write a separate conclusion section.
+                if section_title.lower().strip().startswith(
+                    "conclusion"
+                ) or section_title.lower().strip().startswith("summary"):
+                    continue
+                section_query = article_with_outline.get_outline_as_list(
+                    root_section_name=section_title, add_hashtags=False
+                )
+                queries_with_hashtags = article_with_outline.get_outline_as_list(
+                    root_section_name=section_title, add_hashtags=True
+                )
+                section_outline = "\n".join(queries_with_hashtags)
+                sections.append((section_title, section_outline, section_query))
+
+            # retrieve for all sections at once, in one batch of query embeddings
+            sections_collected_info = (
+                information_table.retrieve_information_for_query_groups(
+                    [section_query for _, _, section_query in sections],
+                    search_top_k=self.retrieve_top_k,
+                )
+            )
+
             with concurrent.futures.ThreadPoolExecutor(
                 max_workers=self.max_thread_num
             ) as executor:
                 future_to_sec_title = {}
-                for section_title in sections_to_write:
-                    # We don't want to write a separate introduction section.
-                    if section_title.lower().strip() == "introduction":
-                        continue
-                        # We don't want to write a separate conclusion section.
-                    if section_title.lower().strip().startswith(
-                        "conclusion"
-                    ) or section_title.lower().strip().startswith("summary"):
-                        continue
-                    section_query = article_with_outline.get_outline_as_list(
-                        root_section_name=section_title, add_hashtags=False
-                    )
-                    queries_with_hashtags = article_with_outline.get_outline_as_list(
-                        root_section_name=section_title, add_hashtags=True
-                    )
-                    section_outline = "\n".join(queries_with_hashtags)
+                for (
+                    section_title,
+                    section_outline,
+                    section_query,
+                ), collected_info in zip(sections, sections_collected_info):
                     future_to_sec_title[
                         executor.submit(
                             self.generate_section,
@@ -116,6 +143,7 @@ class StormArticleGenerationModule(ArticleGenerationModule):
                             information_table,
                             section_outline,
                             section_query,
+                            collected_info,
                         )
                     ] = section_title
 
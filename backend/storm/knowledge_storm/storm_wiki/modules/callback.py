@@ -32,3 +32,7 @@ class BaseCallbackHandler:
     def on_outline_refinement_end(self, outline: str, **kwargs):
         """Run when the outline refinement finishes."""
         pass
+
+    def on_article_generation_end(self, article: str, **kwargs):
+        """Run when the draft article generation finishes."""
+        pass
@@ -1,15 +1,38 @@
 import copy
 import re
+import threading
 from collections import OrderedDict
 from typing import Union, Optional, Any, List, Tuple, Dict
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 
 from ...interface import Information, InformationTable, Article, ArticleSectionNode
 from ...utils import ArticleTextProcessing, FileIOHelper
 
+RETRIEVAL_ENCODER_MODEL = "paraphrase-MiniLM-L6-v2"
+
+_retrieval_encoder: Optional[SentenceTransformer] = None
+_retrieval_encoder_lock = threading.Lock()
+
+
+def get_retrieval_encoder() -> SentenceTransformer:
+    """Returns the sentence transformer used to retrieve collected snippets. It is
+    loaded on first use and shared by all information tables of the process."""
+    global _retrieval_encoder
+    if _retrieval_encoder is None:
+        with _retrieval_encoder_lock:
+            if _retrieval_encoder is None:
+                _retrieval_encoder = SentenceTransformer(RETRIEVAL_ENCODER_MODEL)
+    return _retrieval_encoder
+
+
+def _encode_normalized(encoder: SentenceTransformer, texts: List[str]) -> np.ndarray:
+    # with unit length embeddings the dot product is the cosine similarity
+    return encoder.encode(
+        texts, normalize_embeddings=True, convert_to_numpy=True
+    ).astype(np.float32)
+
 
 class DialogueTurn:
     def __init__(
@@ -107,35 +130,42 @@ class StormInformationTable(InformationTable):
         return cls(conversations)
 
     def prepare_table_for_retrieval(self):
-        self.encoder = SentenceTransformer("paraphrase-MiniLM-L6-v2")
+        self.encoder = get_retrieval_encoder()
         self.collected_urls = []
         self.collected_snippets = []
         for url, information in self.url_to_info.items():
             for snippet in information.snippets:
                 self.collected_urls.append(url)
                 self.collected_snippets.append(snippet)
-        self.encoded_snippets = self.encoder.encode(self.collected_snippets)
-
-    def retrieve_information(
-        self, queries: Union[List[str], str], search_top_k
-    ) -> List[Information]:
-        selected_urls = []
-        selected_snippets = []
-        if type(queries) is str:
-            queries = [queries]
-        for query in queries:
-            encoded_query = self.encoder.encode(query)
-            sim = cosine_similarity([encoded_query], self.encoded_snippets)[0]
-            sorted_indices = np.argsort(sim)
-            for i in sorted_indices[-search_top_k:][::-1]:
-                selected_urls.append(self.collected_urls[i])
-                selected_snippets.append(self.collected_snippets[i])
+        self.encoded_snippets = _encode_normalized(
+            self.encoder, self.collected_snippets
+        )
 
+    def _get_top_k_indices(
+        self, queries: List[str], search_top_k: int
+    ) -> List[List[int]]:
+        """Returns the indices of the search_top_k most similar snippets for every
+        query, most similar first. All queries are encoded in one batch and scored
+        with one matrix multiplication."""
+        if not queries or not self.collected_snippets or search_top_k <= 0:
+            return [[] for _ in queries]
+
+        encoded_queries = _encode_normalized(self.encoder, queries)
+        sim = encoded_queries @ self.encoded_snippets.T
+        top_k = min(search_top_k, sim.shape[1])
+        # argpartition finds the top k in linear time, only those k are sorted
+        top_k_indices = np.argpartition(-sim, top_k - 1, axis=1)[:, :top_k]
+        top_k_sim = np.take_along_axis(sim, top_k_indices, axis=1)
+        order = np.argsort(-top_k_sim, axis=1, kind="stable")
+        return np.take_along_axis(top_k_indices, order, axis=1).tolist()
+
+    def _collect_information(self, snippet_indices: List[int]) -> List[Information]:
         url_to_snippets = {}
-        for url, snippet in zip(selected_urls, selected_snippets):
+        for i in snippet_indices:
+            url = self.collected_urls[i]
             if url not in url_to_snippets:
                 url_to_snippets[url] = set()
-            url_to_snippets[url].add(snippet)
+            url_to_snippets[url].add(self.collected_snippets[i])
 
         selected_url_to_info = {}
         for url in url_to_snippets:
@@ -144,6 +174,40 @@ class StormInformationTable(InformationTable):
 
         return list(selected_url_to_info.values())
 
+    def retrieve_information(
+        self, queries: Union[List[str], str], search_top_k
+    ) -> List[Information]:
+        return self.retrieve_information_for_query_groups([queries], search_top_k)[0]
+
+    def retrieve_information_for_query_groups(
+        self, query_groups: List[Union[List[str], str]], search_top_k
+    ) -> List[List[Information]]:
+        """
+        Retrieves the information for several groups of queries, e.g. the queries of
+        every section of an article, with a single batch of query embeddings.
+
+        Returns:
+            List[List[Information]]: The information for each group, as returned by
+                `retrieve_information` for the group's queries.
+        """
+        query_groups = [
+            [queries] if type(queries) is str else queries for queries in query_groups
+        ]
+        all_queries = [query for queries in query_groups for query in queries]
+        all_indices = self._get_top_k_indices(all_queries, search_top_k)
+
+        group_information = []
+        start = 0
+        for queries in query_groups:
+            group_indices = all_indices[start : start + len(queries)]
+            start += len(queries)
+            group_information.append(
+                self._collect_information(
+                    [i for indices in group_indices for i in indices]
+                )
+            )
+        return group_information
+
 
 class StormArticle(Article):
     def __init__(self, topic_name):
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from model_server.batching import MicroBatcher
+
+
+class _FakeModel:
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def __call__(self, texts: list[str]) -> list[str]:
+        self.calls.append(texts)
+        return [text.upper() for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_coalesced() -> None:
+    batcher: MicroBatcher[str, list[str]] = MicroBatcher(
+        name="test", max_batch_size=100, max_wait_seconds=0.05
+    )
+    model = _FakeModel()
+
+    results = await asyncio.gather(
+        batcher.submit("model", ["a"], model),
+        batcher.submit("model", ["b", "c"], model),
+        batcher.submit("other-model", ["d"], model),
+    )
+
+    assert results == [["A"], ["B", "C"], ["D"]]
+    assert sorted(model.calls) == [["a", "b", "c"], ["d"]]
+
+
+@pytest.mark.asyncio
+async def test_full_batches_run_without_waiting() -> None:
+    batcher: MicroBatcher[str, list[str]] = MicroBatcher(
+        name="test", max_batch_size=2, max_wait_seconds=60
+    )
+    model = _FakeModel()
+
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            batcher.submit("model", ["a"], model),
+            batcher.submit("model", ["b"], model),
+        ),
+        timeout=5,
+    )
+
+    assert results == [["A"], ["B"]]
+    assert model.calls == [["a", "b"]]
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_are_raised_for_every_request() -> None:
+    batcher: MicroBatcher[str, list[str]] = MicroBatcher(
+        name="test", max_batch_size=100, max_wait_seconds=0.01
+    )
+
+    def failing_model(texts: list[str]) -> list[str]:
+        raise ValueError("model failed")
+
+    results = await asyncio.gather(
+        batcher.submit("model", ["a"], failing_model),
+        batcher.submit("model", ["b"], failing_model),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
@@ -1,4 +1,5 @@
 import asyncio
+import json
 import time
 from collections.abc import AsyncGenerator
 from typing import Any
@@ -7,6 +8,7 @@ from unittest.mock import AsyncMock
 from unittest.mock import MagicMock
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 from httpx import AsyncClient
 from litellm.exceptions import RateLimitError
@@ -15,9 +17,15 @@ from model_server.encoders import CloudEmbedding
 from model_server.encoders import embed_text
 from model_server.encoders import local_rerank
 from model_server.encoders import process_embed_request
+from model_server.encoders import route_bi_encoder_embed
 from shared_configs.enums import EmbeddingProvider
 from shared_configs.enums import EmbedTextType
+from shared_configs.model_server_models import decode_binary_embeddings
+from shared_configs.model_server_models import EMBEDDING_DIM_HEADER
+from shared_configs.model_server_models import EMBEDDING_FLOAT16_MEDIA_TYPE
+from shared_configs.model_server_models import EMBEDDING_FLOAT32_MEDIA_TYPE
 from shared_configs.model_server_models import EmbedRequest
+from shared_configs.model_server_models import get_embedding_accept_header
 
 
 @pytest.fixture
@@ -200,3 +208,70 @@ async def test_concurrent_embeddings() -> None:
         # However, the developer may still introduce unnecessary blocking above the mock and this test will
         # still pass as long as it's less than (7 - 5) / 5 seconds
         assert end_time - start_time < 7
+
+
+def _make_local_embed_request() -> EmbedRequest:
+    return EmbedRequest(
+        texts=["test1", "test2"],
+        model_name="fake-local-model",
+        max_context_length=512,
+        normalize_embeddings=True,
+        text_type=EmbedTextType.QUERY,
+    )
+
+
+def _make_route_request(accept: str | None) -> MagicMock:
+    request = MagicMock()
+    request.headers = {"accept": accept} if accept else {}
+    request.app.state.gpu_type = "NONE"
+    return request
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "transport,media_type,dtype",
+    [
+        ("float32", EMBEDDING_FLOAT32_MEDIA_TYPE, np.float32),
+        ("float16", EMBEDDING_FLOAT16_MEDIA_TYPE, np.float16),
+    ],
+)
+async def test_bi_encoder_embed_binary_response(
+    transport: str, media_type: str, dtype: type
+) -> None:
+    vectors = np.array([[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]], dtype=np.float32)
+
+    with patch("model_server.encoders.get_embedding_model") as mock_get_model:
+        mock_model = MagicMock()
+        mock_model.encode.return_value = vectors
+        mock_get_model.return_value = mock_model
+
+        response = await route_bi_encoder_embed(
+            _make_route_request(get_embedding_accept_header(transport)),
+            _make_local_embed_request(),
+        )
+
+    assert response.media_type == media_type
+    assert response.headers[EMBEDDING_DIM_HEADER] == "3"
+
+    decoded = decode_binary_embeddings(bytes(response.body), media_type, 3)
+    np.testing.assert_array_equal(decoded, vectors.astype(dtype))
+
+
+@pytest.mark.asyncio
+async def test_bi_encoder_embed_json_fallback() -> None:
+    with patch("model_server.encoders.get_embedding_model") as mock_get_model:
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array(
+            [[0.5, 0.25], [0.125, 1.0]], dtype=np.float32
+        )
+        mock_get_model.return_value = mock_model
+
+        response = await route_bi_encoder_embed(
+            _make_route_request(get_embedding_accept_header("json")),
+            _make_local_embed_request(),
+        )
+
+    assert response.media_type == "application/json"
+    assert json.loads(bytes(response.body)) == {
+        "embeddings": [[0.5, 0.25], [0.125, 1.0]]
+    }
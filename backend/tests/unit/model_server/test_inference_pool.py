@@ -0,0 +1,39 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from model_server import inference_pool
+from model_server.inference_pool import run_model_inference
+
+
+@pytest.mark.asyncio
+async def test_per_model_concurrency_is_limited(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(inference_pool, "MODEL_SERVER_PER_MODEL_CONCURRENCY", 2)
+    monkeypatch.setattr(inference_pool, "_MODEL_SEMAPHORES", {})
+
+    lock = threading.Lock()
+    running: dict[str, int] = {"model-a": 0, "model-b": 0}
+    max_running: dict[str, int] = {"model-a": 0, "model-b": 0}
+
+    def fake_inference(model_name: str) -> str:
+        with lock:
+            running[model_name] += 1
+            max_running[model_name] = max(max_running[model_name], running[model_name])
+        time.sleep(0.05)
+        with lock:
+            running[model_name] -= 1
+        return model_name
+
+    results = await asyncio.gather(
+        *(
+            run_model_inference(model_name, fake_inference, model_name)
+            for model_name in ["model-a"] * 4 + ["model-b"] * 2
+        )
+    )
+
+    assert results == ["model-a"] * 4 + ["model-b"] * 2
+    assert max_running == {"model-a": 2, "model-b": 2}
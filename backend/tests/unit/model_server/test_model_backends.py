@@ -0,0 +1,14 @@
+from model_server.model_backends import get_model_backend
+from model_server.model_backends import LocalModelBackend
+
+
+def test_get_model_backend() -> None:
+    model_backends = {"onnx-model": "ONNX", "int8-model": "torch_int8", "bad": "tpu"}
+
+    assert get_model_backend("onnx-model", model_backends) == LocalModelBackend.ONNX
+    assert (
+        get_model_backend("int8-model", model_backends) == LocalModelBackend.TORCH_INT8
+    )
+    # unknown backends and unlisted models use the full precision torch model
+    assert get_model_backend("bad", model_backends) == LocalModelBackend.TORCH
+    assert get_model_backend("other-model", model_backends) == LocalModelBackend.TORCH
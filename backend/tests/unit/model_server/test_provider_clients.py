@@ -0,0 +1,54 @@
+import httpx
+import pytest
+
+from model_server.provider_clients import AdaptiveRateLimiter
+from model_server.provider_clients import get_retry_after_seconds
+
+
+def _status_error(status_code: int, headers: dict[str, str]) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://embeddings.example.com")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def test_retry_after_is_read_from_rate_limit_responses() -> None:
+    assert get_retry_after_seconds(_status_error(429, {"Retry-After": "3"})) == 3.0
+    assert (
+        get_retry_after_seconds(_status_error(429, {"retry-after-ms": "250"})) == 0.25
+    )
+    # falls back to a default wait when the header is missing
+    assert get_retry_after_seconds(_status_error(429, {})) == 1.0
+    assert get_retry_after_seconds(_status_error(500, {"Retry-After": "3"})) is None
+    assert get_retry_after_seconds(ValueError("not an http error")) is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_calls_are_retried_with_lower_concurrency() -> None:
+    rate_limiter = AdaptiveRateLimiter(max_concurrency=8, max_retries=2)
+    num_calls = 0
+
+    async def call() -> str:
+        nonlocal num_calls
+        num_calls += 1
+        if num_calls == 1:
+            raise _status_error(429, {"retry-after-ms": "10"})
+        return "embedded"
+
+    assert await rate_limiter.run(call) == "embedded"
+    assert num_calls == 2
+    assert rate_limiter.concurrency_limit == 4
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_retries_are_bounded() -> None:
+    rate_limiter = AdaptiveRateLimiter(max_concurrency=8, max_retries=1)
+    num_calls = 0
+
+    async def call() -> str:
+        nonlocal num_calls
+        num_calls += 1
+        raise _status_error(429, {"retry-after-ms": "1"})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await rate_limiter.run(call)
+    assert num_calls == 2
@@ -1,10 +1,14 @@
 import pytest
 
+from onyx.chat import prune_and_merge
+from onyx.chat.prune_and_merge import _apply_pruning
 from onyx.chat.prune_and_merge import _merge_sections
 from onyx.configs.constants import DocumentSource
 from onyx.context.search.models import InferenceChunk
 from onyx.context.search.models import InferenceSection
 from onyx.context.search.utils import inference_section_from_chunks
+from onyx.llm.interfaces import LLMConfig
+from onyx.natural_language_processing.utils import BaseTokenizer
 
 
 # This large test accounts for all of the following:
@@ -224,3 +228,64 @@ def test_merge_minimal_sections(
     merged_sections = _merge_sections(sections)
     assert merged_sections[0].combined_content == expected_content
     assert merged_sections[0].center_chunk == expected_center_chunk
+
+
+class _WordTokenizer(BaseTokenizer):
+    def __init__(self) -> None:
+        self.encoded: list[str] = []
+
+    def encode(self, string: str) -> list[int]:
+        self.encoded.append(string)
+        return list(range(len(string.split())))
+
+    def tokenize(self, string: str) -> list[str]:
+        return string.split()
+
+    def decode(self, tokens: list[int]) -> str:
+        return " ".join(["word"] * len(tokens))
+
+
+def test_apply_pruning_caches_content_token_counts(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    tokenizer = _WordTokenizer()
+    monkeypatch.setattr(prune_and_merge, "get_tokenizer", lambda **_: tokenizer)
+    llm_config = LLMConfig(
+        model_provider="test_provider",
+        model_name="test_prune_cache_model",
+        temperature=0,
+        max_input_tokens=4096,
+    )
+    content = " ".join(["word"] * 100)
+    sections = [
+        inference_section_from_chunks(
+            center_chunk=chunk,
+            chunks=[chunk],
+        )
+        for chunk in [
+            create_inference_chunk("pruning_doc", 1, content, 2.0),
+            create_inference_chunk("pruning_doc", 2, content, 1.0),
+        ]
+    ]
+
+    def prune() -> list[InferenceSection]:
+        return _apply_pruning(
+            sections=sections,
+            section_relevance_list=None,
+            token_limit=150,
+            is_manually_selected_docs=False,
+            use_sections=True,
+            using_tool_message=False,
+            llm_config=llm_config,
+        )
+
+    pruned_sections = prune()
+    assert len(pruned_sections) == 2
+    assert len(pruned_sections[1].combined_content.split()) < 100
+    # the sections passed in are not modified
+    assert all(section.combined_content == content for section in sections)
+
+    # only the metadata around the contents and the truncated section are encoded
+    tokenizer.encoded.clear()
+    assert prune() == pruned_sections
+    assert tokenizer.encoded.count(content) == 1
@@ -0,0 +1,94 @@
+import http.server
+import json
+import threading
+import time
+from collections.abc import Generator
+from typing import Any
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+import pytest
+
+# knowledge_storm is installed from backend/storm only where DeepSearch runs
+rm = pytest.importorskip("knowledge_storm.rm")
+
+_RESPONSE_DELAY_SECONDS = 0.2
+
+
+class _StubSearXNGHandler(http.server.BaseHTTPRequestHandler):
+    queries: list[str] = []
+
+    def do_GET(self) -> None:
+        query = parse_qs(urlparse(self.path).query)["q"][0]
+        self.queries.append(query)
+        time.sleep(_RESPONSE_DELAY_SECONDS)
+
+        if query == "fail":
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        body = json.dumps(
+            {
+                "results": [
+                    {
+                        "url": f"https://example.com/{query}",
+                        "title": query,
+                        "content": f"about {query}",
+                    }
+                ]
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def searxng_url() -> Generator[str, None, None]:
+    _StubSearXNGHandler.queries = []
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StubSearXNGHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        server_thread.join()
+
+
+def test_queries_are_searched_concurrently_in_order(searxng_url: str) -> None:
+    retriever = rm.SearXNG(searxng_api_url=searxng_url, max_threads=4)
+    queries = ["one", "two", "fail", "three"]
+
+    start = time.monotonic()
+    results = retriever.forward(queries, exclude_urls=["https://example.com/two"])
+    elapsed = time.monotonic() - start
+
+    assert elapsed < len(queries) * _RESPONSE_DELAY_SECONDS
+    assert [result["title"] for result in results] == ["one", "three"]
+    assert results[0]["snippets"] == ["about one"]
+
+    usage = retriever.get_usage_and_reset()
+    assert usage["SearXNG"] == 4
+    assert usage["SearXNG_latency"]["max_ms"] >= 1000 * _RESPONSE_DELAY_SECONDS
+    assert retriever.get_usage_and_reset()["SearXNG"] == 0
+
+
+def test_cached_results_are_shared_across_retrievers(searxng_url: str) -> None:
+    cache = rm.InMemorySearchResultCache()
+    first = rm.SearXNG(searxng_api_url=searxng_url, cache=cache)
+    second = rm.SearXNG(searxng_api_url=searxng_url, cache=cache)
+
+    assert first.forward("topic") == second.forward("topic")
+    assert _StubSearXNGHandler.queries == ["topic"]
+
+    usage = second.get_usage_and_reset()
+    assert usage["SearXNG"] == 0
+    assert usage["SearXNG_latency"] == {"cache_hits": 1}
@@ -0,0 +1,165 @@
+import json
+from typing import Any
+
+import httpx
+import pytest
+
+from onyx.connectors.models import Document
+from onyx.document_index.document_index_utils import get_uuid_from_chunk_info_old
+from onyx.document_index.interfaces import DocumentInsertionRecord
+from onyx.document_index.interfaces import IndexBatchParams
+from onyx.document_index.vespa import index as vespa_index_module
+from onyx.document_index.vespa.index import VespaIndex
+from onyx.indexing.models import DocMetadataAwareIndexChunk
+
+
+def _grouping_response(max_chunk_ids: dict[str, int]) -> dict:
+    return {
+        "root": {
+            "id": "toplevel",
+            "children": [
+                {
+                    "id": "group:root:0",
+                    "children": [
+                        {
+                            "id": "grouplist:document_id",
+                            "label": "document_id",
+                            "children": [
+                                {
+                                    "id": f"group:string:{document_id}",
+                                    "value": document_id,
+                                    "fields": {"max(chunk_id)": max_chunk_id},
+                                }
+                                for document_id, max_chunk_id in max_chunk_ids.items()
+                            ],
+                        }
+                    ],
+                }
+            ],
+        }
+    }
+
+
+def test_enrich_basic_chunk_info_batch_uses_one_query() -> None:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(
+            200, json=_grouping_response({"old_doc": 499, "old_short_doc": 1})
+        )
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as http_client:
+        enriched_infos = VespaIndex.enrich_basic_chunk_info_batch(
+            index_name="test_index",
+            http_client=http_client,
+            doc_id_to_previous_chunk_cnt={
+                "old_doc": None,
+                "old_short_doc": None,
+                "old_missing_doc": None,
+                "new_doc": 7,
+            },
+            doc_id_to_new_chunk_cnt={
+                "old_doc": 10,
+                "old_short_doc": 5,
+                "old_missing_doc": 3,
+                "new_doc": 4,
+                "unseen_doc": 2,
+            },
+        )
+
+    # only the legacy documents are looked up, in a single query
+    assert len(requests) == 1
+    yql = json.loads(requests[0].content)["yql"]
+    assert 'document_id contains "old_doc"' in yql
+    assert 'document_id contains "old_missing_doc"' in yql
+    assert "new_doc" not in yql
+    assert "group(document_id)" in yql
+
+    chunk_ranges = {
+        info.doc_id: (info.chunk_start_index, info.chunk_end_index, info.old_version)
+        for info in enriched_infos
+    }
+    assert chunk_ranges == {
+        "old_doc": (10, 500, True),
+        "old_short_doc": (5, 5, True),
+        "old_missing_doc": (3, 3, True),
+        "new_doc": (4, 7, False),
+        "unseen_doc": (2, 0, False),
+    }
+
+
+def test_enrich_basic_chunk_info_skips_query_for_new_documents() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise AssertionError("No Vespa query expected")
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as http_client:
+        enriched_info = VespaIndex.enrich_basic_chunk_info(
+            index_name="test_index",
+            http_client=http_client,
+            document_id="doc",
+            previous_chunk_count=3,
+            new_chunk_count=1,
+        )
+
+    assert enriched_info.chunk_start_index == 1
+    assert enriched_info.chunk_end_index == 3
+    assert not enriched_info.old_version
+
+
+def test_index_looks_up_old_chunks_by_cleaned_document_id(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=_grouping_response({"it_s_doc": 2}))
+
+    fed_phases: list[list[Any]] = []
+
+    def fake_feed(phases: list[list[Any]], index_name: str) -> list[Any]:
+        fed_phases.extend(phases)
+        return []
+
+    monkeypatch.setattr(vespa_index_module, "feed_vespa_operations", fake_feed)
+    monkeypatch.setattr(
+        vespa_index_module,
+        "build_vespa_chunk_put_operation",
+        lambda chunk, multitenant: chunk.source_document.id,
+    )
+    chunk = DocMetadataAwareIndexChunk.model_construct(
+        source_document=Document.model_construct(id="it's_doc")
+    )
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as http_client:
+        vespa_index = VespaIndex(
+            index_name="test_index",
+            secondary_index_name=None,
+            large_chunks_enabled=False,
+            secondary_large_chunks_enabled=None,
+            httpx_client=http_client,
+        )
+        insertion_records = vespa_index.index(
+            [chunk],
+            IndexBatchParams(
+                doc_id_to_previous_chunk_cnt={"it's_doc": None},
+                doc_id_to_new_chunk_cnt={"it's_doc": 1},
+                tenant_id="test_tenant",
+                large_chunks_enabled=False,
+            ),
+        )
+
+    # Vespa stores the chunks under the cleaned id
+    yql = json.loads(requests[0].content)["yql"]
+    assert 'document_id contains "it_s_doc"' in yql
+
+    removals, puts = fed_phases
+    assert [operation.doc_chunk_id for operation in removals] == [
+        str(get_uuid_from_chunk_info_old(document_id="it_s_doc", chunk_id=chunk_id))
+        for chunk_id in (1, 2)
+    ]
+    assert puts == ["it_s_doc"]
+    assert insertion_records == {
+        DocumentInsertionRecord(document_id="it's_doc", already_existed=True)
+    }
@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+
+from onyx.document_index.vespa import feed
+from onyx.document_index.vespa.feed import _send_operation
+from onyx.document_index.vespa.feed import VespaFeedOperation
+from onyx.document_index.vespa.feed import VespaFeedOperationType
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(feed, "_RETRY_INITIAL_DELAY", 0.0)
+
+
+def _client(
+    status_codes: list[int], requests: list[httpx.Request]
+) -> httpx.AsyncClient:
+    responses = iter(status_codes)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(next(responses), text="error")
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_put_is_retried_on_transient_errors() -> None:
+    requests: list[httpx.Request] = []
+    operation = VespaFeedOperation(
+        operation_type=VespaFeedOperationType.PUT,
+        doc_chunk_id="chunk-1",
+        fields={"content": "hello"},
+    )
+
+    async with _client([503, 429, 200], requests) as client:
+        result = await _send_operation(
+            client, operation, "test_index", asyncio.Semaphore(1)
+        )
+
+    assert result.success
+    assert result.status_code == 200
+    assert result.num_tries == 3
+    assert [request.method for request in requests] == ["POST"] * 3
+    assert requests[0].url.path.endswith("/test_index/docid/chunk-1")
+
+
+@pytest.mark.asyncio
+async def test_remove_is_retried_on_internal_server_error() -> None:
+    requests: list[httpx.Request] = []
+    operation = VespaFeedOperation(
+        operation_type=VespaFeedOperationType.REMOVE,
+        doc_chunk_id="chunk-1",
+    )
+
+    async with _client([500, 200], requests) as client:
+        result = await _send_operation(
+            client, operation, "test_index", asyncio.Semaphore(1)
+        )
+
+    assert result.success
+    assert result.num_tries == 2
+    assert [request.method for request in requests] == ["DELETE"] * 2
+    # as persistent as the per chunk deletion it replaces
+    assert operation.max_tries >= 10
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried() -> None:
+    requests: list[httpx.Request] = []
+    operation = VespaFeedOperation(
+        operation_type=VespaFeedOperationType.REMOVE,
+        doc_chunk_id="chunk-1",
+    )
+
+    async with _client([400], requests) as client:
+        result = await _send_operation(
+            client, operation, "test_index", asyncio.Semaphore(1)
+        )
+
+    assert not result.success
+    assert result.status_code == 400
+    assert result.num_tries == 1
+    assert [request.method for request in requests] == ["DELETE"]
+
+
+@pytest.mark.asyncio
+async def test_retries_are_bounded() -> None:
+    requests: list[httpx.Request] = []
+    operation = VespaFeedOperation(
+        operation_type=VespaFeedOperationType.PUT,
+        doc_chunk_id="chunk-1",
+        fields={},
+    )
+
+    async with _client([503] * 10, requests) as client:
+        result = await _send_operation(
+            client, operation, "test_index", asyncio.Semaphore(1)
+        )
+
+    assert not result.success
+    assert result.num_tries == operation.max_tries
+    assert len(requests) == operation.max_tries
@@ -206,3 +206,29 @@ class TestPostQueryChunkCensoring:
         assert result[2] == self.mock_chunk_3
         assert self.mock_chunk_4 not in result
         mock_censor_func_impl.assert_called_once()
+
+    @patch(
+        "ee.onyx.external_permissions.post_query_censoring.get_session_context_manager"
+    )
+    @patch(
+        "ee.onyx.external_permissions.post_query_censoring.get_all_auto_sync_cc_pairs"
+    )
+    def test_censoring_enabled_sources_are_cached(
+        self, mock_get_cc_pairs: MagicMock, _: MagicMock
+    ) -> None:
+        from ee.onyx.external_permissions.post_query_censoring import (
+            _CENSORING_ENABLED_SOURCES_CACHE,
+        )
+        from ee.onyx.external_permissions.post_query_censoring import (
+            _get_all_censoring_enabled_sources,
+        )
+
+        _CENSORING_ENABLED_SOURCES_CACHE.clear()
+        cc_pair = MagicMock()
+        cc_pair.connector.source = DocumentSource.SALESFORCE
+        mock_get_cc_pairs.return_value = [cc_pair]
+
+        assert _get_all_censoring_enabled_sources() == {DocumentSource.SALESFORCE}
+        assert _get_all_censoring_enabled_sources() == {DocumentSource.SALESFORCE}
+        mock_get_cc_pairs.assert_called_once()
+        _CENSORING_ENABLED_SOURCES_CACHE.clear()
@@ -0,0 +1,77 @@
+from collections.abc import Iterator
+
+import pytest
+
+from onyx.db.models import SearchSettings
+from onyx.natural_language_processing.query_embedding_cache import (
+    get_cached_query_embeddings,
+)
+from onyx.natural_language_processing.query_embedding_cache import (
+    invalidate_query_embedding_cache,
+)
+from shared_configs.model_server_models import Embedding
+
+
+@pytest.fixture(autouse=True)
+def clear_cache() -> Iterator[None]:
+    invalidate_query_embedding_cache()
+    yield
+    invalidate_query_embedding_cache()
+
+
+def _search_settings(id: int = 1, query_prefix: str | None = None) -> SearchSettings:
+    return SearchSettings(
+        id=id,
+        model_name="test-model",
+        normalize=True,
+        query_prefix=query_prefix,
+        provider_type=None,
+        reduced_dimension=None,
+    )
+
+
+class _FakeEmbedder:
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def __call__(self, queries: list[str]) -> list[Embedding]:
+        self.calls.append(queries)
+        return [[float(len(query)), 1.0] for query in queries]
+
+
+def test_only_uncached_queries_are_embedded() -> None:
+    embedder = _FakeEmbedder()
+    settings = _search_settings()
+
+    first = get_cached_query_embeddings(["hello", "world!"], settings, embedder)
+    # whitespace differences normalize to the cached "hello"
+    second = get_cached_query_embeddings(
+        ["new query", "  hello ", "world!"], settings, embedder
+    )
+
+    assert embedder.calls == [["hello", "world!"], ["new query"]]
+    assert first == [[5.0, 1.0], [6.0, 1.0]]
+    assert second == [[9.0, 1.0], [5.0, 1.0], [6.0, 1.0]]
+
+
+def test_duplicate_queries_are_embedded_once() -> None:
+    embedder = _FakeEmbedder()
+
+    result = get_cached_query_embeddings(
+        ["same", "same ", "other"], _search_settings(), embedder
+    )
+
+    assert embedder.calls == [["same", "other"]]
+    assert result == [[4.0, 1.0], [4.0, 1.0], [5.0, 1.0]]
+
+
+def test_changed_search_settings_miss_the_cache() -> None:
+    embedder = _FakeEmbedder()
+
+    get_cached_query_embeddings(["hello"], _search_settings(id=1), embedder)
+    get_cached_query_embeddings(["hello"], _search_settings(id=2), embedder)
+    get_cached_query_embeddings(
+        ["hello"], _search_settings(id=2, query_prefix="query: "), embedder
+    )
+
+    assert embedder.calls == [["hello"], ["hello"], ["hello"]]
@@ -0,0 +1,67 @@
+from typing import Any
+from unittest.mock import MagicMock
+
+from onyx.onyxbot.slack.metadata_cache import get_workspace_metadata
+from onyx.onyxbot.slack.metadata_cache import handle_workspace_metadata_event
+from onyx.onyxbot.slack.metadata_cache import prefetch_workspace_users
+
+
+def _user(user_id: str, email: str, deleted: bool = False) -> dict[str, Any]:
+    return {"id": user_id, "deleted": deleted, "profile": {"email": email}}
+
+
+def _mock_client(token: str) -> MagicMock:
+    client = MagicMock()
+    client.token = token
+    return client
+
+
+def test_prefetch_pages_through_users_once() -> None:
+    client = _mock_client("xoxb-prefetch")
+    client.users_list.side_effect = [
+        MagicMock(
+            data={
+                "members": [_user("U1", "One@example.com")],
+                "response_metadata": {"next_cursor": "page2"},
+            }
+        ),
+        MagicMock(
+            data={
+                "members": [_user("U2", "two@example.com", deleted=True)],
+                "response_metadata": {"next_cursor": ""},
+            }
+        ),
+    ]
+
+    prefetch_workspace_users(client)
+    prefetch_workspace_users(client)
+
+    assert client.users_list.call_count == 2
+    metadata = get_workspace_metadata(client)
+    assert metadata.user_ids_by_email.get("one@example.com") == "U1"
+    assert metadata.user_ids_by_email.get("two@example.com") is None
+    assert metadata.users.get("U2") is not None
+
+
+def test_metadata_events_update_the_cache() -> None:
+    client = _mock_client("xoxb-events")
+    metadata = get_workspace_metadata(client)
+    metadata.channels.set("C1", {"id": "C1", "name": "old-name"})
+    metadata.usergroup_members.set("S1", ["U1"])
+
+    assert handle_workspace_metadata_event(
+        client, {"type": "channel_rename", "channel": {"id": "C1", "name": "new"}}
+    )
+    assert metadata.channels.get("C1") is None
+
+    assert handle_workspace_metadata_event(
+        client, {"type": "user_change", "user": _user("U3", "three@example.com")}
+    )
+    assert metadata.user_ids_by_email.get("three@example.com") == "U3"
+
+    assert handle_workspace_metadata_event(
+        client, {"type": "subteam_members_changed", "subteam_id": "S1"}
+    )
+    assert metadata.usergroup_members.get("S1") is None
+
+    assert not handle_workspace_metadata_event(client, {"type": "message"})
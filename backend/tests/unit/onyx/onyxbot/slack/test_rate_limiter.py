@@ -0,0 +1,144 @@
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import MagicMock
+
+import fakeredis
+import pytest
+
+from onyx.onyxbot.slack import utils
+from onyx.onyxbot.slack.utils import check_message_limit
+from onyx.onyxbot.slack.utils import SlackRateLimiter
+from onyx.redis.redis_pool import TenantRedis
+from shared_configs.contextvars import get_current_tenant_id
+
+
+class _FakeTenantRedis(TenantRedis, fakeredis.FakeRedis):
+    """Prefixes keys like the real client, so keys that scripts use without the
+    prefixing are checked to match the ones the client uses"""
+
+
+@pytest.fixture
+def redis_server(monkeypatch: pytest.MonkeyPatch) -> Iterator[fakeredis.FakeServer]:
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        utils,
+        "get_redis_client",
+        lambda tenant_id=None: _FakeTenantRedis(
+            tenant_id or get_current_tenant_id(), server=server
+        ),
+    )
+    yield server
+
+
+def _limiter(max_qpm: int, max_wait_time: int) -> SlackRateLimiter:
+    limiter = SlackRateLimiter()
+    limiter.max_qpm = max_qpm
+    limiter.max_wait_time = max_wait_time
+    limiter.notify = MagicMock()  # type: ignore[method-assign]
+    return limiter
+
+
+def _empty_bucket(server: fakeredis.FakeServer) -> None:
+    key_prefix = SlackRateLimiter._key_prefix(get_current_tenant_id())
+    fakeredis.FakeRedis(server=server).hset(
+        f"{key_prefix}:bucket", mapping={"tokens": 0, "updated_at": time.time()}
+    )
+
+
+def test_queued_questions_are_ordered_fairly_between_channels(
+    redis_server: fakeredis.FakeServer,
+) -> None:
+    # one token every 200ms
+    limiter = _limiter(max_qpm=300, max_wait_time=10)
+    _empty_bucket(redis_server)
+
+    answered: list[str] = []
+    lock = threading.Lock()
+
+    def ask(question: str, channel: str) -> None:
+        limiter.acquire(MagicMock(), channel, None)
+        with lock:
+            answered.append(question)
+
+    threads = []
+    for question, channel in [("a1", "A"), ("a2", "A"), ("b1", "B")]:
+        thread = threading.Thread(target=ask, args=(question, channel))
+        thread.start()
+        threads.append(thread)
+        # queue the questions in order
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    # the second question of channel A is scheduled after the first one of B
+    assert answered == ["a1", "b1", "a2"]
+    assert limiter.notify.call_count == 3  # type: ignore[attr-defined]
+    assert SlackRateLimiter.get_queue_depth(get_current_tenant_id()) == 0
+
+
+def test_timed_out_question_is_removed_from_queue(
+    redis_server: fakeredis.FakeServer,
+) -> None:
+    # no new token within the wait time
+    limiter = _limiter(max_qpm=1, max_wait_time=1)
+    _empty_bucket(redis_server)
+
+    with pytest.raises(TimeoutError):
+        limiter.acquire(MagicMock(), "A", None)
+
+    assert SlackRateLimiter.get_queue_depth(get_current_tenant_id()) == 0
+
+
+def test_head_of_dead_waiter_does_not_block_queue(
+    redis_server: fakeredis.FakeServer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(utils, "_QUEUE_RECHECK_SECONDS", 0.1)
+    monkeypatch.setattr(utils, "_QUEUE_LEASE_SECONDS", 0.3)
+    # one token every 100ms
+    limiter = _limiter(max_qpm=600, max_wait_time=10)
+    _empty_bucket(redis_server)
+
+    # queue a ticket whose waiter never comes back for it
+    key_prefix = SlackRateLimiter._key_prefix(get_current_tenant_id())
+    acquire_script: Any = fakeredis.FakeRedis(server=redis_server).register_script(
+        utils._ACQUIRE_SCRIPT
+    )
+    acquired, _, _ = acquire_script(
+        keys=[
+            f"{key_prefix}:bucket",
+            f"{key_prefix}:queue",
+            f"{key_prefix}:deadlines",
+            f"{key_prefix}:channels",
+        ],
+        args=["dead", "A", f"{key_prefix}:notify:", 600, 10, 0.3],
+    )
+    assert not acquired
+
+    start = time.monotonic()
+    limiter.acquire(MagicMock(), "B", None)
+
+    assert time.monotonic() - start < 2
+    assert SlackRateLimiter.get_queue_depth(get_current_tenant_id()) == 0
+
+
+def test_message_count_always_expires(
+    redis_server: fakeredis.FakeServer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(utils, "DANSWER_BOT_RESPONSE_LIMIT_PER_TIME_PERIOD", 2)
+    monkeypatch.setattr(utils, "DANSWER_BOT_RESPONSE_LIMIT_TIME_PERIOD_SECONDS", 100)
+    raw_client = fakeredis.FakeRedis(server=redis_server)
+    count_key = f"{get_current_tenant_id()}:slack_bot_message_count"
+
+    assert [check_message_limit() for _ in range(3)] == [True, True, False]
+    assert 0 < raw_client.ttl(count_key) <= 100
+
+    # a count left without an expiry gets one on the next message
+    raw_client.persist(count_key)
+    assert not check_message_limit()
+    assert 0 < raw_client.ttl(count_key) <= 100
+
+    # a new period starts once the count expires
+    raw_client.delete(count_key)
+    assert check_message_limit()
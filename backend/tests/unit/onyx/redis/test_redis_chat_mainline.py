@@ -0,0 +1,61 @@
+from typing import Any
+from uuid import uuid4
+
+import pytest
+
+from onyx.redis import redis_chat_mainline
+from onyx.redis.redis_chat_mainline import get_cached_chat_mainline
+from onyx.redis.redis_chat_mainline import set_cached_chat_mainline
+from onyx.redis.redis_chat_mainline import update_cached_chat_mainline
+
+
+class _FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, Any] = {}
+
+    def get(self, key: str) -> Any:
+        return self.values.get(key)
+
+    def set(self, key: str, value: Any, ex: int | None = None) -> None:
+        self.values[key] = value
+
+    def delete(self, key: str) -> None:
+        self.values.pop(key, None)
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch: pytest.MonkeyPatch) -> _FakeRedis:
+    redis_client = _FakeRedis()
+    monkeypatch.setattr(redis_chat_mainline, "CHAT_MAINLINE_CACHE_ENABLED", True)
+    monkeypatch.setattr(redis_chat_mainline, "get_redis_client", lambda: redis_client)
+    return redis_client
+
+
+def test_new_latest_child_cuts_the_mainline_after_its_parent() -> None:
+    chat_session_id = uuid4()
+    set_cached_chat_mainline(chat_session_id, [1, 2, 3, 4])
+
+    # a new message at the tail is appended
+    update_cached_chat_mainline(chat_session_id, 4, 5)
+    assert get_cached_chat_mainline(chat_session_id) == [1, 2, 3, 4, 5]
+
+    # an edit of message 3 starts a new branch from its parent
+    update_cached_chat_mainline(chat_session_id, 2, 6)
+    assert get_cached_chat_mainline(chat_session_id) == [1, 2, 6]
+
+
+def test_unknown_parent_drops_the_cached_mainline() -> None:
+    chat_session_id = uuid4()
+    set_cached_chat_mainline(chat_session_id, [1, 2])
+
+    update_cached_chat_mainline(chat_session_id, 7, 8)
+
+    assert get_cached_chat_mainline(chat_session_id) is None
+
+
+def test_uncached_sessions_are_not_populated() -> None:
+    chat_session_id = uuid4()
+
+    update_cached_chat_mainline(chat_session_id, 1, 2)
+
+    assert get_cached_chat_mainline(chat_session_id) is None
@@ -0,0 +1,118 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+import fakeredis
+import pytest
+
+from onyx.redis import redis_token_usage
+from onyx.redis.redis_pool import TenantRedis
+from onyx.redis.redis_token_usage import get_global_token_usage_key
+from onyx.redis.redis_token_usage import get_token_usage
+from onyx.redis.redis_token_usage import increment_token_usage
+from onyx.redis.redis_token_usage import set_token_usage
+from onyx.redis.redis_token_usage import TokenUsage
+from shared_configs.contextvars import get_current_tenant_id
+
+
+class _FakeTenantRedis(TenantRedis, fakeredis.FakeRedis):
+    """Prefixes keys like the real client, so keys that scripts use without the
+    prefixing are checked to match the ones the client uses"""
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch: pytest.MonkeyPatch) -> fakeredis.FakeRedis:
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis_token_usage,
+        "get_redis_client",
+        lambda: _FakeTenantRedis(get_current_tenant_id(), server=server),
+    )
+    return fakeredis.FakeRedis(server=server)
+
+
+def _minute(minutes_ago: int) -> datetime:
+    now = datetime.now(tz=timezone.utc).replace(second=0, microsecond=0)
+    return now - timedelta(minutes=minutes_ago)
+
+
+def _total(usage: TokenUsage) -> int:
+    return sum(token_count for _, token_count in usage)
+
+
+def test_counter_is_seeded_once_then_incremented() -> None:
+    fetch_calls: list[datetime] = []
+
+    def fetch_usage(cutoff_time: datetime) -> TokenUsage:
+        fetch_calls.append(cutoff_time)
+        return [(_minute(30), 100), (_minute(90), 50)]
+
+    key = get_global_token_usage_key()
+    cutoff_time = datetime.now(tz=timezone.utc) - timedelta(hours=1)
+
+    # the counter is seeded with the whole retention window, the hour is filtered
+    assert _total(get_token_usage(key, cutoff_time, fetch_usage)) == 100
+    assert len(fetch_calls) == 1
+    assert fetch_calls[0] < cutoff_time
+
+    increment_token_usage([key], 25)
+    assert _total(get_token_usage(key, cutoff_time, fetch_usage)) == 125
+    older_cutoff_time = cutoff_time - timedelta(hours=1)
+    assert _total(get_token_usage(key, older_cutoff_time, fetch_usage)) == 175
+    assert len(fetch_calls) == 1
+
+
+def test_increment_without_seed_is_not_trusted() -> None:
+    key = get_global_token_usage_key()
+    increment_token_usage([key], 25)
+
+    # Postgres already includes the message that was counted
+    usage = get_token_usage(
+        key,
+        datetime.now(tz=timezone.utc) - timedelta(hours=1),
+        lambda _: [(_minute(0), 25), (_minute(10), 10)],
+    )
+    assert _total(usage) == 35
+
+
+def test_cutoff_beyond_retention_reads_postgres(
+    fake_redis: fakeredis.FakeRedis,
+) -> None:
+    cutoff_time = redis_token_usage.get_retention_cutoff_time() - timedelta(hours=1)
+    usage = get_token_usage(
+        get_global_token_usage_key(), cutoff_time, lambda _: [(_minute(0), 7)]
+    )
+    assert _total(usage) == 7
+    assert fake_redis.keys() == []
+
+
+def test_increments_while_seeding_are_kept() -> None:
+    key = get_global_token_usage_key()
+    cutoff_time = datetime.now(tz=timezone.utc) - timedelta(hours=1)
+
+    def fetch_usage(_: datetime) -> TokenUsage:
+        # a message saved after Postgres was read
+        increment_token_usage([key], 25)
+        return [(_minute(10), 100)]
+
+    assert _total(get_token_usage(key, cutoff_time, fetch_usage)) == 100
+    assert _total(get_token_usage(key, cutoff_time, fetch_usage)) == 125
+
+
+def test_replacing_counter_keeps_concurrent_increments(
+    fake_redis: fakeredis.FakeRedis,
+) -> None:
+    key = get_global_token_usage_key()
+    increment_token_usage([key], 10)
+
+    def fetch_usage() -> TokenUsage:
+        increment_token_usage([key], 5)
+        return [(_minute(0), 10), (_minute(30), 40)]
+
+    assert set_token_usage(key, fetch_usage) == [(_minute(0), 10), (_minute(30), 40)]
+    assert set_token_usage(key, lambda: None) is None
+
+    cutoff_time = datetime.now(tz=timezone.utc) - timedelta(hours=1)
+    assert _total(get_token_usage(key, cutoff_time, lambda _: [])) == 55
+    counter_key = f"{get_current_tenant_id()}:{key}"
+    assert 0 < fake_redis.ttl(counter_key)
@@ -8,6 +8,7 @@ from concurrent.futures import ThreadPoolExecutor
 import pytest
 
 from onyx.utils.threadpool_concurrency import parallel_yield
+from onyx.utils.threadpool_concurrency import PipelineStage
 from onyx.utils.threadpool_concurrency import run_in_background
 from onyx.utils.threadpool_concurrency import run_with_timeout
 from onyx.utils.threadpool_concurrency import ThreadSafeDict
@@ -389,3 +390,87 @@ def test_parallel_yield_non_blocking() -> None:
     # Verify no values are missing
     assert len(results) == 300  # Should have all values from 0 to 299
     assert sorted(results) == list(range(300))
+
+
+def test_pipeline_stage_preserves_order_across_chained_stages() -> None:
+    """Test that chained PipelineStages yield every item, in order."""
+    stop_event = threading.Event()
+
+    def produce() -> Iterator[int]:
+        yield from range(50)
+
+    first = PipelineStage("first", produce, queue_depth=2, stop_event=stop_event)
+
+    def double() -> Iterator[int]:
+        for i in first:
+            yield i * 2
+
+    second = PipelineStage("second", double, queue_depth=2, stop_event=stop_event)
+
+    with first, second:
+        results = list(second)
+
+    assert results == [i * 2 for i in range(50)]
+
+
+def test_pipeline_stage_applies_back_pressure() -> None:
+    """Test that the producer never gets more than queue_depth items ahead."""
+    produced: list[int] = []
+
+    def produce() -> Iterator[int]:
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    with PipelineStage("bounded", produce, queue_depth=2) as stage:
+        iterator = iter(stage)
+        assert next(iterator) == 0
+        time.sleep(0.2)
+        # 1 consumed + 2 queued + 1 blocked waiting for space in the queue
+        assert len(produced) <= 4
+
+        assert list(iterator) == list(range(1, 10))
+
+
+def test_pipeline_stage_propagates_exceptions_in_order() -> None:
+    """Test that producer exceptions are raised after the items before them."""
+
+    def produce() -> Iterator[int]:
+        yield 1
+        yield 2
+        raise ValueError("Stage failure")
+
+    results: list[int] = []
+    with PipelineStage("failing", produce, queue_depth=1) as stage:
+        with pytest.raises(ValueError, match="Stage failure"):
+            for item in stage:
+                results.append(item)
+
+    assert results == [1, 2]
+
+
+def test_pipeline_stage_stops_producer_on_early_exit() -> None:
+    """Test that stopping the stage unblocks and ends the producer thread."""
+
+    def produce() -> Iterator[int]:
+        i = 0
+        while True:
+            yield i
+            i += 1
+
+    stage = PipelineStage("infinite", produce, queue_depth=1).start()
+    assert next(iter(stage)) == 0
+    stage.stop(timeout=2.0)
+
+    assert not stage._thread.is_alive()
+
+
+def test_pipeline_stage_preserves_contextvars() -> None:
+    """Test that the producer runs with the creator's contextvars."""
+    test_context_var.set("pipeline_value")
+
+    def produce() -> Iterator[str]:
+        yield test_context_var.get()
+
+    with PipelineStage("context", produce, queue_depth=1) as stage:
+        assert list(stage) == ["pipeline_value"]
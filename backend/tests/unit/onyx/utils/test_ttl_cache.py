@@ -0,0 +1,35 @@
+from unittest.mock import patch
+
+from onyx.utils.ttl_cache import TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used() -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # touching "a" makes "b" the least recently used entry
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_ttl_cache_expires_entries() -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl_seconds=5)
+    with patch("onyx.utils.ttl_cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("onyx.utils.ttl_cache.time.monotonic", return_value=104.0):
+        assert cache.get("a") == 1
+    with patch("onyx.utils.ttl_cache.time.monotonic", return_value=105.0):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_disabled() -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=0, ttl_seconds=60)
+    cache.set("a", 1)
+    assert cache.get("a") is None